@@ -6,12 +6,16 @@ Uso: python run.py
 
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 
 # Agregar el directorio raíz al path de Python
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# Necesario para los procesos hijos de ProcessPoolExecutor en el ejecutable de PyInstaller
+multiprocessing.freeze_support()
+
 try:
     from src.views.dashboard import crear_dashboard
     crear_dashboard()
@@ -0,0 +1,163 @@
+# Recalculo masivo del histórico a partir de manifiestos pasados
+#
+# Uso:
+#   python -m src.backfill manifiestos/*.xlsx
+#   python -m src.backfill manifiestos/*.xlsx --overwrite --workers 4
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Parallel, Rolling
+from src.models import db
+from src.models.data_loader import cargar_manifesto
+from src.representados import CODIGOS_REPRESENTADOS
+from src.services.activity_index import activity_index
+from src.services.agent_facts import AgentFacts
+from src.services.code_set import manifest_codes, INVALID_CODE
+from src.services.data_processor import DataProcessor
+from src.services.rolling_metrics import RollingMetrics
+from src.services.trip_sketch import TripSketch
+from src.services.trip_warehouse import TripWarehouse
+
+
+def _motor_parquet():
+    """
+    DuckDBAnalytics si "almacen_parquet" está activado en config.json y duckdb
+    está instalado (mismo criterio que AnalyticsService.get_parquet_engine)
+    """
+    from src.models.config_manager import config_manager
+    if not config_manager.get("almacen_parquet", False):
+        return None
+    try:
+        from src.services.duckdb_analytics import DuckDBAnalytics
+        return DuckDBAnalytics()
+    except ImportError as e:
+        print(f"DEBUG: Almacén Parquet no disponible ({e})")
+        return None
+
+
+def _analizar_archivo(ruta: str, codigos: List[str], con_viajes: bool = False) -> Dict[str, object]:
+    """
+    Trabajo de un proceso hijo: carga un manifiesto y calcula su período,
+    las estadísticas de calculate_grouped_stats, los indicadores de
+    concentración y el conteo mensual por agente. Con `con_viajes` también
+    arma los viajes normalizados (almacén SQLite y partición Parquet).
+    """
+    df = cargar_manifesto(ruta, validar=True)
+    periodo = DataProcessor.extract_period_from_df(df)
+    if not periodo:
+        return {'ruta': ruta, 'periodo': None}
+
+    codigos_activos = np.unique(manifest_codes(df))
+    conteos = DataProcessor.grouped_counts(df, codigos)
+    return {
+        'ruta': ruta,
+        'periodo': periodo,
+        'filas': len(df),
+        'stats': DataProcessor.calculate_grouped_stats(df, codigos),
+        'concentracion': DataProcessor.concentration_from_df(df),
+        'conteos': DataProcessor._split_counts_by_flag(conteos),
+        'hechos': AgentFacts.from_df(df, codigos, periodo),
+        'viajes': TripWarehouse.to_frame(df, periodo) if con_viajes else None,
+        'mensual': RollingMetrics.monthly_counts(df, codigos),
+        'activos': codigos_activos[codigos_activos != INVALID_CODE],
+    }
+
+
+def backfill_historico(rutas: List[str], codigos: Optional[List[str]] = None,
+                       overwrite: bool = False,
+                       max_workers: Optional[int] = None) -> Dict[str, object]:
+    """
+    Procesa muchos manifiestos en paralelo (uno por proceso) y escribe sus
+    períodos en `historico` en una sola transacción. Con overwrite=True se
+    reemplazan los períodos existentes (p. ej. si cambió la lista de
+    representados). También actualiza métricas móviles, bitmaps de actividad,
+    sketches de viajes, hechos por agente, viajes individuales y la
+    partición Parquet (si está activada) de los períodos escritos.
+    """
+    codigos = list(codigos or CODIGOS_REPRESENTADOS)
+    db.crear_tabla_si_no_existe()
+    guardar_viajes = TripWarehouse.is_enabled()
+    engine = _motor_parquet()
+    con_viajes = guardar_viajes or engine is not None
+
+    workers = max_workers or min(Parallel.MAX_WORKERS, os.cpu_count() or 1, max(1, len(rutas)))
+    resultados, errores = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_analizar_archivo, ruta, codigos, con_viajes): ruta for ruta in rutas}
+        for future, ruta in futures.items():
+            try:
+                resultados.append(future.result())
+            except Exception as e:
+                errores[ruta] = str(e)
+
+    # Un resultado por período: si hay dos archivos del mismo mes se usa el de más filas
+    por_periodo: Dict[str, Dict[str, object]] = {}
+    for resultado in resultados:
+        periodo = resultado['periodo']
+        if periodo is None:
+            errores[resultado['ruta']] = "No se encontró un período válido"
+            continue
+        actual = por_periodo.get(periodo)
+        if actual is not None:
+            print(f"DEBUG: Período {periodo} repetido en {actual['ruta']} y {resultado['ruta']}")
+        if actual is None or resultado['filas'] > actual['filas']:
+            por_periodo[periodo] = resultado
+
+    registros = [
+        (periodo, r['stats']['mediana_representados'], r['stats']['mediana_otros'],
+         r['stats']['promedio_representados'], r['stats']['promedio_otros'], r['stats']['participacion'])
+        + tuple(r['concentracion'][columna] for columna in db.COLUMNAS_CONCENTRACION)
+        for periodo, r in sorted(por_periodo.items())
+    ]
+    escritos = db.upsert_registros(registros, mode="replace" if overwrite else "insert")
+
+    # Tablas derivadas de los períodos escritos (conteos mensuales ya calculados en los hijos)
+    for periodo in escritos:
+        resultado = por_periodo[periodo]
+        db.reemplazar_metricas_moviles(periodo, Rolling.MONTHLY, resultado['mensual'])
+        activity_index.record_period(pd.DataFrame({'codigo': resultado['activos']}), periodo, code_column='codigo')
+        TripSketch.store_period(periodo, *resultado['conteos'])
+        AgentFacts.store_facts(periodo, resultado['hechos'])
+        viajes = resultado['viajes']
+        db.reemplazar_viajes_periodo(periodo, TripWarehouse.rows_from_frame(viajes) if guardar_viajes else [])
+        if engine is not None:
+            try:
+                engine.write_frame(viajes, periodo)
+            except Exception as e:
+                print(f"Error escribiendo partición Parquet de {periodo}: {e}")
+    for periodo in escritos:
+        RollingMetrics.update_windows(periodo)
+
+    return {
+        'escritos': escritos,
+        'omitidos': sorted(set(por_periodo) - set(escritos)),
+        'errores': errores,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula el histórico de SigmAnalytics a partir de manifiestos pasados")
+    parser.add_argument("archivos", nargs="+", help="Manifiestos Excel (se aceptan comodines)")
+    parser.add_argument("--overwrite", action="store_true", help="Reemplazar los períodos que ya existen en el histórico")
+    parser.add_argument("--workers", type=int, default=None, help="Cantidad de procesos (por defecto, según los núcleos)")
+    args = parser.parse_args(argv)
+
+    rutas = sorted({ruta for patron in args.archivos for ruta in (glob.glob(patron) or [patron])})
+    resultado = backfill_historico(rutas, overwrite=args.overwrite, max_workers=args.workers)
+
+    print(f"Períodos escritos: {', '.join(resultado['escritos']) or '-'}")
+    if resultado['omitidos']:
+        print(f"Períodos existentes sin cambios (usar --overwrite): {', '.join(resultado['omitidos'])}")
+    for ruta, error in resultado['errores'].items():
+        print(f"Error en {ruta}: {error}")
+    return 1 if resultado['errores'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
 import sys
 from pathlib import Path
-from src.constants import Colors, ChartTitles
+from src.constants import Colors, ChartTitles, Backends, Matching
 
 def get_user_data_directory():
     # Obtiene la carpeta de datos del usuario de forma profesional.
@@ -39,6 +39,7 @@ PROJECT_ROOT = get_project_root()
 CONFIG_FILE = USER_DATA_DIR / "config.json"
 HISTORICO_DIR = USER_DATA_DIR / "data" / "historico"
 GRAPHS_DIR = USER_DATA_DIR / "outputs"
+PARQUET_DIR = USER_DATA_DIR / "data" / "parquet"  # Dataset particionado periodo=YYYY-MM/
 
 # Rutas del proyecto (junto al ejecutable)
 LOGO_PATH = PROJECT_ROOT / "src" / "assets" / "sigma_cargo_logo.png"
@@ -47,6 +48,8 @@ MANIFESTO_PATH = PROJECT_ROOT / "DatosManifiestoINGRESOS.xlsx"
 # Rutas de gráficos específicos (nuevas rutas con nombres en mayúsculas)
 RUTA_GRAFICO = GRAPHS_DIR / "serie_temporal.png"
 RUTA_GRAFICO_PROMEDIOS = GRAPHS_DIR / "serie_promedios.png"
+RUTA_GRAFICO_MOVIL = GRAPHS_DIR / "serie_movil.png"
+RUTA_GRAFICO_CONCENTRACION = GRAPHS_DIR / "serie_concentracion.png"
 RUTA_BOXPLOT = GRAPHS_DIR / "boxplot_conteos.png"
 RUTA_BARPLOT = GRAPHS_DIR / "barplot_representados.png"
 
@@ -62,6 +65,8 @@ ruta_barplot = str(RUTA_BARPLOT)
 TITULO_BOXPLOT = ChartTitles.BOXPLOT
 TITULO_BARRAS = ChartTitles.BARRAS
 TITULO_PROMEDIOS = ChartTitles.PROMEDIOS
+TITULO_MOVIL = ChartTitles.MOVIL
+TITULO_CONCENTRACION = ChartTitles.CONCENTRACION
 COLOR_EXITO = Colors.SUCCESS
 COLOR_ERROR = Colors.ERROR
 COLOR_TITULO = Colors.TITLE
@@ -77,7 +82,11 @@ DEFAULT_CONFIG = {
     "window_size": "1100x700",
     "window_position": None,
     "logo_size": [160, 160],
-    "data_directory": str(USER_DATA_DIR)
+    "data_directory": str(USER_DATA_DIR),
+    "data_backend": Backends.PANDAS,  # "pandas" o "polars" (requiere tener polars instalado)
+    "lastres_ventana_dias": Matching.WINDOW_DAYS,  # Ventana para emparejar lastres con ingresos
+    "almacenar_viajes": True,  # Guarda las filas de cada manifiesto en SQLite (consultas sin el Excel)
+    "almacen_parquet": False  # Dataset Parquet + DuckDB para consultas entre períodos (requiere duckdb)
 }
 
 def show_data_directory_info():
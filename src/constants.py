@@ -6,6 +6,13 @@ class Columns:
     AGENT_NAME = "Nombre Ag.Transportista"
     DATE = "Fecha ingreso"
     PRICE = "Precio"
+    ORIGIN = "Lugar partida"
+    DESTINATION = "Lugar destino"
+    CUSTOMS_IN = "Adu.Ing"
+    PLATE = "Matricula"
+    TRAILER = "Remolque/SemiRem"
+    MIC = "MIC/DNA"
+    MIC_ORIGINAL = "Mic original"
 
 # Configuración de procesamiento
 class Processing:
@@ -28,11 +35,55 @@ class Processing:
         "Precio"
     ]
 
+# Motores de ejecución disponibles para DataProcessor
+class Backends:
+    PANDAS = "pandas"
+    POLARS = "polars"
+
+# Ejecución paralela de estadísticas (ProcessPoolExecutor)
+class Parallel:
+    MAX_WORKERS = 8  # Se limita además por os.cpu_count()
+    MIN_ROWS_PER_WORKER = 50_000  # Por debajo de esto no compensa abrir procesos
+    PARTITION_BY_PERIOD = "period"
+    PARTITION_BY_AGENT = "agent"
+
+# Emparejamiento lastres ↔ ingresos por camión
+class Matching:
+    WINDOW_DAYS = 5  # Máximo de días entre el ingreso y su lastre
+    DIRECTION = "backward"  # El lastre busca el ingreso anterior más cercano
+
+# Métricas móviles por agente (ventanas en meses; 1 = conteo mensual base)
+class Rolling:
+    MONTHLY = 1
+    WINDOWS = (3, 6, 12)
+    CHART_WINDOWS = (3, 12)
+
+# Intervalos de confianza bootstrap de medianas y promedios por agente
+class Bootstrap:
+    RESAMPLES = 2000
+    CONFIDENCE = 0.95
+    SEED = 0              # Semilla fija: el mismo manifiesto da siempre el mismo intervalo
+
+# Detección de saltos/caídas de volumen por agente (z-score robusto mediana/MAD)
+class Anomalies:
+    WINDOW = 6            # Meses previos usados como referencia
+    MIN_HISTORY = 3       # Meses previos mínimos para evaluar un período
+    Z_THRESHOLD = 3.5     # |z| a partir del cual se marca la anomalía
+    MAD_SCALE = 1.4826    # MAD → desvío estándar equivalente (distribución normal)
+    MIN_SIGMA = 1.0       # Piso del desvío (en viajes) para agentes muy estables
+    MIN_DELTA = 3         # Diferencia mínima de viajes contra la mediana
+
 # Tipos de archivo
 class FileTypes:
     INGRESOS = "ingresos"
     LASTRES = "lastres"
 
+# Tabla de histórico de cada tipo de archivo (mismo esquema, series separadas)
+class HistoricalTables:
+    INGRESOS = "historico"
+    LASTRES = "historico_lastres"
+    BY_FILE_TYPE = {FileTypes.INGRESOS: INGRESOS, FileTypes.LASTRES: LASTRES}
+
 # Configuración de gráficos
 class Charts:
     DPI = 150
@@ -75,3 +126,5 @@ class ChartTitles:
     BARRAS = "Barras: Top Representados + Medianas"
     PROMEDIOS = "Serie Temporal: Promedios"
     TEMPORAL = "Evolución Temporal de Medianas"
+    MOVIL = "Participación Móvil de Representados"
+    CONCENTRACION = "Concentración del Mercado"
@@ -20,47 +20,33 @@ except ImportError as e:
 
 # -----------------------------------------------------------
 # Función refactorizada que usa los nuevos servicios
-def _procesar_df(df, codigos: list[str]):
-    print("DEBUG: Iniciando _procesar_df")
+def analizar_df(df, codigos: list[str]):
+    # Analiza el manifiesto una sola vez y genera los gráficos; retorna el ManifestAnalysis
+    print("DEBUG: Iniciando analizar_df")
     
     # Inicializar servicios
     print("DEBUG: Inicializando servicios...")
     analytics_service = AnalyticsService()
     chart_service = ChartService()
     
-    # Procesar datos usando el servicio de análisis
-    print("DEBUG: Procesando datos con AnalyticsService...")
-    result = analytics_service.process_manifest_data(df, codigos)
-    
-    # Extraer datos del resultado
-    print("DEBUG: Extrayendo datos del resultado...")
-    metrics = result['metrics']
-    period = result['period']
-    historical_updated = result['historical_updated']
-    is_preview = result['is_preview']
-    viajes_representados = result['viajes_representados']
+    # Análisis único: período, métricas, conteos, cubo de rutas e histórico
+    print("DEBUG: Analizando datos con AnalyticsService...")
+    analysis = analytics_service.analyze_manifest(df, codigos)
     
-    # Generar gráficos
+    # Generar gráficos reutilizando los conteos del análisis
     print("DEBUG: Generando gráficos con ChartService...")
-    chart_paths = chart_service.generate_all_charts(
-        df, codigos, metrics, Path(GRAPHS_DIR), period, is_preview
+    analysis.chart_paths = chart_service.generate_all_charts(
+        df, codigos, analysis.metrics, Path(GRAPHS_DIR), analysis.period, analysis.is_preview,
+        analysis=analysis
     )
     
-    print("DEBUG: _procesar_df completado exitosamente")
-    
+    print("DEBUG: analizar_df completado exitosamente")
+    return analysis
+
+
+def _procesar_df(df, codigos: list[str]):
     # Retornar en el formato esperado (compatibilidad con código existente)
-    return (
-        metrics['mediana_representados'],
-        metrics['mediana_otros'], 
-        metrics['promedio_representados'],
-        metrics['promedio_otros'],
-        metrics['participacion'],
-        historical_updated,
-        viajes_representados,
-        chart_paths['boxplot'],
-        chart_paths['barplot'],
-        is_preview
-    )
+    return analizar_df(df, codigos).as_legacy_tuple()
 
 
 def procesar_archivo(
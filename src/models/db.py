@@ -1,8 +1,9 @@
 import sqlite3  # Módulo estándar de Python para trabajar con bases de datos SQLite
 import pandas as pd  # Librería para manipulación de datos, usamos esto para leer la base a un DataFrame
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import sys
 import os
+import threading
 from src.config import HISTORICO_DIR
 
 # Ruta donde se guardará (o ya existe) la base de datos SQLite (en AppData del usuario)
@@ -10,37 +11,220 @@ DB_PATH = os.path.join(str(HISTORICO_DIR), 'historico.db')
 os.makedirs(str(HISTORICO_DIR), exist_ok=True)
 
 # -------------------------------------------------------------------------
-# Crea la tabla 'historico' si todavía no existe en la base de datos
+# Conexiones: una por hilo (y por proceso), reutilizada entre llamadas.
+# WAL permite que la UI lea mientras un hilo de trabajo escribe.
+# -------------------------------------------------------------------------
+PRAGMAS_CONEXION = (
+    "PRAGMA journal_mode=WAL",       # Lectores y un escritor en paralelo
+    "PRAGMA synchronous=NORMAL",     # Seguro con WAL y bastante más rápido que FULL
+    "PRAGMA mmap_size=268435456",    # 256 MB de lectura mapeada en memoria
+    "PRAGMA cache_size=-65536",      # 64 MB de caché de páginas (negativo = KB)
+    "PRAGMA temp_store=MEMORY",
+)
+BUSY_TIMEOUT_SEGUNDOS = 5.0  # Espera si otro hilo/proceso tiene el lock de escritura
+
+_conexiones_hilo = threading.local()
+
+def obtener_conexion(ruta_db: Optional[str] = None) -> sqlite3.Connection:
+    # Devuelve la conexión del hilo actual para la base (la crea la primera vez).
+    # DB_PATH se lee en cada llamada para respetar cambios de ruta.
+    ruta = ruta_db or DB_PATH
+    if getattr(_conexiones_hilo, "pid", None) != os.getpid():
+        # Proceso nuevo (fork): no se reutilizan conexiones del proceso padre
+        _conexiones_hilo.pid = os.getpid()
+        _conexiones_hilo.conexiones = {}
+    conexion = _conexiones_hilo.conexiones.get(ruta)
+    if conexion is None:
+        conexion = sqlite3.connect(ruta, timeout=BUSY_TIMEOUT_SEGUNDOS)
+        for pragma in PRAGMAS_CONEXION:
+            conexion.execute(pragma)
+        _conexiones_hilo.conexiones[ruta] = conexion
+    return conexion
+
+def cerrar_conexiones() -> None:
+    # Cierra las conexiones del hilo actual (p. ej. al terminar un hilo de trabajo o en tests).
+    if getattr(_conexiones_hilo, "pid", None) != os.getpid():
+        return
+    for conexion in _conexiones_hilo.conexiones.values():
+        conexion.close()
+    _conexiones_hilo.conexiones = {}
+    registrar_escritura()  # Una conexión nueva puede repetir id y data_version
+
+# -------------------------------------------------------------------------
+# Caché en memoria de los DataFrames del histórico. La versión combina un
+# contador que suben las escrituras de este proceso con PRAGMA data_version,
+# que cambia cuando otra conexión (otro hilo o proceso, p. ej. un backfill)
+# confirma cambios. Mientras la versión no cambie se sirve desde memoria.
+# -------------------------------------------------------------------------
+_cache_lock = threading.Lock()
+_version_escrituras = 0
+_cache_historico: Dict[Tuple[str, str], Tuple[tuple, pd.DataFrame]] = {}
+
+def registrar_escritura() -> None:
+    # Invalida las lecturas cacheadas: se llama después de confirmar cada escritura.
+    global _version_escrituras
+    with _cache_lock:
+        _version_escrituras += 1
+
+def _version_datos(conexion: sqlite3.Connection) -> tuple:
+    # data_version solo es comparable dentro de la misma conexión: se incluye su id.
+    data_version = conexion.execute("PRAGMA data_version").fetchone()[0]
+    return _version_escrituras, id(conexion), data_version
+
+# Indicadores de concentración guardados junto a cada período del histórico:
+# HHI (0-10.000), % de viajes de los 5 y 10 mayores agentes y coeficiente de Gini
+COLUMNAS_CONCENTRACION = ("hhi", "top5_share", "top10_share", "gini")
+
+COLUMNAS_HISTORICO = (
+    "periodo", "mediana_representados", "mediana_otros", "promedio_representados",
+    "promedio_otros", "participacion",
+) + COLUMNAS_CONCENTRACION
+
+MODOS_UPSERT = ("insert", "replace")  # upsert_registros: conservar o sobrescribir períodos
+
+# Tablas con el mismo esquema de histórico: ingresos y lastres llevan series separadas
+TABLAS_HISTORICO = ("historico", "historico_lastres")
+
+def _tabla_historico(tabla: str) -> str:
+    # El nombre de tabla va en el SQL: solo se aceptan las tablas conocidas
+    if tabla not in TABLAS_HISTORICO:
+        raise ValueError(f"Tabla de histórico desconocida: {tabla}")
+    return tabla
+
+# -------------------------------------------------------------------------
+# Crea las tablas del histórico si todavía no existen en la base de datos
 # -------------------------------------------------------------------------
 def crear_tabla_si_no_existe() -> None:
-    conexion = sqlite3.connect(DB_PATH)  # Se conecta (o crea) la base de datos
+    conexion = obtener_conexion()  # Se conecta (o crea) la base de datos
     cursor = conexion.cursor()  # Crea un cursor para ejecutar sentencias SQL
 
+    for tabla in TABLAS_HISTORICO:  # historico (ingresos) e historico_lastres
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabla} (
+                periodo TEXT PRIMARY KEY,                -- Ej: "2024-05"
+                mediana_representados REAL,              -- Valor numérico de mediana (representados)
+                mediana_otros REAL,                      -- Valor numérico de mediana (no representados)
+                promedio_representados REAL,             -- Valor numérico de promedio (representados)
+                promedio_otros REAL,                     -- Valor numérico de promedio (no representados)
+                participacion REAL                       -- porcentaje de participación
+            )
+        """)  # Solo se crea si no existe ya
+
+        # Migración: indicadores de concentración del mercado (bases creadas antes de agregarlos)
+        columnas = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})")}
+        for columna in COLUMNAS_CONCENTRACION:
+            if columna not in columnas:
+                cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} REAL")
+
+    # Viajes por agente: ventana 1 = conteo del mes; 3/6/12 = acumulado móvil
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS metricas_moviles (
+            periodo TEXT NOT NULL,                   -- Último mes de la ventana, ej: "2024-05"
+            ventana INTEGER NOT NULL,                -- Meses de la ventana (1, 3, 6, 12)
+            codigo TEXT NOT NULL,                    -- Código normalizado del agente
+            nombre TEXT,                             -- Nombre del agente
+            viajes INTEGER,                          -- Viajes en la ventana
+            mediana_mensual REAL,                    -- Mediana de viajes por mes dentro de la ventana
+            participacion REAL,                      -- % de los viajes del mercado en la ventana
+            es_representado INTEGER,                 -- 1 si es representado
+            PRIMARY KEY (periodo, ventana, codigo)
+        )
+    """)
+
+    # Id denso por código de agente (posición del bit en los bitmaps de actividad)
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS historico (
+        CREATE TABLE IF NOT EXISTS agentes_ids (
+            codigo INTEGER PRIMARY KEY,              -- Código normalizado del agente
+            id INTEGER NOT NULL UNIQUE               -- 0, 1, 2, ... en orden de aparición
+        )
+    """)
+
+    # Bitmap empaquetado (np.packbits) de los agentes con viajes en cada período
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS actividad_agentes (
             periodo TEXT PRIMARY KEY,                -- Ej: "2024-05"
-            mediana_representados REAL,              -- Valor numérico de mediana (representados)
-            mediana_otros REAL,                      -- Valor numérico de mediana (no representados)
-            promedio_representados REAL,             -- Valor numérico de promedio (representados)
-            promedio_otros REAL,                     -- Valor numérico de promedio (no representados)
-            participacion REAL                       -- porcentaje de participación
+            n_bits INTEGER NOT NULL,                 -- Cantidad de ids cubiertos por el bitmap
+            bitmap BLOB NOT NULL                     -- Bits empaquetados, bit i = agente con id i
+        )
+    """)
+
+    # Histograma exacto de viajes por agente (valor → cantidad de agentes) por período y grupo
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sketches_viajes (
+            periodo TEXT NOT NULL,                   -- Ej: "2024-05"
+            grupo TEXT NOT NULL,                     -- "representados" u "otros"
+            n_agentes INTEGER NOT NULL,              -- Agentes con viajes en el grupo
+            datos BLOB NOT NULL,                     -- Valores y pesos int64 (TripSketch.to_bytes)
+            PRIMARY KEY (periodo, grupo)
+        )
+    """)
+
+    # Hechos por agente y período (viajes, monto) para consultas históricas sin el Excel
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS hechos_agente_periodo (
+            periodo TEXT NOT NULL,                   -- Ej: "2024-05"
+            codigo INTEGER NOT NULL,                 -- Código normalizado del agente
+            nombre TEXT,                             -- Nombre más frecuente en el período
+            viajes INTEGER NOT NULL,                 -- Viajes del agente en el período
+            es_representado INTEGER NOT NULL,        -- 1 si es representado
+            monto REAL,                              -- Suma de precios (NULL si no hay tarifas)
+            PRIMARY KEY (periodo, codigo)
         )
-    """)  # Solo se crea si no existe ya
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_hechos_codigo ON hechos_agente_periodo (codigo, periodo, viajes, monto)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_hechos_representado ON hechos_agente_periodo (es_representado, periodo, viajes)")
+
+    # Viajes individuales de cada manifiesto ingresado (deduplicados por MIC/DNA)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS viajes (
+            periodo_manifiesto TEXT,                 -- Período del manifiesto que cargó el viaje
+            periodo TEXT NOT NULL,                   -- Mes de la fecha de ingreso, ej: "2024-05"
+            codigo INTEGER NOT NULL,                 -- Código normalizado del agente
+            nombre TEXT,                             -- Nombre Ag.Transportista
+            mic_dna TEXT UNIQUE,                     -- MIC/DNA (clave de deduplicación)
+            mic_original TEXT,
+            fecha_ingreso TEXT,                      -- ISO "YYYY-MM-DD HH:MM:SS"
+            matricula TEXT,
+            remolque TEXT,
+            lugar_partida TEXT,
+            lugar_destino TEXT,
+            aduana_ingreso TEXT,
+            precio REAL                              -- Precio tarifado al ingresar
+        )
+    """)
+    # Búsqueda de los viajes de un período y agente (listados, tabla dinámica y PDF)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_viajes_periodo_codigo ON viajes (periodo, codigo, nombre, precio)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_viajes_manifiesto ON viajes (periodo_manifiesto)")
 
     conexion.commit()  # Guarda los cambios
-    conexion.close()   # Cierra la conexión
+    registrar_escritura()  # Las migraciones pueden cambiar columnas del histórico
 
 # -------------------------------------------------------------------------
 # Verifica si un período ya está registrado (opcionalmente permite ruta distinta)
 # -------------------------------------------------------------------------
-def existe_periodo(periodo: str, ruta_db: str = DB_PATH) -> bool:
-    conexion = sqlite3.connect(ruta_db)
+def existe_periodo(periodo: str, ruta_db: Optional[str] = None, tabla: str = "historico") -> bool:
+    tabla = _tabla_historico(tabla)
+    conexion = obtener_conexion(ruta_db)
     cursor = conexion.cursor()
-    cursor.execute("SELECT COUNT(*) FROM historico WHERE periodo = ?", (periodo,))
+    cursor.execute(f"SELECT COUNT(*) FROM {tabla} WHERE periodo = ?", (periodo,))
     resultado = cursor.fetchone()[0]  # Nos devuelve el número de coincidencias
-    conexion.close()
     return resultado > 0  # Devuelve True si existe, False si no
 
+# -------------------------------------------------------------------------
+# Existencia del período y período más reciente con una sola conexión
+# -------------------------------------------------------------------------
+def obtener_estado_periodo(periodo: str, ruta_db: Optional[str] = None,
+                           tabla: str = "historico") -> Tuple[bool, Optional[str]]:
+    tabla = _tabla_historico(tabla)
+    conexion = obtener_conexion(ruta_db)
+    cursor = conexion.cursor()
+    cursor.execute(
+        f"SELECT EXISTS(SELECT 1 FROM {tabla} WHERE periodo = ?), (SELECT MAX(periodo) FROM {tabla})",
+        (periodo,),
+    )
+    existe, mas_reciente = cursor.fetchone()
+    return bool(existe), mas_reciente or None
+
 # -------------------------------------------------------------------------
 # Inserta un nuevo registro al histórico, si no existe el período todavía
 # -------------------------------------------------------------------------
@@ -50,26 +234,65 @@ def insertar_registro(
     mediana_otros: float,
     promedio_rep: float,
     promedio_otros: float,
-    participacion: float
+    participacion: float,
+    concentracion: Optional[Dict[str, float]] = None,
+    tabla: str = "historico"
 ) -> bool:
     # Inserta un nuevo registro al histórico, si no existe el período todavía.
-    conexion = sqlite3.connect(DB_PATH)
-    cursor = conexion.cursor()
+    # concentracion: {"hhi", "top5_share", "top10_share", "gini"} (opcional)
+    # tabla: "historico" (ingresos) o "historico_lastres"
+    indicadores = tuple((concentracion or {}).get(columna) for columna in COLUMNAS_CONCENTRACION)
+    registro = (periodo, mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion) + indicadores
+    return bool(upsert_registros([registro], mode="insert", tabla=tabla))  # True si se insertó
 
-    # Verifica si ya hay un registro con ese mismo período
-    cursor.execute("SELECT COUNT(*) FROM historico WHERE periodo = ?", (periodo,))
-    existe = cursor.fetchone()[0] > 0
+# -------------------------------------------------------------------------
+# Escritura en bloque del histórico: INSERT ... ON CONFLICT con un único
+# executemany en una sola transacción (mode="insert" conserva los períodos
+# existentes; mode="replace" los sobrescribe)
+# -------------------------------------------------------------------------
+def upsert_registros(registros: list, mode: str = "insert", tabla: str = "historico") -> list:
+    # registros: [(periodo, mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion)]
+    # opcionalmente seguidos de (hhi, top5_share, top10_share, gini).
+    # Devuelve los períodos efectivamente escritos.
+    tabla = _tabla_historico(tabla)
+    if mode not in MODOS_UPSERT:
+        raise ValueError(f"Modo desconocido: {mode} (usar 'insert' o 'replace')")
 
-    if not existe:
-        # Si no existe, inserta los datos
-        cursor.execute("""
-            INSERT INTO historico (periodo, mediana_representados, mediana_otros, promedio_representados, promedio_otros, participacion)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (periodo, mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion))
-        conexion.commit()  # Aplica los cambios
+    # Sin indicadores quedan en NULL; si un período se repite, gana el último
+    filas = {}
+    for registro in registros:
+        filas[registro[0]] = tuple(registro) + (None,) * (len(COLUMNAS_HISTORICO) - len(registro))
+    if not filas:
+        return []
+
+    if mode == "replace":
+        conflicto = "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in COLUMNAS_HISTORICO[1:])
+    else:
+        conflicto = "DO NOTHING"
 
-    conexion.close()  # Siempre cerramos la conexión
-    return not existe  # Devuelve True si se insertó, False si ya existía
+    conexion = obtener_conexion()
+    with conexion:  # Una única transacción: se aplica todo o nada
+        escritos = list(filas)
+        if mode == "insert":
+            # Una sola consulta para saber qué períodos ya estaban (no uno por registro)
+            marcas = ", ".join("?" * len(filas))
+            existentes = {fila[0] for fila in conexion.execute(
+                f"SELECT periodo FROM {tabla} WHERE periodo IN ({marcas})", escritos)}
+            escritos = [periodo for periodo in escritos if periodo not in existentes]
+        conexion.executemany(
+            f"""
+            INSERT INTO {tabla} ({', '.join(COLUMNAS_HISTORICO)})
+            VALUES ({', '.join('?' * len(COLUMNAS_HISTORICO))})
+            ON CONFLICT(periodo) {conflicto}
+            """,
+            list(filas.values()),
+        )
+    registrar_escritura()
+    return escritos
+
+def insertar_registros(registros: list, overwrite: bool = False, tabla: str = "historico") -> list:
+    # Compatibilidad: overwrite=True equivale a upsert_registros(mode="replace").
+    return upsert_registros(registros, mode="replace" if overwrite else "insert", tabla=tabla)
 
 # Extrae el período en formato "YYYY-MM" desde la columna de fechas
 def obtener_periodo_desde_df(df: pd.DataFrame, nombre_columna_fecha: str) -> str:
@@ -82,26 +305,226 @@ def obtener_periodo_desde_df(df: pd.DataFrame, nombre_columna_fecha: str) -> str
 # -------------------------------------------------------------------------
 # Devuelve un DataFrame con todos los registros del histórico, ordenado por período
 # -------------------------------------------------------------------------
-def obtener_todos_los_periodos() -> pd.DataFrame:
-    conexion = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM historico ORDER BY periodo", conexion)  # Carga toda la tabla a un DataFrame
-    conexion.close()
-    return df
+def obtener_todos_los_periodos(tabla: str = "historico") -> pd.DataFrame:
+    # Lectura a través de la caché versionada; devuelve siempre una copia
+    # para que quien la modifique no altere lo cacheado.
+    tabla = _tabla_historico(tabla)
+    conexion = obtener_conexion()
+    clave = (DB_PATH, tabla)
+    version = _version_datos(conexion)
+    with _cache_lock:
+        entrada = _cache_historico.get(clave)
+    if entrada is not None and entrada[0] == version:
+        return entrada[1].copy()
+
+    df = pd.read_sql_query(f"SELECT * FROM {tabla} ORDER BY periodo", conexion)  # Carga toda la tabla a un DataFrame
+    with _cache_lock:
+        _cache_historico[clave] = (version, df)
+    return df.copy()
 
 # -------------------------------------------------------------------------
 # Función alias (por ahora) que llama a la misma que obtener_todos_los_periodos()
 # -------------------------------------------------------------------------
-def obtener_historico_completo() -> pd.DataFrame:
+def obtener_historico_completo(tabla: str = "historico") -> pd.DataFrame:
     # Función alias que llama a obtener_todos_los_periodos().
-    return obtener_todos_los_periodos()
+    return obtener_todos_los_periodos(tabla)
 
-def get_periodo_mas_reciente() -> Optional[str]:
+def get_periodo_mas_reciente(tabla: str = "historico") -> Optional[str]:
     # Devuelve el periodo más reciente registrado en la base de datos, o None si no hay registros.
-    conexion = sqlite3.connect(DB_PATH)
+    tabla = _tabla_historico(tabla)
+    conexion = obtener_conexion()
     cursor = conexion.cursor()
-    cursor.execute("SELECT MAX(periodo) FROM historico")
+    cursor.execute(f"SELECT MAX(periodo) FROM {tabla}")
     resultado = cursor.fetchone()
-    conexion.close()
     if resultado and resultado[0]:
         return resultado[0]
     return None
+
+# -------------------------------------------------------------------------
+# Métricas móviles por agente (tabla metricas_moviles)
+# -------------------------------------------------------------------------
+def reemplazar_metricas_moviles(periodo: str, ventana: int, df: pd.DataFrame) -> None:
+    # Reemplaza todas las filas de un (período, ventana) en una sola transacción.
+    conexion = obtener_conexion()
+    with conexion:
+        conexion.execute(
+            "DELETE FROM metricas_moviles WHERE periodo = ? AND ventana = ?", (periodo, ventana)
+        )
+        conexion.executemany("""
+            INSERT INTO metricas_moviles (periodo, ventana, codigo, nombre, viajes, mediana_mensual, participacion, es_representado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (periodo, ventana, str(r.codigo), r.nombre, int(r.viajes), float(r.mediana_mensual),
+             float(r.participacion), int(r.es_representado))
+            for r in df.itertuples(index=False)
+        ])
+
+def obtener_metricas_moviles(ventana: int, desde: Optional[str] = None,
+                             hasta: Optional[str] = None) -> pd.DataFrame:
+    # Devuelve las métricas de una ventana, opcionalmente acotadas a un rango de períodos.
+    conexion = obtener_conexion()
+    df = pd.read_sql_query(
+        """
+        SELECT * FROM metricas_moviles
+        WHERE ventana = ? AND periodo >= ? AND periodo <= ?
+        ORDER BY periodo, codigo
+        """,
+        conexion,
+        params=(ventana, desde or "", hasta or "9999-99"),
+    )
+    return df
+
+def obtener_periodos_metricas_moviles(ventana: int) -> list:
+    # Períodos que ya tienen métricas para la ventana dada.
+    conexion = obtener_conexion()
+    cursor = conexion.cursor()
+    cursor.execute("SELECT DISTINCT periodo FROM metricas_moviles WHERE ventana = ? ORDER BY periodo", (ventana,))
+    periodos = [fila[0] for fila in cursor.fetchall()]
+    return periodos
+
+# -------------------------------------------------------------------------
+# Bitmaps de actividad de agentes (tablas agentes_ids y actividad_agentes)
+# -------------------------------------------------------------------------
+def asignar_ids_agentes(codigos: list) -> dict:
+    # Devuelve {codigo: id}, asignando ids densos consecutivos a los códigos nuevos.
+    conexion = obtener_conexion()
+    with conexion:
+        ids = dict(conexion.execute("SELECT codigo, id FROM agentes_ids").fetchall())
+        nuevos = [int(c) for c in codigos if int(c) not in ids]
+        siguiente = max(ids.values(), default=-1) + 1
+        filas = [(codigo, siguiente + i) for i, codigo in enumerate(nuevos)]
+        conexion.executemany("INSERT INTO agentes_ids (codigo, id) VALUES (?, ?)", filas)
+        ids.update(filas)
+    return ids
+
+def obtener_ids_agentes() -> dict:
+    # Devuelve {codigo: id} de todos los agentes registrados.
+    conexion = obtener_conexion()
+    ids = dict(conexion.execute("SELECT codigo, id FROM agentes_ids").fetchall())
+    return ids
+
+def guardar_bitmap_actividad(periodo: str, n_bits: int, bitmap: bytes) -> None:
+    # Guarda (o reemplaza) el bitmap de actividad de un período.
+    conexion = obtener_conexion()
+    with conexion:
+        conexion.execute(
+            "INSERT OR REPLACE INTO actividad_agentes (periodo, n_bits, bitmap) VALUES (?, ?, ?)",
+            (periodo, n_bits, sqlite3.Binary(bitmap)),
+        )
+
+def obtener_bitmaps_actividad() -> list:
+    # Devuelve [(periodo, n_bits, bitmap)] ordenado por período.
+    conexion = obtener_conexion()
+    filas = conexion.execute("SELECT periodo, n_bits, bitmap FROM actividad_agentes ORDER BY periodo").fetchall()
+    return filas
+
+# -------------------------------------------------------------------------
+# Sketches de viajes por agente (histogramas combinables por período)
+# -------------------------------------------------------------------------
+def guardar_sketches(periodo: str, sketches: Dict[str, Tuple[int, bytes]]) -> None:
+    # sketches: {grupo: (n_agentes, datos)}; reemplaza los del período.
+    conexion = obtener_conexion()
+    with conexion:
+        conexion.executemany(
+            "INSERT OR REPLACE INTO sketches_viajes (periodo, grupo, n_agentes, datos) VALUES (?, ?, ?, ?)",
+            [(periodo, grupo, n, sqlite3.Binary(datos)) for grupo, (n, datos) in sketches.items()],
+        )
+
+def obtener_sketches(desde: Optional[str] = None, hasta: Optional[str] = None) -> list:
+    # Devuelve [(periodo, grupo, datos)] de los períodos en el rango, ordenado por período.
+    conexion = obtener_conexion()
+    filas = conexion.execute(
+        """
+        SELECT periodo, grupo, datos FROM sketches_viajes
+        WHERE periodo >= ? AND periodo <= ?
+        ORDER BY periodo, grupo
+        """,
+        (desde or "", hasta or "9999-99"),
+    ).fetchall()
+    return filas
+
+# -------------------------------------------------------------------------
+# Hechos por agente y período
+# -------------------------------------------------------------------------
+def reemplazar_hechos_periodo(periodo: str, filas: list) -> int:
+    # filas: [(codigo, nombre, viajes, es_representado, monto)]; reemplaza las del
+    # período con un único executemany en una sola transacción. Devuelve las filas escritas.
+    conexion = obtener_conexion()
+    with conexion:
+        conexion.execute("DELETE FROM hechos_agente_periodo WHERE periodo = ?", (periodo,))
+        conexion.executemany(
+            """
+            INSERT INTO hechos_agente_periodo (periodo, codigo, nombre, viajes, es_representado, monto)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(periodo,) + tuple(fila) for fila in filas],
+        )
+    return len(filas)
+
+def obtener_hechos(desde: Optional[str] = None, hasta: Optional[str] = None,
+                   codigo: Optional[int] = None, solo_representados: bool = False) -> pd.DataFrame:
+    # Hechos por agente de un rango de períodos, opcionalmente de un solo agente o solo representados.
+    condiciones = ["periodo >= ?", "periodo <= ?"]
+    parametros: list = [desde or "", hasta or "9999-99"]
+    if codigo is not None:
+        condiciones.append("codigo = ?")
+        parametros.append(int(codigo))
+    if solo_representados:
+        condiciones.append("es_representado = 1")
+    return pd.read_sql_query(
+        f"""
+        SELECT periodo, codigo, nombre, viajes, es_representado, monto
+        FROM hechos_agente_periodo
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY periodo, codigo
+        """,
+        obtener_conexion(),
+        params=parametros,
+    )
+
+# -------------------------------------------------------------------------
+# Viajes individuales (almacén de filas de manifiestos)
+# -------------------------------------------------------------------------
+COLUMNAS_VIAJES = (
+    "periodo", "codigo", "nombre", "mic_dna", "mic_original", "fecha_ingreso",
+    "matricula", "remolque", "lugar_partida", "lugar_destino", "aduana_ingreso", "precio",
+)
+
+def reemplazar_viajes_periodo(periodo: str, filas: list) -> int:
+    # filas: tuplas en el orden de COLUMNAS_VIAJES, del manifiesto del período `periodo`.
+    # Borra los viajes que cargó antes ese mismo manifiesto y los vuelve a insertar en una
+    # sola transacción: recargar un manifiesto (aunque no tenga MIC/DNA) no duplica viajes
+    # y los precios quedan actualizados. Un MIC/DNA ya cargado por otro manifiesto se
+    # ignora (INSERT OR IGNORE). Devuelve las filas escritas.
+    conexion = obtener_conexion()
+    with conexion:
+        conexion.execute("DELETE FROM viajes WHERE periodo_manifiesto = ?", (periodo,))
+        cursor = conexion.executemany(
+            f"INSERT OR IGNORE INTO viajes (periodo_manifiesto, {', '.join(COLUMNAS_VIAJES)}) "
+            f"VALUES ({', '.join('?' * (len(COLUMNAS_VIAJES) + 1))})",
+            [(periodo,) + tuple(fila) for fila in filas],
+        )
+    return max(cursor.rowcount, 0)
+
+def obtener_viajes(periodo: str, codigos: Optional[list] = None) -> pd.DataFrame:
+    # Viajes de un período, opcionalmente solo de ciertos códigos (enteros normalizados).
+    condiciones = ["periodo = ?"]
+    parametros: list = [periodo]
+    if codigos is not None:
+        condiciones.append(f"codigo IN ({', '.join('?' * len(codigos))})")
+        parametros.extend(int(c) for c in codigos)
+    return pd.read_sql_query(
+        f"""
+        SELECT {', '.join(COLUMNAS_VIAJES)}
+        FROM viajes
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY fecha_ingreso, rowid
+        """,
+        obtener_conexion(),
+        params=parametros,
+    )
+
+def obtener_periodos_viajes() -> list:
+    # Períodos con viajes guardados, ordenados.
+    filas = obtener_conexion().execute("SELECT DISTINCT periodo FROM viajes ORDER BY periodo").fetchall()
+    return [fila[0] for fila in filas]
@@ -5,6 +5,10 @@ from typing import List, Dict, Tuple, Optional
 import pandas as pd
 from .pdf_renderer import export_pdf_from_html
 from src.config import LOGO_PATH
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int
+from src.services.tarifas import asegurar_tarifas
+from src.services.trip_warehouse import TripWarehouse
+from src.constants import FileTypes
 
 
 DEFAULT_COLUMNS_ORDER: List[str] = [
@@ -33,41 +37,25 @@ def _build_period_mask(df: pd.DataFrame, periodo: str, fecha_columna: str = "Fec
     return periodo_str == periodo
 
 
-def _normalize_code(value: object) -> str:
-    # Normaliza un código a solo dígitos como string (elimina sufijos .0 y cualquier no dígito)
-    try:
-        text = str(value).strip()
-    except Exception:
-        return ""
-    # Extraer solo dígitos para evitar problemas de ".0" o formatos raros
-    import re
-    digits = re.sub(r"\D", "", text)
-    return digits
-
-
-def _normalize_code_series(series: pd.Series) -> pd.Series:
-    # Aplica normalización de códigos a una serie pandas
-    return series.apply(_normalize_code)
-
-
 def obtener_viajes_representado(
-    df: pd.DataFrame,
+    df: Optional[pd.DataFrame],
     codigo_representado: str,
     periodo: str,
     columna_agente: str = "Ag.transportista",
     columna_fecha: str = "Fecha ingreso",
 ) -> pd.DataFrame:
     # Devuelve los viajes para un representado y periodo.
-    df_filtrado = df.copy()
-    mask_periodo = _build_period_mask(df_filtrado, periodo, fecha_columna=columna_fecha)
-    codigos_norm = _normalize_code_series(df_filtrado[columna_agente])
-    codigo_norm = _normalize_code(codigo_representado)
-    mask_codigo = codigos_norm == codigo_norm
-    return df_filtrado[mask_periodo & mask_codigo]
+    # Sin df se leen del almacén de viajes (períodos pasados sin el .xlsx).
+    if df is None:
+        return TripWarehouse.load(periodo, codigo_representado)
+    mask_periodo = _build_period_mask(df, periodo, fecha_columna=columna_fecha)
+    # Compara contra los códigos int64 cacheados del manifiesto (sin re-normalizar)
+    mask_codigo = manifest_codes(df, columna_agente) == normalize_code_int(codigo_representado)
+    return df[mask_periodo.to_numpy() & mask_codigo]
 
 
 def listar_representados_con_viajes(
-    df: pd.DataFrame,
+    df: Optional[pd.DataFrame],
     codigos_representados: List[str],
     periodo: str,
     columna_agente: str = "Ag.transportista",
@@ -75,12 +63,11 @@ def listar_representados_con_viajes(
     columna_fecha: str = "Fecha ingreso",
 ) -> List[Tuple[str, str]]:
     # Retorna una lista de (codigo, nombre) solo para los que viajaron en el período dado.
-    df_local = df.copy()
-    mask_periodo = _build_period_mask(df_local, periodo, fecha_columna=columna_fecha)
-    serie_codigos = _normalize_code_series(df_local[columna_agente])
-    codigos_busqueda = [_normalize_code(c) for c in codigos_representados]
-    mask_codigo = serie_codigos.isin(codigos_busqueda)
-    df_periodo = df_local[mask_periodo & mask_codigo]
+    if df is None:
+        df = TripWarehouse.load(periodo, codigos_representados)
+    mask_periodo = _build_period_mask(df, periodo, fecha_columna=columna_fecha)
+    mask_codigo = CodeSet.from_codes(codigos_representados).mask(df, columna_agente)
+    df_periodo = df[mask_periodo.to_numpy() & mask_codigo]
 
     if df_periodo.empty:
         return []
@@ -109,12 +96,17 @@ def listar_representados_con_viajes(
 def filtrar_columnas_relevantes(
     df_viajes: pd.DataFrame,
     columnas: Optional[List[str]] = None,
-    precio_por_viaje: float = 40.0,
+    precio_por_viaje: Optional[float] = None,
+    file_type: str = FileTypes.INGRESOS,
 ) -> pd.DataFrame:
-    # Mantiene solo columnas relevantes y agrega la columna Precio con el valor por viaje.
+    # Mantiene solo columnas relevantes. Precio sale de las tarifas del tipo de archivo
+    # (se conserva si el manifiesto ya fue tarifado); con precio_por_viaje se usa ese valor fijo.
     columnas_finales = columnas or DEFAULT_COLUMNS_ORDER
-    df_out = df_viajes.copy()
-    df_out["Precio"] = float(precio_por_viaje)
+    if precio_por_viaje is None:
+        df_out = asegurar_tarifas(df_viajes, file_type).copy()
+    else:
+        df_out = df_viajes.copy()
+        df_out["Precio"] = float(precio_por_viaje)
     columnas_presentes = [c for c in columnas_finales if c in df_out.columns]
     # Asegurar que Precio esté si no venía del excel
     if "Precio" not in columnas_presentes:
@@ -124,10 +116,16 @@ def filtrar_columnas_relevantes(
 
 def calcular_estadisticas_viajes(
     df_viajes: pd.DataFrame,
-    precio_por_viaje: float = 40.0,
+    precio_por_viaje: Optional[float] = None,
+    file_type: str = FileTypes.INGRESOS,
 ) -> Dict[str, float]:
-    # Calcula totales para el bloque seleccionado.
+    # Calcula totales para el bloque seleccionado. Sin precio fijo el total es la suma
+    # de Precio según las tarifas del tipo de archivo y "precio_por_viaje" es el promedio.
     cantidad = int(len(df_viajes))
+    if precio_por_viaje is None:
+        total = float(asegurar_tarifas(df_viajes, file_type)["Precio"].sum())
+        precio_medio = total / cantidad if cantidad else 0.0
+        return {"cantidad_viajes": cantidad, "precio_por_viaje": precio_medio, "total": total}
     total = float(cantidad * float(precio_por_viaje))
     return {"cantidad_viajes": cantidad, "precio_por_viaje": float(precio_por_viaje), "total": total}
 
@@ -193,6 +191,9 @@ def exportar_pdf_viajes(
         "periodo": metadata.get("periodo", "-"),
         "total_viajes": metadata.get("total_viajes", "0"),
         "monto_total": _fmt_money(metadata.get('monto_total', 0)),
+        "percentil": metadata.get("percentil"),
+        "ranking": metadata.get("ranking"),
+        "distancia_mediana": metadata.get("distancia_mediana"),
         "columnas": columnas,
         "filas": filas,
         "logo_url": str(LOGO_PATH) if (logo_path or LOGO_PATH) else None,
@@ -210,20 +211,24 @@ def exportar_pdf_viajes(
 
 
 def generar_pdf_para_representado(
-    df_original: pd.DataFrame,
+    df_original: Optional[pd.DataFrame],
     codigo: str,
     periodo: str,
     nombre_representado: Optional[str],
-    precio_por_viaje: float = 40.0,
+    precio_por_viaje: Optional[float] = None,
     columnas: Optional[List[str]] = None,
     logo_path: Optional[str] = None,
     downloads_dir: Optional[Path] = None,
     file_type: str = "ingresos",
+    ranking: Optional[Dict[str, float]] = None,
 ) -> Path:
     # Genera el PDF para un representado específico y retorna la ruta.
+    # `ranking` es la fila de rank_against_market del representado (percentil frente al mercado).
+    # Con df_original=None los viajes salen del almacén de viajes.
     df_viajes = obtener_viajes_representado(df_original, codigo, periodo)
-    df_viajes = filtrar_columnas_relevantes(df_viajes, columnas=columnas, precio_por_viaje=precio_por_viaje)
-    stats = calcular_estadisticas_viajes(df_viajes, precio_por_viaje=precio_por_viaje)
+    df_viajes = filtrar_columnas_relevantes(df_viajes, columnas=columnas, precio_por_viaje=precio_por_viaje,
+                                            file_type=file_type)
+    stats = calcular_estadisticas_viajes(df_viajes, precio_por_viaje=precio_por_viaje, file_type=file_type)
     df_viajes_fmt = formatear_datos_para_visualizacion(df_viajes)
 
     downloads = downloads_dir or get_downloads_directory()
@@ -258,35 +263,48 @@ def generar_pdf_para_representado(
         "precio_por_viaje": str(stats["precio_por_viaje"]),
         "monto_total": str(stats["total"]),
     }
+    if ranking:
+        metadata["percentil"] = f"{ranking['percentil']:.0f}"
+        metadata["ranking"] = f"{int(ranking['ranking'])} de {int(ranking['total_agentes'])}"
+        metadata["distancia_mediana"] = f"{ranking['distancia_mediana']:+.0f}"
 
     return exportar_pdf_viajes(df_viajes_fmt, metadata, output_pdf_path, logo_path=logo_path, file_type=file_type)
 
 
 def generar_tabla_dinamica_resumen(
-    df: pd.DataFrame,
+    df: Optional[pd.DataFrame],
     periodo: str,
     codigos_representados: List[str],
     columna_agente: str = "Ag.transportista",
     columna_nombre: str = "Nombre Ag.Transportista",
     columna_fecha: str = "Fecha ingreso",
-    precio_por_viaje: float = 40.0,
+    precio_por_viaje: Optional[float] = None,
+    file_type: str = FileTypes.INGRESOS,
 ) -> pd.DataFrame:
     # Genera una tabla resumen con cada transporte, su total y cantidad de viajes (solo para representados)
-    df_local = df.copy()
-    mask_periodo = _build_period_mask(df_local, periodo, fecha_columna=columna_fecha)
-    serie_codigos = _normalize_code_series(df_local[columna_agente])
-    codigos_busqueda = [_normalize_code(c) for c in codigos_representados]
-    mask_representados = serie_codigos.isin(codigos_busqueda)
-    df_periodo = df_local[mask_periodo & mask_representados]
+    # Sin df se usa el almacén de viajes del período. Sin precio fijo se suman las tarifas del tipo de archivo.
+    if df is None:
+        df = TripWarehouse.load(periodo, codigos_representados)
+    if precio_por_viaje is None:
+        df = asegurar_tarifas(df, file_type)
+    mask_periodo = _build_period_mask(df, periodo, fecha_columna=columna_fecha)
+    mask_representados = CodeSet.from_codes(codigos_representados).mask(df, columna_agente)
+    df_periodo = df[mask_periodo.to_numpy() & mask_representados]
     
     if df_periodo.empty:
         return pd.DataFrame(columns=["Nombre Ag. Transportista", "Suma de PRECIO", "Cantidad de Viajes"])
     
-    # Agrupar por agente transportista y contar viajes
-    resumen = df_periodo.groupby([columna_agente, columna_nombre]).size().reset_index(name='Cantidad de Viajes')
-    
-    # Agregar precio total
-    resumen["Suma de PRECIO"] = resumen["Cantidad de Viajes"] * precio_por_viaje
+    # Agrupar por agente transportista: cantidad de viajes y suma de precios
+    if precio_por_viaje is None:
+        resumen = (
+            df_periodo.groupby([columna_agente, columna_nombre])["Precio"]
+            .agg(['size', 'sum'])
+            .rename(columns={'size': 'Cantidad de Viajes', 'sum': 'Suma de PRECIO'})
+            .reset_index()
+        )
+    else:
+        resumen = df_periodo.groupby([columna_agente, columna_nombre]).size().reset_index(name='Cantidad de Viajes')
+        resumen["Suma de PRECIO"] = resumen["Cantidad de Viajes"] * precio_por_viaje
     
     # Ordenar por nombre (alfabético por defecto)
     resumen = resumen.sort_values(columna_nombre)
@@ -1,19 +1,32 @@
 # Paquete de servicios refactorizados de SigmAnalytics
 
-from .data_processor import DataProcessor
+from .data_processor import DataProcessor, get_data_processor
 from .analytics_service import AnalyticsService
 from .chart_service import ChartService
 from .file_service import FileService
 from .representados_contactos import list_codes, get_contact_info, upsert_contact_info
 from .gmail_service import GmailDraftService
+from .lastres_matcher import LastresMatcher
+from .route_cube import RouteCube
+from .what_if import WhatIfEvaluator
+from .anomaly_scan import AnomalyScanner
+from .trip_sketch import TripSketch
+from .agent_facts import AgentFacts
 
 __all__ = [
     'DataProcessor',
+    'get_data_processor',
     'AnalyticsService',
     'ChartService',
     'FileService',
     'list_codes',
     'get_contact_info', 
     'upsert_contact_info',
-    'GmailDraftService'
+    'GmailDraftService',
+    'LastresMatcher',
+    'RouteCube',
+    'WhatIfEvaluator',
+    'AnomalyScanner',
+    'TripSketch',
+    'AgentFacts'
 ]
@@ -0,0 +1,160 @@
+# Bitmaps de actividad de agentes por período para consultas de altas, bajas y cohortes
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns
+from src.models import db
+from src.services.code_set import CodeSet, manifest_codes, INVALID_CODE
+from src.services.rolling_metrics import shift_period
+
+# Bits encendidos por cada valor de byte (popcount por tabla)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class ActivityIndex:
+    """
+    Un bitmap empaquetado (np.packbits) por período con los agentes que tuvieron
+    viajes; cada código de agente tiene un id denso que es la posición de su bit.
+    Las consultas de altas, bajas, rachas y retención por cohorte son
+    operaciones AND/OR/NOT sobre bytes, sin volver a leer manifiestos.
+    """
+
+    def __init__(self):
+        self._bitmaps: Optional[Dict[str, np.ndarray]] = None
+        self._ids: Dict[int, int] = {}
+        self._codes_by_id = np.empty(0, dtype=np.int64)
+
+    # Carga y persistencia
+    def _ensure_loaded(self) -> None:
+        if self._bitmaps is not None:
+            return
+        self._set_ids(db.obtener_ids_agentes())
+        self._bitmaps = {
+            periodo: np.frombuffer(bitmap, dtype=np.uint8)
+            for periodo, _n_bits, bitmap in db.obtener_bitmaps_actividad()
+        }
+
+    def _set_ids(self, ids: Dict[int, int]) -> None:
+        self._ids = ids
+        self._codes_by_id = np.full(len(ids), INVALID_CODE, dtype=np.int64)
+        if ids:
+            self._codes_by_id[np.fromiter(ids.values(), dtype=np.int64)] = np.fromiter(ids.keys(), dtype=np.int64)
+
+    def invalidate(self) -> None:
+        """Descarta la caché en memoria (p. ej. si otra instancia escribió en la base)"""
+        self._bitmaps = None
+
+    @property
+    def _n_bytes(self) -> int:
+        return (len(self._ids) + 7) // 8
+
+    def _pack_ids(self, ids: np.ndarray) -> np.ndarray:
+        bits = np.zeros(self._n_bytes * 8, dtype=bool)
+        bits[ids] = True
+        return np.packbits(bits)
+
+    def record_period(self, df: pd.DataFrame, period: str,
+                      code_column: str = Columns.AGENT_CODE) -> int:
+        """
+        Registra el bitmap de actividad del período a partir del manifiesto.
+        Retorna la cantidad de agentes activos.
+        """
+        self._ensure_loaded()
+        codigos = np.unique(manifest_codes(df, code_column))
+        codigos = codigos[codigos != INVALID_CODE]
+
+        db.crear_tabla_si_no_existe()
+        self._set_ids(db.asignar_ids_agentes(codigos.tolist()))
+        ids = np.array([self._ids[int(c)] for c in codigos], dtype=np.int64)
+
+        bitmap = self._pack_ids(ids)
+        db.guardar_bitmap_actividad(period, len(self._ids), bitmap.tobytes())
+        self._bitmaps[period] = bitmap
+        return len(ids)
+
+    # Operaciones sobre bitmaps
+    def _get(self, period: str) -> np.ndarray:
+        """Bitmap del período con el ancho actual (los ids nuevos quedan en 0)"""
+        self._ensure_loaded()
+        bitmap = self._bitmaps.get(period)
+        out = np.zeros(self._n_bytes, dtype=np.uint8)
+        if bitmap is not None:
+            out[:len(bitmap)] = bitmap[:self._n_bytes]
+        return out
+
+    def _codes_bitmap(self, codes: Union[List[str], CodeSet]) -> np.ndarray:
+        """Bitmap de un conjunto de códigos (los que nunca viajaron no tienen id)"""
+        self._ensure_loaded()
+        ids = [self._ids[int(c)] for c in CodeSet.from_codes(codes).codes if int(c) in self._ids]
+        return self._pack_ids(np.array(ids, dtype=np.int64))
+
+    @staticmethod
+    def count(bitmap: np.ndarray) -> int:
+        return int(_POPCOUNT[bitmap].sum())
+
+    def decode(self, bitmap: np.ndarray) -> List[str]:
+        """Códigos (texto normalizado) de los bits encendidos"""
+        ids = np.flatnonzero(np.unpackbits(bitmap)[:len(self._codes_by_id)])
+        return [str(c) for c in np.sort(self._codes_by_id[ids])]
+
+    @property
+    def periods(self) -> List[str]:
+        self._ensure_loaded()
+        return sorted(self._bitmaps)
+
+    # Consultas
+    def active_agents(self, period: str) -> np.ndarray:
+        return self._get(period)
+
+    def new_agents(self, period: str, previous: Optional[str] = None) -> np.ndarray:
+        """Agentes activos en `period` que no lo estaban en el período anterior"""
+        return self._get(period) & ~self._get(previous or shift_period(period, -1))
+
+    def lost_agents(self, period: str, previous: Optional[str] = None) -> np.ndarray:
+        """Agentes activos en el período anterior que no tuvieron viajes en `period`"""
+        return self._get(previous or shift_period(period, -1)) & ~self._get(period)
+
+    def active_streak(self, period: str, months: int,
+                      codes: Optional[Union[List[str], CodeSet]] = None) -> np.ndarray:
+        """Agentes (opcionalmente solo `codes`) activos los `months` meses consecutivos que terminan en `period`"""
+        result = self._get(period)
+        for k in range(1, months):
+            result = result & self._get(shift_period(period, -k))
+        if codes is not None:
+            result = result & self._codes_bitmap(codes)
+        return result
+
+    def cohort_retention(self, cohort_period: str, horizon: Optional[int] = None,
+                         codes: Optional[Union[List[str], CodeSet]] = None) -> pd.DataFrame:
+        """
+        Cohorte = agentes activos por primera vez en `cohort_period`. Retorna por
+        cada período posterior registrado cuántos siguen activos y el % retenido.
+        """
+        self._ensure_loaded()  # El ancho de los bitmaps depende de los ids cargados
+        earlier = np.zeros(self._n_bytes, dtype=np.uint8)
+        for period in self.periods:
+            if period < cohort_period:
+                earlier |= self._get(period)
+
+        cohort = self._get(cohort_period) & ~earlier
+        if codes is not None:
+            cohort &= self._codes_bitmap(codes)
+        size = self.count(cohort)
+
+        last = shift_period(cohort_period, horizon) if horizon else "9999-99"
+        rows = []
+        for period in self.periods:
+            if cohort_period < period <= last:
+                active = self.count(cohort & self._get(period))
+                rows.append({
+                    'periodo': period,
+                    'activos': active,
+                    'retencion': active / size * 100 if size else 0.0,
+                })
+        return pd.DataFrame(rows, columns=['periodo', 'activos', 'retencion']).assign(cohorte=size)
+
+
+# Instancia compartida (mantiene los bitmaps en memoria entre consultas)
+activity_index = ActivityIndex()
@@ -0,0 +1,105 @@
+# Tabla de hechos por agente y período: viajes y monto guardados al ingresar cada manifiesto
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns, FileTypes
+from src.models import db
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int, INVALID_CODE
+from src.services.tarifas import asegurar_tarifas
+
+
+class AgentFacts:
+    """
+    Una fila por (período, agente) con viajes, monto y si es representado,
+    escrita en bloque al guardar cada período. Boxplots históricos, rankings
+    y tendencias por representado se consultan en SQLite sin volver al Excel.
+    """
+
+    COLUMNS = ['periodo', 'codigo', 'nombre', 'viajes', 'es_representado', 'monto']
+
+    @staticmethod
+    def from_df(df: pd.DataFrame, codes: Union[List[str], CodeSet], period: str,
+                file_type: str = FileTypes.INGRESOS,
+                code_column: str = Columns.AGENT_CODE,
+                name_column: str = Columns.AGENT_NAME) -> pd.DataFrame:
+        """
+        Hechos del manifiesto en una sola agrupación por código. El monto sale
+        de la columna Precio (se tarifa el manifiesto si todavía no lo está).
+        """
+        df = asegurar_tarifas(df, file_type)
+        codigos = manifest_codes(df, code_column)
+        valid = codigos != INVALID_CODE
+        if not valid.any():
+            return pd.DataFrame(columns=AgentFacts.COLUMNS)
+
+        rows = pd.DataFrame({
+            'codigo': codigos[valid],
+            'nombre': df[name_column].to_numpy(dtype=object)[valid],
+            'monto': pd.to_numeric(df[Columns.PRICE], errors='coerce').to_numpy(dtype=np.float64)[valid],
+        })
+        grupos = rows.groupby('codigo', sort=True)
+        facts = pd.DataFrame({
+            'viajes': grupos.size(),
+            'monto': grupos['monto'].sum(min_count=1),  # NULL si ninguna fila tiene precio
+        })
+
+        # Nombre más frecuente de cada código (en empate, el menor)
+        por_nombre = rows.dropna(subset=['nombre']).astype({'nombre': str}).groupby(['codigo', 'nombre']).size()
+        nombres = (
+            por_nombre.rename('frecuencia').reset_index()
+            .sort_values(['codigo', 'frecuencia', 'nombre'], ascending=[True, False, True], kind='stable')
+            .drop_duplicates('codigo')
+            .set_index('codigo')['nombre']
+        )
+
+        facts = facts.reset_index()
+        facts['periodo'] = period
+        facts['nombre'] = facts['codigo'].map(nombres).fillna("")
+        facts['es_representado'] = CodeSet.from_codes(codes).contains(facts['codigo'].to_numpy(dtype=np.int64))
+        return facts[AgentFacts.COLUMNS]
+
+    @classmethod
+    def store(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet], period: str,
+              file_type: str = FileTypes.INGRESOS) -> int:
+        """Reemplaza los hechos del período (un único executemany). Retorna las filas escritas."""
+        return cls.store_facts(period, cls.from_df(df, codes, period, file_type))
+
+    @staticmethod
+    def store_facts(period: str, facts: pd.DataFrame) -> int:
+        """Guarda hechos ya calculados (p. ej. en un proceso hijo del backfill)"""
+        filas = [
+            (int(r.codigo), r.nombre, int(r.viajes), int(bool(r.es_representado)),
+             None if pd.isna(r.monto) else float(r.monto))
+            for r in facts.itertuples(index=False)
+        ]
+        return db.reemplazar_hechos_periodo(period, filas)
+
+    # Consultas
+    @staticmethod
+    def period_counts(period: str) -> pd.Series:
+        """
+        Viajes por (es_representado, agente) del período, con la misma forma que
+        DataProcessor.grouped_counts: sirve para boxplots y barras históricos.
+        """
+        facts = db.obtener_hechos(period, period)
+        facts = facts[facts['nombre'] != ""]
+        return facts.groupby([facts['es_representado'].astype(bool), facts['nombre']])['viajes'].sum()
+
+    @staticmethod
+    def ranking(period: str, solo_representados: bool = False,
+                limit: Optional[int] = None) -> pd.DataFrame:
+        """Agentes del período ordenados por viajes (puesto 1 = más viajes; empates comparten puesto)"""
+        facts = db.obtener_hechos(period, period, solo_representados=solo_representados)
+        facts = facts.sort_values(['viajes', 'codigo'], ascending=[False, True], kind='stable')
+        facts['ranking'] = facts['viajes'].rank(method='min', ascending=False).astype(int)
+        return facts.head(limit) if limit else facts
+
+    @staticmethod
+    def trend(codigo: str, desde: Optional[str] = None, hasta: Optional[str] = None) -> pd.DataFrame:
+        """Serie de viajes y monto de un agente (código en cualquier formato)"""
+        key = normalize_code_int(codigo)
+        if key == INVALID_CODE:
+            return pd.DataFrame(columns=['periodo', 'viajes', 'monto'])
+        return db.obtener_hechos(desde, hasta, codigo=key)[['periodo', 'viajes', 'monto']].reset_index(drop=True)
@@ -2,15 +2,37 @@
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
 try:
-    from src.services.data_processor import DataProcessor
-    from src.constants import Columns
+    from src.services.data_processor import DataProcessor, get_data_processor
+    from src.services.parallel_stats import ParallelStatsExecutor
+    from src.services.route_cube import RouteCube
+    from src.services.rolling_metrics import RollingMetrics
+    from src.services.activity_index import activity_index
+    from src.services.manifest_analysis import ManifestAnalysis
+    from src.services.what_if import WhatIfEvaluator
+    from src.services.anomaly_scan import AnomalyScanner
+    from src.services.trip_sketch import TripSketch
+    from src.services.period_comparison import PeriodComparison
+    from src.services.agent_facts import AgentFacts
+    from src.services.trip_warehouse import TripWarehouse
+    from src.constants import Columns, Parallel, FileTypes, HistoricalTables
     from src.models import db
 except ImportError:
     # Fallback para imports relativos
-    from .data_processor import DataProcessor
+    from .data_processor import DataProcessor, get_data_processor
+    from .parallel_stats import ParallelStatsExecutor
+    from .route_cube import RouteCube
+    from .rolling_metrics import RollingMetrics
+    from .activity_index import activity_index
+    from .manifest_analysis import ManifestAnalysis
+    from .what_if import WhatIfEvaluator
+    from .anomaly_scan import AnomalyScanner
+    from .trip_sketch import TripSketch
+    from .period_comparison import PeriodComparison
+    from .agent_facts import AgentFacts
+    from .trip_warehouse import TripWarehouse
     import sys
     sys.path.append('..')
-    from constants import Columns
+    from constants import Columns, Parallel, FileTypes, HistoricalTables
     from models import db
 
 
@@ -18,7 +40,25 @@ class AnalyticsService:
     """Servicio que maneja los cálculos de análisis sin generar gráficos"""
     
     def __init__(self):
-        self.data_processor = DataProcessor()
+        self.data_processor = get_data_processor()
+        self._parquet_engine = None
+    
+    def get_parquet_engine(self):
+        """
+        Motor DuckDB sobre el dataset Parquet ("almacen_parquet" en config.json).
+        Retorna None si está desactivado o si duckdb no está instalado.
+        """
+        if self._parquet_engine is None:
+            from src.models.config_manager import config_manager
+            if not config_manager.get("almacen_parquet", False):
+                return None
+            try:
+                from src.services.duckdb_analytics import DuckDBAnalytics
+                self._parquet_engine = DuckDBAnalytics()
+            except ImportError as e:
+                print(f"DEBUG: Almacén Parquet no disponible ({e})")
+                return None
+        return self._parquet_engine
     
     def calculate_all_metrics(self, df: pd.DataFrame, codes: List[str]) -> Dict[str, float]:
         """
@@ -26,6 +66,21 @@ class AnalyticsService:
         """
         return self.data_processor.calculate_grouped_stats(df, codes)
     
+    def calculate_consolidated_metrics(self, df: pd.DataFrame, codes: List[str],
+                                       partition_by: str = Parallel.PARTITION_BY_PERIOD) -> Dict[str, float]:
+        """
+        Igual que calculate_all_metrics pero para DataFrames consolidados de varios
+        períodos o clientes: el conteo por agente se reparte entre procesos.
+        """
+        return ParallelStatsExecutor(partition_by=partition_by).calculate_grouped_stats(df, codes)
+    
+    def evaluate_what_if(self, df: pd.DataFrame, code_sets) -> pd.DataFrame:
+        """
+        Métricas de calculate_grouped_stats para muchos conjuntos de códigos
+        candidatos (lista o {escenario: códigos}) en una sola operación matricial.
+        """
+        return WhatIfEvaluator(df).evaluate(code_sets)
+    
     def calculate_participation(self, df: pd.DataFrame, codes: List[str]) -> float:
         """Calcula el porcentaje de participación de representados"""
         stats = self.calculate_all_metrics(df, codes)
@@ -35,37 +90,58 @@ class AnalyticsService:
         """Obtiene el período del DataFrame"""
         return self.data_processor.extract_period_from_df(df)
     
-    def should_update_historical(self, df: pd.DataFrame) -> Tuple[bool, Optional[str]]:
+    def should_update_historical(self, df: pd.DataFrame,
+                                 period: Optional[str] = None) -> Tuple[bool, Optional[str]]:
         """
         Determina si se debe actualizar el histórico.
         Retorna: (should_update, period)
         """
-        period = self.get_period_from_df(df)
+        period = period or self.get_period_from_df(df)
         if not period:
             return False, None
         
-        # Verificar si el período ya existe
-        period_exists = db.existe_periodo(period)
-        most_recent_period = db.get_periodo_mas_reciente()
-        
+        # Existencia y período más reciente en una sola consulta
+        period_exists, most_recent_period = db.obtener_estado_periodo(period)
+        return self._is_new_period(period, period_exists, most_recent_period), period
+    
+    @staticmethod
+    def _is_new_period(period: str, period_exists: bool, most_recent_period: Optional[str]) -> bool:
         # Solo actualizar si es nuevo y no es anterior al más reciente
-        should_update = (not period_exists and 
-                        (most_recent_period is None or period > most_recent_period))
-        
-        return should_update, period
+        return (not period_exists and 
+                (most_recent_period is None or period > most_recent_period))
     
-    def update_historical_data(self, df: pd.DataFrame, codes: List[str]) -> Tuple[bool, Optional[str]]:
+    def update_historical_data(self, df: pd.DataFrame, codes: List[str],
+                               analysis: Optional[ManifestAnalysis] = None) -> Tuple[bool, Optional[str]]:
         """
-        Actualiza los datos históricos si corresponde.
+        Actualiza los datos históricos si corresponde. Si se pasa el análisis del
+        manifiesto se reutilizan su período y sus métricas.
         Retorna: (was_updated, period)
         """
-        should_update, period = self.should_update_historical(df)
+        should_update, period = self.should_update_historical(df, analysis.period if analysis else None)
         
         if not should_update or not period:
             return False, period
         
-        # Calcular métricas
-        metrics = self.calculate_all_metrics(df, codes)
+        return self._store_period(df, codes, period,
+                                  analysis.metrics if analysis else None,
+                                  analysis.concentration if analysis else None,
+                                  analysis.counts if analysis else None), period
+    
+    def _store_period(self, df: pd.DataFrame, codes: List[str], period: str,
+                      metrics: Optional[Dict[str, float]] = None,
+                      concentration: Optional[Dict[str, float]] = None,
+                      counts: Optional[pd.Series] = None) -> bool:
+        """
+        Guarda un período nuevo: registro histórico, métricas móviles, bitmap de
+        actividad, sketches de viajes, hechos por agente, viajes individuales
+        y la partición Parquet (si está activada)
+        """
+        if metrics is None:
+            metrics = self.calculate_all_metrics(df, codes)
+        if counts is None:
+            counts = self.data_processor.grouped_counts(df, codes)
+        if concentration is None:
+            concentration = DataProcessor.concentration_from_df(df)
         
         # Insertar en base de datos
         try:
@@ -75,61 +151,182 @@ class AnalyticsService:
                 metrics['mediana_otros'], 
                 metrics['promedio_representados'],
                 metrics['promedio_otros'],
-                metrics['participacion'] # por ahora no tiene uso en la logica de la app, 
-                                         # pero se mantiene para futuras implementaciones
-                
+                metrics['participacion'], # por ahora no tiene uso en la logica de la app, 
+                                          # pero se mantiene para futuras implementaciones
+                concentration
             )
-            return True, period
         except Exception as e:
             print(f"Error actualizando histórico: {e}")
-            return False, period
+            return False
+        
+        # Métricas móviles: solo se recalculan las ventanas que incluyen este período
+        try:
+            ventanas = RollingMetrics.ingest_period(df, codes, period)
+            print(f"DEBUG: Métricas móviles actualizadas ({ventanas} ventanas)")
+        except Exception as e:
+            print(f"Error actualizando métricas móviles: {e}")
+        
+        # Bitmap de agentes activos del período (altas, bajas y cohortes)
+        try:
+            activos = activity_index.record_period(df, period)
+            print(f"DEBUG: Bitmap de actividad guardado ({activos} agentes activos)")
+        except Exception as e:
+            print(f"Error guardando bitmap de actividad: {e}")
+        
+        # Distribución de viajes por agente combinable entre períodos
+        try:
+            TripSketch.store_period(period, *DataProcessor._split_counts_by_flag(counts))
+        except Exception as e:
+            print(f"Error guardando sketches de viajes: {e}")
+        
+        # Hechos por agente (viajes y monto) en un solo executemany
+        try:
+            filas = AgentFacts.store(df, codes, period)
+            print(f"DEBUG: Hechos por agente guardados ({filas} filas)")
+        except Exception as e:
+            print(f"Error guardando hechos por agente: {e}")
+        
+        # Viajes individuales del manifiesto (opcional, "almacenar_viajes" en config.json)
+        if TripWarehouse.is_enabled():
+            try:
+                filas = TripWarehouse.store(df, period)
+                print(f"DEBUG: Viajes guardados en el almacén ({filas} filas)")
+            except Exception as e:
+                print(f"Error guardando viajes: {e}")
+        
+        # Partición Parquet del período para consultas entre períodos con DuckDB (opcional)
+        engine = self.get_parquet_engine()
+        if engine is not None:
+            try:
+                filas = engine.write_period(df, period)
+                print(f"DEBUG: Partición Parquet escrita ({filas} filas)")
+            except Exception as e:
+                print(f"Error escribiendo partición Parquet: {e}")
+        return True
     
-    def get_historical_data(self) -> pd.DataFrame:
-        """Obtiene todos los datos históricos"""
-        return db.obtener_historico_completo()
+    def get_historical_data(self, file_type: str = FileTypes.INGRESOS) -> pd.DataFrame:
+        """Obtiene todos los datos históricos (de ingresos o de lastres)"""
+        return db.obtener_historico_completo(HistoricalTables.BY_FILE_TYPE[file_type])
     
-    def process_manifest_data(self, df: pd.DataFrame, codes: List[str]) -> Dict[str, any]:
+    def get_range_stats(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict[str, float]:
         """
-        Procesa los datos del manifiesto y retorna toda la información necesaria.
+        Medianas, promedios y percentiles de viajes por agente de un rango de
+        períodos (p. ej. varios años) combinando los sketches guardados
         """
-        print(f"DEBUG: Procesando manifiesto con {len(df)} filas y {len(codes)} códigos")
+        return TripSketch.range_stats(desde, hasta)
+    
+    def get_year_to_date_stats(self, period: str) -> Dict[str, float]:
+        """Estadísticas acumuladas del año hasta `period` inclusive"""
+        return TripSketch.year_to_date(period)
+    
+    def compare_periods(self, a, b, codes: Optional[List[str]] = None) -> Dict[str, object]:
+        """
+        Compara dos períodos ("YYYY-MM") o rangos ((desde, hasta)) con los
+        agregados guardados: diferencias por agente, agentes nuevos y perdidos
+        y cambio de métricas. Con el almacén Parquet activado las medianas de
+        rangos de varios meses se calculan exactas con DuckDB. Ver
+        PeriodComparison.compare.
+        """
+        return PeriodComparison.compare(a, b, codes, engine=self.get_parquet_engine())
+    
+    def analyze_manifest(self, df: pd.DataFrame, codes: List[str],
+                         file_type: str = FileTypes.INGRESOS) -> ManifestAnalysis:
+        """
+        Analiza el manifiesto una sola vez (período, métricas, conteos, cubo de
+        rutas y nombres) y actualiza el histórico de su tipo si corresponde
+        (historico para ingresos, historico_lastres para lastres).
+        """
+        print(f"DEBUG: Analizando manifiesto con {len(df)} filas y {len(codes)} códigos")
+        analysis = ManifestAnalysis.from_df(df, codes, file_type, self.data_processor)
+        print(f"DEBUG: Métricas calculadas: {analysis.metrics}")
+        print(f"DEBUG: Período obtenido: {analysis.period}")
         
-        # Calcular métricas principales
-        print("DEBUG: Calculando métricas...")
-        metrics = self.calculate_all_metrics(df, codes)
-        print(f"DEBUG: Métricas calculadas: {metrics}")
+        if not analysis.period:
+            analysis.is_preview = file_type == FileTypes.LASTRES
+            return analysis
         
-        print("DEBUG: Obteniendo período...")
-        period = self.get_period_from_df(df)
-        print(f"DEBUG: Período obtenido: {period}")
+        if file_type == FileTypes.LASTRES:
+            # Los lastres tienen su propia serie (historico_lastres) con las mismas métricas
+            return self._analyze_lastres(analysis)
         
-        # Determinar si actualizar histórico
-        print("DEBUG: Verificando actualización histórica...")
-        historical_updated, _ = self.update_historical_data(df, codes)
-        print(f"DEBUG: Histórico actualizado: {historical_updated}")
+        # Estado del histórico con una sola conexión
+        period_exists, most_recent_period = db.obtener_estado_periodo(analysis.period)
+        if self._is_new_period(analysis.period, period_exists, most_recent_period):
+            analysis.historical_updated = self._store_period(df, codes, analysis.period,
+                                                                analysis.metrics, analysis.concentration,
+                                                                analysis.counts)
+        print(f"DEBUG: Histórico actualizado: {analysis.historical_updated}")
         
-        # Determinar si es preview (período anterior al más reciente)
-        print("DEBUG: Verificando si es preview...")
-        most_recent_period = db.get_periodo_mas_reciente()
         # Es preview solo si el período actual es ANTERIOR al más reciente
-        is_preview = (
+        analysis.is_preview = (
             most_recent_period is not None
-            and period is not None
-            and period < most_recent_period
+            and analysis.period < most_recent_period
         )
-        print(f"DEBUG: Es preview: {is_preview} (período actual: {period}, más reciente: {most_recent_period})")
+        print(f"DEBUG: Es preview: {analysis.is_preview} (período actual: {analysis.period}, más reciente: {most_recent_period})")
+        
+        # Saltos y caídas de volumen de los representados en el período cargado
+        try:
+            analysis.anomalies = self.scan_anomalies(analysis.period, codes)
+            print(f"DEBUG: Anomalías detectadas: {len(analysis.anomalies)}")
+        except Exception as e:
+            print(f"Error detectando anomalías: {e}")
+        return analysis
+    
+    def _analyze_lastres(self, analysis: ManifestAnalysis) -> ManifestAnalysis:
+        """Guarda el período de lastres en historico_lastres si es nuevo"""
+        tabla = HistoricalTables.LASTRES
+        period_exists, most_recent_period = db.obtener_estado_periodo(analysis.period, tabla=tabla)
+        if self._is_new_period(analysis.period, period_exists, most_recent_period):
+            try:
+                analysis.historical_updated = db.insertar_registro(
+                    analysis.period,
+                    analysis.metrics['mediana_representados'],
+                    analysis.metrics['mediana_otros'],
+                    analysis.metrics['promedio_representados'],
+                    analysis.metrics['promedio_otros'],
+                    analysis.metrics['participacion'],
+                    analysis.concentration,
+                    tabla=tabla
+                )
+            except Exception as e:
+                print(f"Error actualizando histórico de lastres: {e}")
+        print(f"DEBUG: Histórico de lastres actualizado: {analysis.historical_updated}")
+        
+        analysis.is_preview = most_recent_period is not None and analysis.period < most_recent_period
+        return analysis
+    
+    def scan_anomalies(self, period: Optional[str] = None,
+                       codes: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Representados con saltos o caídas de volumen según el histórico de
+        conteos mensuales (z-score robusto mediana/MAD). Con `period` solo se
+        reportan las de ese mes.
+        """
+        return AnomalyScanner.scan(codes, period)
+    
+    def process_manifest_data(self, df: pd.DataFrame, codes: List[str]) -> Dict[str, any]:
+        """
+        Procesa los datos del manifiesto y retorna toda la información necesaria.
+        """
+        analysis = self.analyze_manifest(df, codes)
         
         result = {
-            'metrics': metrics,
-            'period': period,
-            'historical_updated': historical_updated,
-            'is_preview': is_preview,
-            'viajes_representados': metrics['total_viajes_representados']
+            'metrics': analysis.metrics,
+            'period': analysis.period,
+            'historical_updated': analysis.historical_updated,
+            'is_preview': analysis.is_preview,
+            'viajes_representados': analysis.viajes_representados,
+            'route_cube': analysis.route_cube,
+            'analysis': analysis
         }
         
         print("DEBUG: Procesamiento de manifiesto completado")
         return result
     
+    def build_route_cube(self, df: pd.DataFrame, codes: Optional[List[str]] = None) -> RouteCube:
+        """Agregación por período, agente, ruta y aduana para consultas sin re-filtrar el manifiesto"""
+        return RouteCube.from_df(df, codes)
+    
     def get_agents_for_period(self, df: pd.DataFrame, codes: List[str], 
                              period: str) -> List[Tuple[str, str]]:
         """Obtiene agentes que tuvieron viajes en un período específico"""
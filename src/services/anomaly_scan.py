@@ -0,0 +1,145 @@
+# Detección vectorizada de saltos y caídas de volumen sobre la matriz agente × período
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.constants import Anomalies, Rolling
+from src.models import db
+from src.services.code_set import CodeSet
+
+ANOMALY_COLUMNS = ['periodo', 'codigo', 'nombre', 'viajes', 'mediana_base', 'z', 'tipo']
+
+
+class AnomalyScanner:
+    """
+    Arma la matriz densa agente × período con los conteos mensuales guardados
+    (métricas móviles, ventana 1) y calcula para todos los agentes a la vez un
+    z-score robusto de cada mes contra los meses previos:
+    z = (viajes - mediana) / max(1.4826 · MAD, piso).
+    """
+
+    @staticmethod
+    def build_matrix(monthly: pd.DataFrame) -> Tuple[np.ndarray, pd.Index, pd.Index, pd.DataFrame]:
+        """
+        Matriz de viajes (agentes × períodos cargados, 0 donde el agente no viajó),
+        con los índices de códigos y períodos y el último nombre/flag de cada agente.
+        """
+        # Los códigos se guardan como texto: se factoriza el texto y se ordena por valor numérico
+        agent_ids, agents = pd.factorize(monthly['codigo'].astype(str))
+        agents = agents.to_numpy(dtype=object).astype(np.int64)
+        by_value = np.argsort(agents, kind='stable')
+        agent_ids = np.argsort(by_value)[agent_ids]
+        agents = agents[by_value]
+        period_ids, periods = pd.factorize(monthly['periodo'], sort=True)
+        n_agents, n_periods = len(agents), len(periods)
+        matrix = np.bincount(
+            agent_ids * n_periods + period_ids,
+            weights=monthly['viajes'].to_numpy(dtype=np.float64),
+            minlength=n_agents * n_periods,
+        ).reshape(n_agents, n_periods)
+
+        # Nombre del período más reciente de cada agente y si fue representado en alguno
+        order = np.lexsort((period_ids, agent_ids))
+        last = order[np.r_[np.flatnonzero(np.diff(agent_ids[order])), len(order) - 1]]
+        flags = monthly['es_representado'].to_numpy(dtype=np.int64) > 0
+        info = pd.DataFrame({
+            'nombre': monthly['nombre'].to_numpy(dtype=object)[last],
+            'es_representado': np.bincount(agent_ids, weights=flags, minlength=n_agents) > 0,
+        }, index=pd.Index(agents.astype(str), name='codigo'))
+        agents = info.index
+        return matrix, agents, periods, info
+
+    @staticmethod
+    def _sorted_median(sorted_values: np.ndarray, k: np.ndarray) -> np.ndarray:
+        """Mediana de los primeros k[t] valores (ya ordenados) de cada ventana"""
+        lo = np.maximum((k - 1) // 2, 0)[None, :, None]
+        hi = (k // 2)[None, :, None]
+        lo_values = np.take_along_axis(sorted_values, np.broadcast_to(lo, sorted_values.shape[:2] + (1,)), axis=2)
+        hi_values = np.take_along_axis(sorted_values, np.broadcast_to(hi, sorted_values.shape[:2] + (1,)), axis=2)
+        median = (lo_values[:, :, 0] + hi_values[:, :, 0]) / 2
+        median[:, k == 0] = np.nan
+        return median
+
+    @classmethod
+    def robust_zscores(cls, matrix: np.ndarray, window: int = Anomalies.WINDOW,
+                       min_history: int = Anomalies.MIN_HISTORY) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        z-scores y mediana de referencia de cada celda contra los `window` meses
+        anteriores (NaN si hay menos de `min_history` meses previos).
+        """
+        n_agents, n_periods = matrix.shape
+        # Relleno con NaN a la izquierda: la referencia del mes t son las columnas [t-window, t)
+        padded = np.concatenate([np.full((n_agents, window), np.nan), matrix], axis=1)
+        history = sliding_window_view(padded, window, axis=1)[:, :n_periods]
+
+        # Meses previos disponibles por columna: el NaN queda al final al ordenar,
+        # así la mediana sale de las posiciones centrales de los k valores válidos
+        k = np.minimum(np.arange(n_periods), window)
+        median = cls._sorted_median(np.sort(history, axis=2), k)
+        mad = cls._sorted_median(np.sort(np.abs(history - median[:, :, None]), axis=2), k)
+
+        sigma = np.maximum(Anomalies.MAD_SCALE * mad, Anomalies.MIN_SIGMA)
+        z = (matrix - median) / sigma
+        enough = np.arange(n_periods) >= min_history
+        z[:, ~enough] = np.nan
+        return z, median
+
+    @classmethod
+    def scan(cls, codes: Optional[Union[List[str], CodeSet]] = None,
+             period: Optional[str] = None,
+             window: int = Anomalies.WINDOW,
+             threshold: float = Anomalies.Z_THRESHOLD,
+             monthly: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Representados con saltos ('salto') o caídas ('caida') de volumen.
+        Sin `codes` se usa el flag es_representado guardado; con `period` solo se
+        reportan las anomalías de ese mes. Ordenado por |z| descendente.
+        """
+        if monthly is None:
+            monthly = db.obtener_metricas_moviles(Rolling.MONTHLY, hasta=period)
+        if monthly.empty:
+            return pd.DataFrame(columns=ANOMALY_COLUMNS)
+
+        matrix, agents, periods, info = cls.build_matrix(monthly)
+        z, median = cls.robust_zscores(matrix, window)
+
+        if codes is not None:
+            representados = CodeSet.from_codes(codes).contains(agents.to_numpy(dtype=object).astype(np.int64))
+        else:
+            representados = info['es_representado'].to_numpy()
+
+        flagged = (
+            (np.abs(z) >= threshold)
+            & (np.abs(matrix - median) >= Anomalies.MIN_DELTA)
+            & representados[:, None]
+        )
+        if period is not None:
+            flagged[:, periods != period] = False
+
+        rows, cols = np.nonzero(flagged)
+        result = pd.DataFrame({
+            'periodo': periods.to_numpy()[cols],
+            'codigo': agents.to_numpy()[rows],
+            'nombre': info['nombre'].to_numpy()[rows],
+            'viajes': matrix[rows, cols].astype(int),
+            'mediana_base': median[rows, cols],
+            'z': z[rows, cols],
+        })
+        result['tipo'] = np.where(result['z'] > 0, 'salto', 'caida')
+        return result.reindex(result['z'].abs().sort_values(ascending=False).index).reset_index(drop=True)[ANOMALY_COLUMNS]
+
+    @staticmethod
+    def format_anomalies(anomalies: pd.DataFrame, limit: int = 5) -> str:
+        """Resumen corto para el dashboard, p. ej. '▲ AGENTE: 40 viajes (mediana 12)'"""
+        if anomalies is None or anomalies.empty:
+            return ""
+        lines = [
+            f"{'▲' if fila.tipo == 'salto' else '▼'} {fila.nombre or fila.codigo}: "
+            f"{fila.viajes} viajes (mediana {fila.mediana_base:.0f})"
+            for fila in anomalies.head(limit).itertuples()
+        ]
+        if len(anomalies) > limit:
+            lines.append(f"… y {len(anomalies) - limit} más")
+        return "\n".join(lines)
@@ -2,21 +2,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import sys
 import os
 
-from src.services.data_processor import DataProcessor
-from src.constants import Columns, Charts, ChartTitles
+from src.services.data_processor import DataProcessor, get_data_processor
+from src.constants import Columns, Charts, ChartTitles, Rolling, Bootstrap
 from src.models import db
+from src.services.rolling_metrics import RollingMetrics
 
 
 class ChartService:
     """Servicio dedicado exclusivamente a la generación de gráficos"""
     
     def __init__(self):
-        self.data_processor = DataProcessor()
+        self.data_processor = get_data_processor()
         self._setup_matplotlib()
         print("DEBUG: ChartService inicializado")
     
@@ -46,15 +47,25 @@ class ChartService:
         plt.savefig(output_path, dpi=dpi, bbox_inches='tight', facecolor='white')
         plt.close()
     
+    def _counts_by_group(self, df: pd.DataFrame, codes: List[str],
+                         counts: Optional[Tuple[pd.Series, pd.Series]]) -> Tuple[pd.Series, pd.Series]:
+        """Viajes por agente (representados, otros); reutiliza los del análisis si vienen dados"""
+        if counts is not None:
+            return counts
+        return DataProcessor._split_counts_by_flag(self.data_processor.grouped_counts(df, codes))
+    
     def generate_boxplot(self, df: pd.DataFrame, codes: List[str], 
-                        output_path: str) -> None:
+                        output_path: str,
+                        counts: Optional[Tuple[pd.Series, pd.Series]] = None,
+                        intervals: Optional[Dict[str, Tuple[float, float]]] = None) -> None:
         """
-        Genera boxplot de distribución de operaciones.
+        Genera boxplot de distribución de operaciones. Con intervalos bootstrap
+        la muesca de cada caja marca el intervalo de confianza de su mediana.
         """
-        df_representados, df_otros = self.data_processor.filter_by_codes(df, codes)
+        counts_rep, counts_otros = self._counts_by_group(df, codes, counts)
         
         # Preparar datos para boxplot
-        if df_representados.empty and df_otros.empty:
+        if counts_rep.empty and counts_otros.empty:
             # Crear gráfico vacío con mensaje
             fig, ax = plt.subplots(figsize=Charts.FIGSIZE_BOXPLOT)
             ax.text(0.5, 0.5, 'No hay datos para mostrar', 
@@ -66,21 +77,27 @@ class ChartService:
         # Contar operaciones por agente
         data_to_plot = []
         labels = []
+        median_keys = []
         
-        if not df_representados.empty:
-            counts_rep = df_representados.groupby(Columns.AGENT_NAME).size()
+        if not counts_rep.empty:
             data_to_plot.append(counts_rep.values)
             labels.append("Representados")
+            median_keys.append('mediana_representados')
         
-        if not df_otros.empty:
-            counts_otros = df_otros.groupby(Columns.AGENT_NAME).size()
+        if not counts_otros.empty:
             data_to_plot.append(counts_otros.values)
             labels.append("Mercado")
+            median_keys.append('mediana_otros')
         
         # Crear boxplot
         fig, ax = plt.subplots(figsize=Charts.FIGSIZE_BOXPLOT)
         
-        box_plot = ax.boxplot(data_to_plot, labels=labels, patch_artist=True)
+        if intervals:
+            conf_intervals = [intervals[key] for key in median_keys]
+            box_plot = ax.boxplot(data_to_plot, labels=labels, patch_artist=True,
+                                  notch=True, conf_intervals=conf_intervals)
+        else:
+            box_plot = ax.boxplot(data_to_plot, labels=labels, patch_artist=True)
         
         # Colores personalizados
         colors = ['#4a9eff', '#ff6b6b']
@@ -98,6 +115,10 @@ class ChartService:
             # Agregar texto con estadísticas
             stats_text = f"Representados - Med: {median_rep:.1f}, Prom: {avg_rep:.1f}\n"
             stats_text += f"Mercado - Med: {median_otros:.1f}, Prom: {avg_otros:.1f}"
+            if intervals:
+                lo_rep, hi_rep = intervals['mediana_representados']
+                lo_otros, hi_otros = intervals['mediana_otros']
+                stats_text += f"\nIC {Bootstrap.CONFIDENCE:.0%} mediana: Rep. [{lo_rep:.1f}, {hi_rep:.1f}] | Merc. [{lo_otros:.1f}, {hi_otros:.1f}]"
             
             ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, 
                    verticalalignment='top', fontsize=9,
@@ -115,13 +136,14 @@ class ChartService:
     
     def generate_barplot(self, df: pd.DataFrame, codes: List[str], 
                         median_rep: float, median_otros: float,
-                        output_path: str) -> None:
+                        output_path: str,
+                        counts: Optional[Tuple[pd.Series, pd.Series]] = None) -> None:
         """
         Genera gráfico de barras horizontales con top transportistas.
         """
-        df_representados, df_otros = self.data_processor.filter_by_codes(df, codes)
+        counts_rep, _ = self._counts_by_group(df, codes, counts)
         
-        if df_representados.empty:
+        if counts_rep.empty:
             # Crear gráfico vacío
             fig, ax = plt.subplots(figsize=Charts.FIGSIZE_DEFAULT)
             ax.text(0.5, 0.5, 'No hay datos de representados para mostrar', 
@@ -131,10 +153,10 @@ class ChartService:
             return
         
         # Contar operaciones por transportista
-        counts = df_representados.groupby(Columns.AGENT_NAME).size().sort_values(ascending=True)
+        counts_rep = counts_rep.sort_values(ascending=True)
         
         # Tomar solo los top N
-        top_counts = counts.tail(Charts.TOP_TRANSPORTISTAS)
+        top_counts = counts_rep.tail(Charts.TOP_TRANSPORTISTAS)
         
         # Crear gráfico
         fig, ax = plt.subplots(figsize=Charts.FIGSIZE_DEFAULT)
@@ -261,12 +283,111 @@ class ChartService:
         
         self._save_chart(output_path)
     
+    def generate_rolling_chart(self, output_path: str) -> None:
+        """
+        Genera gráfico de participación móvil (3 y 12 meses) de los representados
+        a partir de la tabla de métricas móviles.
+        """
+        fig, ax = plt.subplots(figsize=Charts.FIGSIZE_DEFAULT)
+        styles = ['-', '--', ':']
+        colors = ['#4a9eff', '#2e7d32', '#ff6b6b']
+        
+        plotted = False
+        for i, window in enumerate(Rolling.CHART_WINDOWS):
+            serie = RollingMetrics.representados_series(window)
+            if serie.empty:
+                continue
+            fechas = pd.to_datetime(serie['periodo'] + '-01')
+            ax.plot(fechas, serie['participacion'], 
+                   marker='o', linestyle=styles[i % len(styles)], linewidth=2, markersize=5,
+                   color=colors[i % len(colors)], label=f'Móvil {window} meses')
+            plotted = True
+        
+        if not plotted:
+            ax.text(0.5, 0.5, 'No hay métricas móviles disponibles', 
+                   ha='center', va='center', transform=ax.transAxes, fontsize=14)
+            ax.set_title(ChartTitles.MOVIL)
+            self._save_chart(output_path)
+            return
+        
+        # Configuración
+        ax.set_title(ChartTitles.MOVIL, fontsize=14, fontweight='bold')
+        ax.set_xlabel('Período')
+        ax.set_ylabel('Participación (%)')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        
+        # Formato de fechas
+        fig.autofmt_xdate()
+        
+        # Remover spines
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        
+        self._save_chart(output_path)
+    
+    def generate_concentration_chart(self, output_path: str) -> None:
+        """
+        Genera gráfico de concentración del mercado (HHI, participación de los
+        5 y 10 mayores agentes y Gini) con los indicadores precalculados en el histórico.
+        """
+        historico = db.obtener_historico_completo()
+        if not historico.empty and 'hhi' in historico.columns:
+            historico = historico.dropna(subset=['hhi'])
+        
+        if historico.empty or 'hhi' not in historico.columns:
+            fig, ax = plt.subplots(figsize=Charts.FIGSIZE_DEFAULT)
+            ax.text(0.5, 0.5, 'No hay indicadores de concentración disponibles', 
+                   ha='center', va='center', transform=ax.transAxes, fontsize=14)
+            ax.set_title(ChartTitles.CONCENTRACION)
+            self._save_chart(output_path)
+            return
+        
+        # Preparar datos
+        historico['fecha'] = pd.to_datetime(historico['periodo'] + '-01')
+        historico = historico.sort_values('fecha')
+        
+        # HHI arriba; participaciones y Gini (escalado a 0-100) abajo
+        fig, (ax_hhi, ax_share) = plt.subplots(2, 1, figsize=Charts.FIGSIZE_DEFAULT, sharex=True)
+        ax_hhi.plot(historico['fecha'], historico['hhi'], 
+                   marker='o', linestyle='-', linewidth=2, markersize=5,
+                   color='#4a9eff', label='HHI')
+        ax_share.plot(historico['fecha'], historico['top5_share'], 
+                     marker='o', linestyle='-', linewidth=2, markersize=5,
+                     color='#2e7d32', label='Top 5 (%)')
+        ax_share.plot(historico['fecha'], historico['top10_share'], 
+                     marker='s', linestyle='--', linewidth=2, markersize=5,
+                     color='#ff9800', label='Top 10 (%)')
+        ax_share.plot(historico['fecha'], historico['gini'] * 100, 
+                     marker='^', linestyle=':', linewidth=2, markersize=5,
+                     color='#d32f2f', label='Gini (×100)')
+        
+        # Configuración
+        ax_hhi.set_title(ChartTitles.CONCENTRACION, fontsize=14, fontweight='bold')
+        ax_hhi.set_ylabel('HHI (0-10.000)')
+        ax_share.set_xlabel('Período')
+        ax_share.set_ylabel('Porcentaje')
+        for ax in (ax_hhi, ax_share):
+            ax.legend()
+            ax.grid(True, alpha=0.3)
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+        
+        # Formato de fechas
+        fig.autofmt_xdate()
+        
+        self._save_chart(output_path)
+    
     def generate_all_charts(self, df: pd.DataFrame, codes: List[str], 
                           metrics: dict, output_dir: Path, 
-                          period: str, is_preview: bool = False) -> dict:
+                          period: str, is_preview: bool = False,
+                          analysis=None) -> dict:
         """
-        Genera todos los gráficos y retorna las rutas.
+        Genera todos los gráficos y retorna las rutas. Con un ManifestAnalysis
+        se reutilizan sus conteos por agente en lugar de volver a filtrar.
         """
+        counts = analysis.counts_by_group if analysis is not None else None
+        intervals = analysis.intervals if analysis is not None else None
         print(f"DEBUG: Iniciando generación de gráficos. Preview: {is_preview}, Período: {period}")
         
         try:
@@ -284,13 +405,15 @@ class ChartService:
                 'boxplot': str(chart_dir / "boxplot_conteos.png"),
                 'barplot': str(chart_dir / "barplot_representados.png"),
                 'temporal': str(output_dir / "serie_temporal.png"),
-                'averages': str(output_dir / "serie_promedios.png")
+                'averages': str(output_dir / "serie_promedios.png"),
+                'rolling': str(output_dir / "serie_movil.png"),
+                'concentration': str(output_dir / "serie_concentracion.png")
             }
             
             # Generar gráficos con timeouts y manejo de errores
             print("DEBUG: Generando boxplot...")
             try:
-                self.generate_boxplot(df, codes, paths['boxplot'])
+                self.generate_boxplot(df, codes, paths['boxplot'], counts, intervals)
                 print("DEBUG: Boxplot generado exitosamente")
             except Exception as e:
                 print(f"DEBUG: Error generando boxplot: {e}")
@@ -300,7 +423,7 @@ class ChartService:
                 self.generate_barplot(df, codes, 
                                     metrics['mediana_representados'], 
                                     metrics['mediana_otros'], 
-                                    paths['barplot'])
+                                    paths['barplot'], counts)
                 print("DEBUG: Barplot generado exitosamente")
             except Exception as e:
                 print(f"DEBUG: Error generando barplot: {e}")
@@ -319,6 +442,18 @@ class ChartService:
                     print("DEBUG: Gráfico de promedios generado")
                 except Exception as e:
                     print(f"DEBUG: Error generando gráfico de promedios: {e}")
+                    
+                try:
+                    self.generate_rolling_chart(paths['rolling'])
+                    print("DEBUG: Gráfico de métricas móviles generado")
+                except Exception as e:
+                    print(f"DEBUG: Error generando gráfico de métricas móviles: {e}")
+                    
+                try:
+                    self.generate_concentration_chart(paths['concentration'])
+                    print("DEBUG: Gráfico de concentración generado")
+                except Exception as e:
+                    print(f"DEBUG: Error generando gráfico de concentración: {e}")
             
             print("DEBUG: Generación de gráficos completada")
             return paths
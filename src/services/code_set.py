@@ -0,0 +1,141 @@
+# Conjunto precompilado de códigos de representados para pertenencia rápida
+import itertools
+import re
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns
+
+# Códigos con más de 18 dígitos no entran en int64; se tratan como "sin código"
+_MAX_CODE_DIGITS = 18
+INVALID_CODE = -1
+
+# Caché por manifiesto: id(df) -> (weakref al df, {clave: array})
+_manifest_cache: Dict[int, Tuple[weakref.ref, Dict[tuple, np.ndarray]]] = {}
+
+
+def normalize_code_int(code: object) -> int:
+    """Normaliza un código (solo dígitos, igual que DataProcessor.normalize_code) a int64"""
+    digits = re.sub(r"\D", "", str(code))
+    if not digits or len(digits) > _MAX_CODE_DIGITS:
+        return INVALID_CODE
+    return int(digits)
+
+
+def normalize_code_array(series: pd.Series) -> np.ndarray:
+    """
+    Versión vectorizada de normalize_code_series que devuelve int64.
+    Los valores vacíos o no numéricos quedan como INVALID_CODE.
+    """
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Enteros: quitar el signo equivale a quedarse con los dígitos
+        return np.abs(series.to_numpy(dtype=np.int64, copy=True))
+
+    digits = series.astype(str).str.replace(r"\D", "", regex=True)
+    lengths = digits.str.len().fillna(0).to_numpy()
+    valid = (lengths > 0) & (lengths <= _MAX_CODE_DIGITS)
+
+    out = np.full(len(series), INVALID_CODE, dtype=np.int64)
+    if valid.any():
+        out[valid] = digits[valid].astype("int64").to_numpy()
+    return out
+
+
+def _get_manifest_entry(df: pd.DataFrame) -> Dict[tuple, np.ndarray]:
+    key = id(df)
+    entry = _manifest_cache.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    # El callback limpia la entrada cuando el DataFrame se libera
+    ref = weakref.ref(df, lambda _ref, key=key: _manifest_cache.pop(key, None))
+    arrays: Dict[tuple, np.ndarray] = {}
+    _manifest_cache[key] = (ref, arrays)
+    return arrays
+
+
+def manifest_codes(df: pd.DataFrame, code_column: str = Columns.AGENT_CODE) -> np.ndarray:
+    """
+    Códigos normalizados (int64) de un manifiesto, calculados una sola vez por
+    DataFrame. Los manifiestos se tratan como de solo lectura una vez cargados.
+    """
+    arrays = _get_manifest_entry(df)
+    cache_key = ('codes', code_column, len(df))
+    codes = arrays.get(cache_key)
+    if codes is None:
+        codes = normalize_code_array(df[code_column])
+        codes.setflags(write=False)
+        arrays[cache_key] = codes
+    return codes
+
+
+class CodeSet:
+    """
+    Lista de códigos normalizada una sola vez: int64 únicos y ordenados para
+    pertenencia por searchsorted. Cada instancia tiene un sello de versión que
+    identifica las máscaras "es representado" cacheadas por manifiesto.
+    """
+
+    _versions = itertools.count(1)
+    _registry: "OrderedDict[Tuple[str, ...], CodeSet]" = OrderedDict()
+    _REGISTRY_SIZE = 32
+
+    def __init__(self, codes: Iterable[object]):
+        self.raw_codes: Tuple[str, ...] = tuple(str(c) for c in codes)
+        normalized = np.array([normalize_code_int(c) for c in self.raw_codes], dtype=np.int64)
+        self.codes: np.ndarray = np.unique(normalized[normalized != INVALID_CODE])
+        self.version: int = next(CodeSet._versions)
+
+    @classmethod
+    def from_codes(cls, codes: Union["CodeSet", Iterable[object]]) -> "CodeSet":
+        """Devuelve el CodeSet de una lista de códigos, construyéndolo solo la primera vez"""
+        if isinstance(codes, CodeSet):
+            return codes
+
+        key = tuple(str(c) for c in codes)
+        code_set = cls._registry.get(key)
+        if code_set is None:
+            code_set = cls(key)
+            cls._registry[key] = code_set
+            if len(cls._registry) > cls._REGISTRY_SIZE:
+                cls._registry.popitem(last=False)
+        else:
+            cls._registry.move_to_end(key)
+        return code_set
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: object) -> bool:
+        return bool(self.contains(np.array([normalize_code_int(code)], dtype=np.int64))[0])
+
+    def normalized_codes(self) -> List[str]:
+        """Códigos normalizados como texto (mismo formato que normalize_codes_list)"""
+        return [str(c) for c in self.codes]
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Pertenencia vectorizada de un array int64 de códigos normalizados"""
+        if len(self.codes) == 0:
+            return np.zeros(len(values), dtype=bool)
+        idx = np.searchsorted(self.codes, values)
+        idx[idx == len(self.codes)] = 0
+        return self.codes[idx] == values
+
+    def mask(self, df: pd.DataFrame, code_column: str = Columns.AGENT_CODE) -> np.ndarray:
+        """Máscara booleana "es representado" del manifiesto, cacheada por versión"""
+        arrays = _get_manifest_entry(df)
+        cache_key = ('mask', code_column, len(df), self.version)
+        mask = arrays.get(cache_key)
+        if mask is None:
+            mask = self.contains(manifest_codes(df, code_column))
+            mask.setflags(write=False)
+            arrays[cache_key] = mask
+        return mask
+
+    def is_representado(self, df: pd.DataFrame, code_column: str = Columns.AGENT_CODE) -> pd.Series:
+        """Columna booleana "es representado" alineada con el índice del manifiesto"""
+        return pd.Series(self.mask(df, code_column), index=df.index, name='es_representado')
@@ -1,8 +1,12 @@
 # Servicio centralizado para procesamiento de datos
+import numpy as np
 import pandas as pd
 import re
-from typing import List, Tuple, Dict, Any, Optional
-from src.constants import Columns, Processing
+from typing import List, Tuple, Dict, Any, Optional, Union
+from src.constants import Columns, Backends, FileTypes, Bootstrap
+from src.services.code_set import CodeSet, manifest_codes, INVALID_CODE
+from src.services.stats_kernel import grouped_describe, concentration_indicators, bootstrap_intervals
+from src.services.tarifas import aplicar_tarifas
 
 
 class DataProcessor:
@@ -21,6 +25,18 @@ class DataProcessor:
         df_copy = df_copy.dropna(subset=[date_column])
         return df_copy
 
+    @staticmethod
+    def _period_mask(dates: pd.Series, period: str):
+        """
+        Máscara de período (YYYY-MM) comparando año y mes como enteros, sin
+        formatear cada fecha a texto. Las fechas inválidas (NaT) quedan en False.
+        """
+        try:
+            year, month = (int(part) for part in period.split('-')[:2])
+        except (ValueError, AttributeError):
+            return (dates.dt.strftime('%Y-%m') == period).to_numpy()
+        return ((dates.dt.year == year) & (dates.dt.month == month)).to_numpy()
+
     @staticmethod
     def normalize_code(code: str) -> str:
         """Normaliza un código eliminando caracteres no numéricos"""
@@ -37,20 +53,14 @@ class DataProcessor:
         return [DataProcessor.normalize_code(code) for code in codes]
     
     @classmethod
-    def filter_by_codes(cls, df: pd.DataFrame, codes: List[str], 
+    def filter_by_codes(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet], 
                        code_column: str = Columns.AGENT_CODE) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Filtra un DataFrame por códigos de representados.
         Retorna: (df_representados, df_otros)
         """
-        # Normalizar códigos de búsqueda
-        normalized_search_codes = cls.normalize_codes_list(codes)
-        
-        # Normalizar códigos del DataFrame
-        normalized_df_codes = cls.normalize_code_series(df[code_column])
-        
-        # Crear máscaras
-        mask_representados = normalized_df_codes.isin(normalized_search_codes)
+        # Máscara "es representado" precompilada y cacheada por manifiesto
+        mask_representados = CodeSet.from_codes(codes).mask(df, code_column)
         
         df_representados = df[mask_representados].copy()
         df_otros = df[~mask_representados].copy()
@@ -74,51 +84,146 @@ class DataProcessor:
             return pd.DataFrame()
     
     @classmethod
-    def filter_by_codes_and_period(cls, df: pd.DataFrame, codes: List[str], period: str,
+    def filter_by_codes_and_period(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet], period: str,
                                   code_column: str = Columns.AGENT_CODE,
                                   date_column: str = Columns.DATE) -> pd.DataFrame:
         """
         Filtra por códigos Y período en una sola operación eficiente.
+        Las fechas y códigos se convierten solo en las filas seleccionadas.
         """
-        # Preparar dataframe con fechas limpias
-        df_copy = cls._prepare_df_with_clean_dates(df, date_column)
-        
-        # Normalizar sobre el mismo df_copy para evitar desalineaciones
-        df_copy[code_column] = cls.normalize_code_series(df_copy[code_column])
-        normalized_search_codes = cls.normalize_codes_list(codes)
-        
-        # Máscaras combinadas (mismo DF base)
-        period_mask = df_copy[date_column].dt.strftime('%Y-%m') == period
-        code_mask = df_copy[code_column].isin(normalized_search_codes)
+        # Máscaras combinadas sobre el DF original (mismo índice)
+        dates = pd.to_datetime(df[date_column], errors='coerce')
+        period_mask = cls._period_mask(dates, period)
+        code_mask = CodeSet.from_codes(codes).mask(df, code_column)
+        mask = period_mask & code_mask
         
-        return df_copy[period_mask & code_mask].copy()
+        df_out = df[mask].copy()
+        df_out[date_column] = dates[mask]
+        df_out[code_column] = cls.normalize_code_series(df_out[code_column])
+        return df_out
     
     @classmethod
-    def calculate_grouped_stats(cls, df: pd.DataFrame, codes: List[str],
+    def calculate_grouped_stats(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet],
                                group_column: str = Columns.AGENT_NAME,
                                code_column: str = Columns.AGENT_CODE) -> Dict[str, float]:
         """
         Calcula estadísticas agrupadas para representados vs otros.
         Retorna diccionario con medianas y promedios.
         """
-        df_representados, df_otros = cls.filter_by_codes(df, codes, code_column)
+        flags = CodeSet.from_codes(codes).mask(df, code_column)
+        total_rep = int(flags.sum())
         
-        # Agrupar y contar por nombre de agente
-        counts_rep = df_representados.groupby(group_column).size()
-        counts_otros = df_otros.groupby(group_column).size()
+        counts = cls.grouped_counts(df, codes, group_column, code_column)
+        counts_rep, counts_otros = cls._split_counts_by_flag(counts)
+        
+        return cls.stats_from_counts(counts_rep, counts_otros, total_rep, len(df) - total_rep)
+    
+    @classmethod
+    def grouped_counts(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet],
+                      group_column: str = Columns.AGENT_NAME,
+                      code_column: str = Columns.AGENT_CODE) -> pd.Series:
+        """
+        Viajes por (es_representado, agente) en un solo groupby. Es la base de
+        las estadísticas agrupadas y de los boxplots/barras.
+        """
+        flags = CodeSet.from_codes(codes).mask(df, code_column)
+        return df[group_column].groupby([flags, df[group_column]]).size()
+    
+    @staticmethod
+    def _split_counts_by_flag(counts: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """Separa conteos indexados por (es_representado, agente) en representados y otros"""
+        flags = counts.index.get_level_values(0)
+        return counts[flags == True].droplevel(0), counts[flags == False].droplevel(0)
+    
+    @staticmethod
+    def stats_from_counts(counts_rep: pd.Series, counts_otros: pd.Series,
+                          total_rep: int, total_otros: int) -> Dict[str, float]:
+        """
+        Arma el diccionario de calculate_grouped_stats a partir de los conteos
+        por agente ya agregados (permite combinar conteos parciales).
+        """
+        values = np.concatenate([counts_rep.to_numpy(), counts_otros.to_numpy()])
+        groups = np.repeat([0, 1], [len(counts_rep), len(counts_otros)])
+        stats = grouped_describe(values, groups, 2)
         
+        total = total_rep + total_otros
         return {
-            'mediana_representados': counts_rep.median() if not counts_rep.empty else 0.0,
-            'mediana_otros': counts_otros.median() if not counts_otros.empty else 0.0,
-            'promedio_representados': counts_rep.mean() if not counts_rep.empty else 0.0,
-            'promedio_otros': counts_otros.mean() if not counts_otros.empty else 0.0,
-            'total_viajes_representados': len(df_representados),
-            'total_viajes_otros': len(df_otros),
-            'participacion': (len(df_representados) / len(df)) * 100 if len(df) > 0 else 0.0
+            'mediana_representados': float(stats['median'][0]) if not counts_rep.empty else 0.0,
+            'mediana_otros': float(stats['median'][1]) if not counts_otros.empty else 0.0,
+            'promedio_representados': float(stats['mean'][0]) if not counts_rep.empty else 0.0,
+            'promedio_otros': float(stats['mean'][1]) if not counts_otros.empty else 0.0,
+            'total_viajes_representados': total_rep,
+            'total_viajes_otros': total_otros,
+            'participacion': (total_rep / total) * 100 if total > 0 else 0.0
+        }
+    
+    @staticmethod
+    def concentration_from_df(df: pd.DataFrame, code_column: str = Columns.AGENT_CODE) -> Dict[str, float]:
+        """
+        HHI, participación top-5/top-10 y Gini del mercado con los viajes por
+        código normalizado (la misma clave que las métricas móviles, así la
+        comparación de períodos coincide con lo guardado en el histórico).
+        """
+        codigos = manifest_codes(df, code_column)
+        _codigos, viajes = np.unique(codigos[codigos != INVALID_CODE], return_counts=True)
+        return concentration_indicators(viajes)
+    
+    @staticmethod
+    def intervals_from_counts(counts_rep: pd.Series, counts_otros: pd.Series,
+                              n_resamples: int = Bootstrap.RESAMPLES,
+                              confidence: float = Bootstrap.CONFIDENCE) -> Dict[str, Tuple[float, float]]:
+        """
+        Intervalos bootstrap (mismas claves que calculate_grouped_stats) de las
+        medianas y promedios de viajes por agente de cada grupo.
+        """
+        rep = bootstrap_intervals(counts_rep.to_numpy(), n_resamples, confidence, Bootstrap.SEED)
+        otros = bootstrap_intervals(counts_otros.to_numpy(), n_resamples, confidence, Bootstrap.SEED)
+        return {
+            'mediana_representados': rep['median'],
+            'mediana_otros': otros['median'],
+            'promedio_representados': rep['mean'],
+            'promedio_otros': otros['mean'],
         }
     
     @classmethod
-    def get_agents_with_trips(cls, df: pd.DataFrame, codes: List[str], period: str,
+    def calculate_grouped_stats_by_period(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet],
+                                         group_column: str = Columns.AGENT_NAME,
+                                         code_column: str = Columns.AGENT_CODE,
+                                         date_column: str = Columns.DATE) -> pd.DataFrame:
+        """
+        Estadísticas de calculate_grouped_stats para todos los períodos a la vez
+        (más cuartiles), con una sola llamada al kernel vectorizado.
+        Retorna un DataFrame indexado por período (YYYY-MM).
+        """
+        flags = CodeSet.from_codes(codes).mask(df, code_column)
+        periods = pd.to_datetime(df[date_column], errors='coerce').dt.strftime('%Y-%m')
+        
+        counts = df[group_column].groupby([periods, flags, df[group_column]]).size()
+        totals = df[group_column].groupby([periods, flags]).size().unstack(fill_value=0)
+        period_index = totals.index
+        
+        # Grupo = período * 2 + (0 representados | 1 otros)
+        period_codes = period_index.get_indexer(counts.index.get_level_values(0))
+        group_ids = period_codes * 2 + (~counts.index.get_level_values(1).to_numpy(dtype=bool)).astype(np.int64)
+        stats = grouped_describe(counts.to_numpy(), group_ids, 2 * len(period_index))
+        
+        result = pd.DataFrame(index=period_index)
+        result.index.name = 'periodo'
+        for suffix, offset in (('representados', 0), ('otros', 1)):
+            result[f'mediana_{suffix}'] = np.nan_to_num(stats['median'][offset::2])
+            result[f'promedio_{suffix}'] = np.nan_to_num(stats['mean'][offset::2])
+            result[f'q1_{suffix}'] = np.nan_to_num(stats['q1'][offset::2])
+            result[f'q3_{suffix}'] = np.nan_to_num(stats['q3'][offset::2])
+        
+        total_rep = totals[True] if True in totals.columns else pd.Series(0, index=period_index)
+        total_otros = totals[False] if False in totals.columns else pd.Series(0, index=period_index)
+        result['total_viajes_representados'] = total_rep.to_numpy()
+        result['total_viajes_otros'] = total_otros.to_numpy()
+        result['participacion'] = (total_rep / (total_rep + total_otros) * 100).to_numpy()
+        return result
+    
+    @classmethod
+    def get_agents_with_trips(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet], period: str,
                              code_column: str = Columns.AGENT_CODE,
                              name_column: str = Columns.AGENT_NAME,
                              date_column: str = Columns.DATE) -> List[Tuple[str, str]]:
@@ -154,10 +259,14 @@ class DataProcessor:
     
     @classmethod
     def add_price_column(cls, df: pd.DataFrame, 
-                        price_per_trip: float = Processing.DEFAULT_PRICE_PER_TRIP) -> pd.DataFrame:
+                        price_per_trip: Optional[float] = None,
+                        file_type: str = FileTypes.INGRESOS) -> pd.DataFrame:
         """
-        Agrega columna de precio calculado por viaje.
+        Agrega columna de precio por viaje. Sin precio fijo se usa el motor de
+        tarifas (agente, ruta, aduana y vigencia) sobre todo el manifiesto.
         """
+        if price_per_trip is None:
+            return aplicar_tarifas(df, file_type)
         df_copy = df.copy()
         df_copy[Columns.PRICE] = price_per_trip
         return df_copy
@@ -181,3 +290,22 @@ class DataProcessor:
             return most_frequent_period.iloc[0] if not most_frequent_period.empty else None
         except Exception:
             return None
+
+
+def get_data_processor(backend: Optional[str] = None) -> DataProcessor:
+    """
+    Devuelve el procesador de datos según el backend configurado
+    ("data_backend" en config.json). Si Polars no está instalado se usa pandas.
+    """
+    if backend is None:
+        from src.models.config_manager import config_manager
+        backend = config_manager.get("data_backend", Backends.PANDAS)
+
+    if backend == Backends.POLARS:
+        try:
+            from src.services.polars_data_processor import PolarsDataProcessor
+            return PolarsDataProcessor()
+        except ImportError as e:
+            print(f"DEBUG: Backend polars no disponible ({e}), usando pandas")
+
+    return DataProcessor()
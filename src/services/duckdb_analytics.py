@@ -0,0 +1,155 @@
+# Motor analítico opcional: dataset Parquet particionado por período consultado con DuckDB
+import os
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import duckdb
+import pandas as pd
+
+from src.config import PARQUET_DIR
+from src.constants import Columns, FileTypes
+from src.services.code_set import CodeSet
+from src.services.data_processor import DataProcessor
+from src.services.trip_warehouse import TripWarehouse
+
+PERIOD_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+# Esquema fijo de los archivos (columnas del almacén de viajes sin el período,
+# que queda en el nombre de la partición)
+SCHEMA = {
+    'codigo': 'BIGINT',
+    'nombre': 'VARCHAR',
+    'mic_dna': 'VARCHAR',
+    'mic_original': 'VARCHAR',
+    'fecha_ingreso': 'TIMESTAMP',
+    'matricula': 'VARCHAR',
+    'remolque': 'VARCHAR',
+    'lugar_partida': 'VARCHAR',
+    'lugar_destino': 'VARCHAR',
+    'aduana_ingreso': 'VARCHAR',
+    'precio': 'DOUBLE',
+}
+
+
+def _literal(text: str) -> str:
+    """Literal de texto SQL (COPY y read_parquet no aceptan parámetros)"""
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+class DuckDBAnalytics:
+    """
+    Cada manifiesto ingresado se escribe como un archivo Parquet en
+    periodo=YYYY-MM/ dentro de PARQUET_DIR (particionado estilo hive). Las
+    consultas de varios períodos corren en DuckDB embebido sobre el dataset:
+    el filtro por período descarta particiones enteras y solo se leen las
+    columnas que usa cada consulta. Los resultados tienen la misma forma que
+    los de DataProcessor.
+    """
+
+    FILE_NAME = "viajes.parquet"
+
+    def __init__(self, base_dir: Union[str, Path] = PARQUET_DIR):
+        self.base_dir = Path(base_dir)
+
+    # Escritura
+    def partition_dir(self, period: str) -> Path:
+        return self.base_dir / f"periodo={period}"
+
+    def write_period(self, df: pd.DataFrame, period: str, file_type: str = FileTypes.INGRESOS) -> int:
+        """Escribe (o reemplaza) la partición del período con los viajes del manifiesto"""
+        return self.write_frame(TripWarehouse.to_frame(df, period, file_type), period)
+
+    def write_frame(self, frame: pd.DataFrame, period: str) -> int:
+        """
+        Escribe la partición con viajes ya normalizados (TripWarehouse.to_frame).
+        Se escribe a un temporal y se renombra, así una consulta concurrente
+        nunca ve un archivo a medio escribir. Retorna las filas.
+        """
+        if not PERIOD_PATTERN.match(period):
+            raise ValueError(f"Período inválido: {period}")
+        frame = frame.drop(columns='periodo', errors='ignore')
+
+        destino = self.partition_dir(period)
+        destino.mkdir(parents=True, exist_ok=True)
+        temporal = destino / f"{self.FILE_NAME}.tmp"
+        columnas = ', '.join(f"CAST({col} AS {tipo}) AS {col}" for col, tipo in SCHEMA.items())
+        with duckdb.connect() as con:
+            con.register('viajes_df', frame)
+            con.execute(
+                f"COPY (SELECT {columnas} FROM viajes_df) TO {_literal(temporal.as_posix())} "
+                "(FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+        os.replace(temporal, destino / self.FILE_NAME)
+        return len(frame)
+
+    def periods(self) -> List[str]:
+        """Períodos con partición escrita"""
+        if not self.base_dir.exists():
+            return []
+        return sorted(
+            p.name.split('=', 1)[1] for p in self.base_dir.glob("periodo=*")
+            if (p / self.FILE_NAME).exists()
+        )
+
+    # Consultas
+    def _source(self, desde: Optional[str], hasta: Optional[str]) -> Optional[Tuple[str, str]]:
+        """
+        (FROM, WHERE) del dataset para el rango. El rango va como literal para
+        que DuckDB pode las particiones al planificar. None si no hay datos.
+        """
+        for period in (desde, hasta):
+            if period is not None and not PERIOD_PATTERN.match(period):
+                raise ValueError(f"Período inválido: {period}")
+        if not self.periods():
+            return None
+        glob = (self.base_dir / "*" / self.FILE_NAME).as_posix()
+        source = f"read_parquet({_literal(glob)}, hive_partitioning = true, hive_types = {{'periodo': VARCHAR}})"
+        where = f"periodo BETWEEN {_literal(desde or '')} AND {_literal(hasta or '9999-99')}"
+        return source, where
+
+    def _query(self, sql: str, codes: Optional[Union[List[str], CodeSet]] = None) -> pd.DataFrame:
+        """Ejecuta la consulta con la tabla `representados` registrada si se pasan códigos"""
+        with duckdb.connect() as con:
+            if codes is not None:
+                con.register('representados', pd.DataFrame({'codigo': CodeSet.from_codes(codes).codes}))
+            return con.execute(sql).df()
+
+    def _counts(self, codes: Union[List[str], CodeSet], desde: Optional[str],
+                hasta: Optional[str]) -> Tuple[pd.Series, pd.Series]:
+        """
+        Viajes por (es_representado, agente) y totales por es_representado,
+        como los groupby de DataProcessor (las filas sin nombre cuentan en los
+        totales pero no como agente).
+        """
+        source = self._source(desde, hasta)
+        if source is None:
+            index = pd.MultiIndex.from_arrays([[], []], names=[None, Columns.AGENT_NAME])
+            return pd.Series([], index=index, dtype='int64'), pd.Series([], dtype='int64')
+
+        from_clause, where = source
+        rows = self._query(
+            f"""
+            SELECT codigo IN (SELECT codigo FROM representados) AS es_representado,
+                   nombre, count(*) AS viajes
+            FROM {from_clause}
+            WHERE {where}
+            GROUP BY ALL
+            ORDER BY ALL
+            """,
+            codes,
+        )
+        rows['es_representado'] = rows['es_representado'].astype(bool)
+        totals = rows.groupby('es_representado')['viajes'].sum()
+        named = rows.dropna(subset=['nombre'])
+        counts = named.set_index(['es_representado', 'nombre'])['viajes'].astype('int64')
+        counts.index = counts.index.set_names([None, Columns.AGENT_NAME])
+        return counts, totals
+
+    def calculate_grouped_stats(self, codes: Union[List[str], CodeSet],
+                                desde: Optional[str] = None, hasta: Optional[str] = None) -> dict:
+        """DataProcessor.calculate_grouped_stats del rango (p. ej. medianas de varios años)"""
+        counts, totals = self._counts(codes, desde, hasta)
+        counts_rep, counts_otros = DataProcessor._split_counts_by_flag(counts)
+        return DataProcessor.stats_from_counts(
+            counts_rep, counts_otros, int(totals.get(True, 0)), int(totals.get(False, 0)))
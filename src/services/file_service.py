@@ -4,6 +4,8 @@ from tkinter import filedialog
 from typing import Optional
 from src.models.data_loader import cargar_manifesto
 from src.services.analytics_service import AnalyticsService
+from src.services.lastres_matcher import LastresMatcher
+from src.services.manifest_analysis import ManifestAnalysis
 from src.constants import FileTypes
 
 
@@ -37,27 +39,34 @@ class FileService:
         Procesa un archivo de manifiesto o un DataFrame ya cargado.
         Retorna tupla compatible con el código existente.
         
-        Para archivos de lastres, retorna datos especiales que no se procesan
-        completamente (no se guardan en BD ni se generan KPIs).
+        Ingresos y lastres comparten el mismo camino: el archivo se lee una
+        sola vez y se analiza con el mismo motor; cada tipo guarda su serie
+        (historico / historico_lastres).
+        """
+        if df is None:
+            df = self.validate_and_load_manifest(file_path)
+        return self.analyze_manifest(df, codes, file_type=file_type).as_legacy_tuple()
+    
+    def analyze_manifest(self, df: pd.DataFrame, codes: list[str],
+                         file_type: str = FileTypes.INGRESOS) -> ManifestAnalysis:
+        """
+        Analiza un manifiesto ya cargado una sola vez y actualiza el histórico
+        de su tipo. Para ingresos además genera los gráficos.
         """
         if file_type == FileTypes.LASTRES:
-            # Para lastres, solo validamos el archivo y lo devolvemos para visualización
-            if df is not None:
-                return (0, 0, 0, 0, 0, False, 0, "", "", True)  # Datos dummy, es_preview=True
-            else:
-                df_validado = self.validate_and_load_manifest(file_path)
-                return (0, 0, 0, 0, 0, False, 0, "", "", True)
-        else:
-            # Procesamiento normal para ingresos
-            if df is not None:
-                # Usar DataFrame ya cargado
-                from src.main import procesar_df
-                return procesar_df(df, codes)
-            else:
-                # Cargar y procesar archivo
-                from src.main import procesar_archivo  
-                return procesar_archivo(file_path, codes)
+            return self.analytics_service.analyze_manifest(df, codes, file_type=file_type)
+        from src.main import analizar_df
+        return analizar_df(df, codes)
     
     def compute_period(self, df: pd.DataFrame) -> Optional[str]:
         """Calcula el período a partir de un DataFrame ya cargado"""
         return self.analytics_service.get_period_from_df(df)
+
+    def match_lastres(self, df_ingresos: pd.DataFrame, df_lastres: pd.DataFrame,
+                      codes: Optional[list[str]] = None,
+                      window_days: Optional[float] = None) -> pd.DataFrame:
+        """
+        Cruza un manifiesto de lastres con el de ingresos por camión y ventana
+        de fechas. Retorna la tasa de emparejamiento por representado.
+        """
+        return LastresMatcher.match_rates(df_ingresos, df_lastres, codes=codes, window_days=window_days)
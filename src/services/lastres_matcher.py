@@ -0,0 +1,146 @@
+# Emparejamiento vectorizado de lastres con su ingreso por camión y ventana de fechas
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns, Matching
+from src.services.code_set import CodeSet, manifest_codes
+
+# Criterio con el que se emparejó cada lastre
+CRITERIO_MATRICULA_REMOLQUE = "matricula+remolque"
+CRITERIO_MATRICULA = "matricula"
+SIN_EMPAREJAR = ""
+
+
+class LastresMatcher:
+    """
+    Empareja cada lastre con el ingreso del mismo camión (Matricula y, si está
+    informado, Remolque/SemiRem) dentro de una ventana de días, usando
+    merge_asof sobre datos ordenados en lugar de recorrer ambos archivos.
+    """
+
+    @staticmethod
+    def normalize_plate_series(series: pd.Series) -> np.ndarray:
+        """Matrícula comparable: mayúsculas y sin espacios, guiones ni puntos"""
+        return (
+            series.fillna("").astype(str).str.upper()
+            .str.replace(r"[\s\-\.]", "", regex=True)
+            .to_numpy(dtype=object)
+        )
+
+    @staticmethod
+    def _resolve_window(window_days: Optional[float]) -> pd.Timedelta:
+        if window_days is None:
+            from src.models.config_manager import config_manager
+            window_days = config_manager.get("lastres_ventana_dias", Matching.WINDOW_DAYS)
+        return pd.Timedelta(days=float(window_days))
+
+    @classmethod
+    def _keys_frame(cls, df: pd.DataFrame, date_column: str) -> pd.DataFrame:
+        """Claves de emparejamiento por fila: fila original, fecha, matrícula y remolque"""
+        empty = pd.Series("", index=df.index)
+        return pd.DataFrame({
+            'fila': np.arange(len(df)),
+            'fecha': pd.to_datetime(df[date_column], errors='coerce').astype("datetime64[ns]").to_numpy(),
+            'matricula': cls.normalize_plate_series(df[Columns.PLATE] if Columns.PLATE in df.columns else empty),
+            'remolque': cls.normalize_plate_series(df[Columns.TRAILER] if Columns.TRAILER in df.columns else empty),
+        })
+
+    @staticmethod
+    def _merge_pass(left: pd.DataFrame, right: pd.DataFrame, by: List[str],
+                    tolerance: pd.Timedelta, direction: str) -> pd.DataFrame:
+        """Una pasada de merge_asof: ambos lados ordenados por fecha y agrupados por `by`"""
+        merged = pd.merge_asof(
+            left.sort_values('fecha', kind='stable'),
+            right.sort_values('fecha', kind='stable').rename(columns={'fila': 'fila_ingreso', 'fecha': 'fecha_ingreso'}),
+            left_on='fecha', right_on='fecha_ingreso', by=by,
+            tolerance=tolerance, direction=direction,
+        )
+        return merged[merged['fila_ingreso'].notna()]
+
+    @classmethod
+    def match(cls, df_ingresos: pd.DataFrame, df_lastres: pd.DataFrame,
+              window_days: Optional[float] = None,
+              direction: str = Matching.DIRECTION,
+              date_column: str = Columns.DATE) -> pd.DataFrame:
+        """
+        Devuelve una copia de df_lastres con el ingreso emparejado de cada fila:
+        'fila_ingreso' (posición en df_ingresos, -1 si no hay), 'fecha_ingreso_camion',
+        'dias_desde_ingreso', 'criterio' y 'emparejado'.
+
+        Primero se empareja por Matricula + Remolque/SemiRem; los lastres que
+        quedan sin pareja se reintentan solo por Matricula.
+        """
+        tolerance = cls._resolve_window(window_days)
+        ingresos = cls._keys_frame(df_ingresos, date_column)
+        lastres = cls._keys_frame(df_lastres, date_column)
+
+        # merge_asof no admite fechas nulas; sin fecha o matrícula no hay pareja posible
+        ingresos = ingresos[ingresos['fecha'].notna() & (ingresos['matricula'] != "")]
+        pendientes = lastres[lastres['fecha'].notna() & (lastres['matricula'] != "")]
+
+        fila_ingreso = np.full(len(lastres), -1, dtype=np.int64)
+        fecha_ingreso = np.full(len(lastres), np.datetime64('NaT'), dtype="datetime64[ns]")
+        criterio = np.full(len(lastres), SIN_EMPAREJAR, dtype=object)
+
+        pasadas = [
+            (['matricula', 'remolque'], CRITERIO_MATRICULA_REMOLQUE, lambda df: df['remolque'] != ""),
+            (['matricula'], CRITERIO_MATRICULA, lambda df: np.ones(len(df), dtype=bool)),
+        ]
+        for by, nombre, aplica in pasadas:
+            left = pendientes[aplica(pendientes)]
+            right = ingresos[aplica(ingresos)]
+            if left.empty or right.empty:
+                continue
+            merged = cls._merge_pass(left, right[['fila', 'fecha'] + by], by, tolerance, direction)
+            filas = merged['fila'].to_numpy()
+            fila_ingreso[filas] = merged['fila_ingreso'].to_numpy(dtype=np.int64)
+            fecha_ingreso[filas] = merged['fecha_ingreso'].to_numpy()
+            criterio[filas] = nombre
+            pendientes = pendientes[fila_ingreso[pendientes['fila'].to_numpy()] < 0]
+
+        df_out = df_lastres.copy()
+        df_out['fila_ingreso'] = fila_ingreso
+        df_out['fecha_ingreso_camion'] = fecha_ingreso
+        df_out['dias_desde_ingreso'] = (lastres['fecha'].to_numpy() - fecha_ingreso) / np.timedelta64(1, 'D')
+        df_out['criterio'] = criterio
+        df_out['emparejado'] = fila_ingreso >= 0
+        return df_out
+
+    @classmethod
+    def match_rates(cls, df_ingresos: pd.DataFrame, df_lastres: pd.DataFrame,
+                    codes: Optional[Union[List[str], CodeSet]] = None,
+                    window_days: Optional[float] = None,
+                    direction: str = Matching.DIRECTION,
+                    code_column: str = Columns.AGENT_CODE,
+                    name_column: str = Columns.AGENT_NAME,
+                    date_column: str = Columns.DATE) -> pd.DataFrame:
+        """
+        Tasa de emparejamiento de lastres por agente (solo representados si se
+        pasan `codes`). Columnas: codigo, nombre, lastres, emparejados, tasa.
+        """
+        matched = cls.match(df_ingresos, df_lastres, window_days, direction, date_column)
+
+        codigos = manifest_codes(df_lastres, code_column)
+        keep = codigos >= 0
+        if codes is not None:
+            keep &= CodeSet.from_codes(codes).mask(df_lastres, code_column)
+
+        resumen = pd.DataFrame({
+            'codigo': codigos[keep],
+            'nombre': df_lastres[name_column].to_numpy(dtype=object)[keep] if name_column in df_lastres.columns else "",
+            'emparejado': matched['emparejado'].to_numpy()[keep],
+        })
+        if resumen.empty:
+            return pd.DataFrame(columns=['codigo', 'nombre', 'lastres', 'emparejados', 'tasa'])
+
+        rates = resumen.groupby('codigo').agg(
+            nombre=('nombre', 'first'),
+            lastres=('emparejado', 'size'),
+            emparejados=('emparejado', 'sum'),
+        ).reset_index()
+        rates['codigo'] = rates['codigo'].astype(str)
+        rates['emparejados'] = rates['emparejados'].astype(int)
+        rates['tasa'] = rates['emparejados'] / rates['lastres'] * 100
+        return rates.sort_values(['tasa', 'lastres'], ascending=[True, False], kind='stable').reset_index(drop=True)
@@ -0,0 +1,153 @@
+# Resultado único del análisis de un manifiesto, compartido por servicios y vistas
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from src.constants import Columns, FileTypes
+from src.services.code_set import CodeSet
+from src.services.data_processor import DataProcessor, get_data_processor
+from src.services.market_ranking import rank_against_market
+from src.services.route_cube import RouteCube
+from src.services.tarifas import esta_tarifado
+
+
+@dataclass
+class ManifestAnalysis:
+    """
+    Todo lo que la app necesita de un manifiesto cargado, calculado una sola vez:
+    período, métricas, conteo de viajes por (es_representado, agente), cubo de
+    rutas, tabla código → nombre por período, ranking de los representados
+    frente al mercado, indicadores de concentración e intervalos de confianza
+    bootstrap de medianas y promedios. Dashboard, gráficos y vistas
+    consumen este objeto en lugar de volver a filtrar el DataFrame.
+    """
+    df: pd.DataFrame
+    codes: CodeSet
+    file_type: str
+    period: Optional[str]
+    metrics: Dict[str, float]
+    counts: pd.Series
+    route_cube: RouteCube
+    agent_names: pd.DataFrame
+    ranking: pd.DataFrame
+    concentration: Dict[str, float]
+    intervals: Dict[str, Tuple[float, float]]
+    historical_updated: bool = False
+    is_preview: bool = False
+    chart_paths: Dict[str, str] = field(default_factory=dict)
+    anomalies: Optional[pd.DataFrame] = None  # Saltos/caídas de representados (AnomalyScanner)
+
+    @staticmethod
+    def _build_agent_names(df: pd.DataFrame, flags, code_column: str = Columns.AGENT_CODE,
+                           name_column: str = Columns.AGENT_NAME,
+                           date_column: str = Columns.DATE) -> pd.DataFrame:
+        """
+        Nombre más frecuente de cada código por período (en empate el menor,
+        igual que Series.mode()). Columnas: periodo, codigo, nombre, viajes, es_representado.
+        """
+        columns = ['periodo', 'codigo', 'nombre', 'viajes', 'es_representado']
+        if code_column not in df.columns or name_column not in df.columns:
+            return pd.DataFrame(columns=columns)
+
+        rows = pd.DataFrame({
+            'periodo': pd.to_datetime(df[date_column], errors='coerce').dt.strftime('%Y-%m').to_numpy(),
+            'codigo': df[code_column].to_numpy(dtype=object),
+            'nombre': df[name_column].to_numpy(dtype=object),
+            'es_representado': flags,
+        }).dropna(subset=['periodo', 'codigo', 'nombre'])
+        if rows.empty:
+            return pd.DataFrame(columns=columns)
+
+        rows['codigo'] = rows['codigo'].astype(str)
+        rows['nombre'] = rows['nombre'].astype(str)
+        por_nombre = (
+            rows.groupby(['periodo', 'codigo', 'nombre'])
+            .agg(frecuencia=('es_representado', 'size'), es_representado=('es_representado', 'max'))
+            .reset_index()
+        )
+        viajes = por_nombre.groupby(['periodo', 'codigo'])['frecuencia'].transform('sum')
+        por_nombre['viajes'] = viajes
+        return (
+            por_nombre.sort_values(['periodo', 'codigo', 'frecuencia', 'nombre'],
+                                   ascending=[True, True, False, True], kind='stable')
+            .drop_duplicates(['periodo', 'codigo'])
+            .reset_index(drop=True)[columns]
+        )
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet],
+                file_type: str = FileTypes.INGRESOS,
+                data_processor: Optional[DataProcessor] = None) -> 'ManifestAnalysis':
+        """Analiza el manifiesto una sola vez con el backend configurado"""
+        processor = data_processor or get_data_processor()
+        code_set = CodeSet.from_codes(codes)
+
+        flags = code_set.mask(df, Columns.AGENT_CODE)
+        total_rep = int(flags.sum())
+        counts = processor.grouped_counts(df, code_set)
+        counts_rep, counts_otros = DataProcessor._split_counts_by_flag(counts)
+        period = processor.extract_period_from_df(df)
+
+        return cls(
+            df=df,
+            codes=code_set,
+            file_type=file_type,
+            period=period,
+            metrics=DataProcessor.stats_from_counts(counts_rep, counts_otros, total_rep, len(df) - total_rep),
+            counts=counts,
+            route_cube=RouteCube.from_df(df, code_set),
+            agent_names=cls._build_agent_names(df, flags),
+            ranking=rank_against_market(df, code_set, period),
+            concentration=DataProcessor.concentration_from_df(df),
+            intervals=DataProcessor.intervals_from_counts(counts_rep, counts_otros),
+        )
+
+    @property
+    def counts_by_group(self) -> Tuple[pd.Series, pd.Series]:
+        """Viajes por agente: (representados, otros)"""
+        return DataProcessor._split_counts_by_flag(self.counts)
+
+    @property
+    def viajes_representados(self) -> int:
+        return int(self.metrics['total_viajes_representados'])
+
+    def representados_con_viajes(self, period: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Mismo resultado que listar_representados_con_viajes, sin re-filtrar el manifiesto"""
+        period = period or self.period
+        names = self.agent_names[(self.agent_names['periodo'] == period) & self.agent_names['es_representado']]
+        items = list(zip(names['codigo'], names['nombre']))
+        items.sort(key=lambda t: t[1].lower())
+        return items
+
+    def tabla_dinamica(self, period: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Resumen por representado (nombre, suma de precio y viajes) desde el cubo
+        de rutas. Solo aplica a manifiestos tarifados; si no, retorna None.
+        """
+        if not esta_tarifado(self.df, self.file_type):
+            return None
+        resumen = self.route_cube.slice(by=['codigo', 'agente'], periodo=period or self.period,
+                                        es_representado=True)
+        # Igual que groupby en pandas: las filas sin nombre de agente no aparecen
+        resumen = resumen[resumen['agente'] != ""].sort_values('agente', kind='stable')
+        return pd.DataFrame({
+            'Nombre Ag. Transportista': resumen['agente'].astype(str).to_numpy(),
+            'Suma de PRECIO': resumen['monto'].to_numpy(dtype=float),
+            'Cantidad de Viajes': resumen['viajes'].to_numpy(dtype=int),
+        })
+
+    def as_legacy_tuple(self) -> tuple:
+        """Tupla que retornaba procesar_df (compatibilidad con el código existente)"""
+        return (
+            self.metrics['mediana_representados'],
+            self.metrics['mediana_otros'],
+            self.metrics['promedio_representados'],
+            self.metrics['promedio_otros'],
+            self.metrics['participacion'],
+            self.historical_updated,
+            self.viajes_representados,
+            self.chart_paths.get('boxplot', ""),
+            self.chart_paths.get('barplot', ""),
+            self.is_preview,
+        )
@@ -0,0 +1,67 @@
+# Ranking de cada representado contra la distribución de viajes de todo el mercado
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int, INVALID_CODE
+
+RANKING_COLUMNS = ['viajes', 'percentil', 'ranking', 'total_agentes', 'mediana_mercado', 'distancia_mediana']
+
+
+def rank_against_market(df: pd.DataFrame, codes: Union[List[str], CodeSet],
+                        period: Optional[str] = None,
+                        code_column: str = Columns.AGENT_CODE,
+                        date_column: str = Columns.DATE) -> pd.DataFrame:
+    """
+    Posición de cada representado con viajes frente a todos los agentes del
+    período, en una sola pasada sobre los viajes por agente:
+      - percentil: % de agentes del mercado con igual o menos viajes
+      - ranking: 1 + agentes con más viajes (empates comparten puesto)
+      - distancia_mediana: viajes del representado - mediana del mercado
+    Retorna un DataFrame indexado por código normalizado (texto).
+    """
+    codigos = manifest_codes(df, code_column)
+    rows = codigos != INVALID_CODE
+    if period is not None:
+        fechas = pd.to_datetime(df[date_column], errors='coerce')
+        rows &= (fechas.dt.strftime('%Y-%m') == period).to_numpy()
+
+    # Viajes por agente del mercado (incluye representados)
+    agentes, viajes = np.unique(codigos[rows], return_counts=True)
+    if len(agentes) == 0:
+        return pd.DataFrame(columns=RANKING_COLUMNS, index=pd.Index([], name='codigo'))
+
+    ordenados = np.sort(viajes)
+    n = len(ordenados)
+    hasta = np.searchsorted(ordenados, viajes, side='right')  # agentes con <= viajes
+    mediana = float(np.median(ordenados))
+
+    es_rep = CodeSet.from_codes(codes).contains(agentes)
+    ranking = pd.DataFrame({
+        'viajes': viajes,
+        'percentil': hasta / n * 100,
+        'ranking': n - hasta + 1,
+        'total_agentes': n,
+        'mediana_mercado': mediana,
+        'distancia_mediana': viajes - mediana,
+    }, index=pd.Index(agentes.astype(str), name='codigo'))
+    return ranking[es_rep]
+
+
+def ranking_for(ranking: Optional[pd.DataFrame], codigo: str) -> Optional[Dict[str, float]]:
+    """Fila del ranking para un código (sin importar su formato) o None si no viajó"""
+    if ranking is None or ranking.empty:
+        return None
+    key = str(normalize_code_int(codigo))
+    if key not in ranking.index:
+        return None
+    return ranking.loc[key].to_dict()
+
+
+def format_ranking(fila: Optional[Dict[str, float]]) -> str:
+    """Texto corto para KPIs y reportes, p. ej. 'P85 · #12 de 240'"""
+    if not fila:
+        return "-"
+    return f"P{fila['percentil']:.0f} · #{int(fila['ranking'])} de {int(fila['total_agentes'])}"
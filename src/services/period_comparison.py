@@ -0,0 +1,142 @@
+# Comparación entre dos períodos (o rangos) a partir de los agregados guardados
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Rolling
+from src.models import db
+from src.services.code_set import CodeSet
+from src.services.representados_contactos import list_codes
+from src.services.stats_kernel import concentration_indicators
+from src.services.trip_sketch import TripSketch
+
+PeriodSpec = Union[str, Sequence[str]]
+
+AGENT_COLUMNS = ['nombre', 'es_representado', 'viajes_a', 'viajes_b', 'delta', 'delta_pct', 'estado']
+
+
+def as_range(spec: PeriodSpec) -> Tuple[str, str]:
+    """'2024-05' → ('2024-05', '2024-05'); ('2024-01', '2024-06') se mantiene"""
+    if isinstance(spec, str):
+        return spec, spec
+    desde, hasta = spec
+    return (desde, hasta) if desde <= hasta else (hasta, desde)
+
+
+class PeriodComparison:
+    """
+    Compara dos períodos o rangos con los conteos mensuales por agente
+    (métricas móviles, ventana 1) y los sketches de viajes guardados:
+    diferencias por agente, agentes nuevos y perdidos, y cambio de métricas.
+    No relee manifiestos.
+    """
+
+    METRICS = [
+        'mediana_representados', 'mediana_otros',
+        'promedio_representados', 'promedio_otros',
+        'total_viajes_representados', 'total_viajes_otros', 'participacion',
+        'agentes_activos', 'hhi', 'top5_share', 'top10_share', 'gini',
+    ]
+
+    @staticmethod
+    def _agents_in_range(desde: str, hasta: str) -> pd.DataFrame:
+        """Viajes por agente sumados en el rango, con el último nombre y flag"""
+        monthly = db.obtener_metricas_moviles(Rolling.MONTHLY, desde, hasta)
+        if monthly.empty:
+            return pd.DataFrame(columns=['nombre', 'es_representado', 'viajes'],
+                                index=pd.Index([], name='codigo'))
+        monthly = monthly.sort_values('periodo', kind='stable')
+        return monthly.groupby('codigo').agg(
+            nombre=('nombre', 'last'),
+            es_representado=('es_representado', 'max'),
+            viajes=('viajes', 'sum'),
+        )
+
+    @staticmethod
+    def _parquet_covers(engine, desde: str, hasta: str) -> bool:
+        """True si todos los períodos guardados del rango tienen partición Parquet"""
+        periodos = db.obtener_historico_completo()['periodo']
+        guardados = set(periodos[(periodos >= desde) & (periodos <= hasta)])
+        return bool(guardados) and guardados <= set(engine.periods())
+
+    @classmethod
+    def _range_metrics(cls, desde: str, hasta: str, agents: pd.DataFrame,
+                       codes: Optional[Union[List[str], CodeSet]] = None, engine=None) -> Dict[str, float]:
+        """
+        Métricas del rango: sketches combinados + concentración de los viajes
+        por agente. Con el motor Parquet (DuckDBAnalytics) las medianas y
+        promedios de un rango de varios meses son exactos en lugar de estimados.
+        """
+        metrics = TripSketch.range_stats(desde, hasta)
+        metrics['agentes_activos'] = int((agents['viajes'] > 0).sum())
+        # Viajes por código normalizado: la misma clave que DataProcessor.concentration_from_df
+        metrics.update(concentration_indicators(agents['viajes'].to_numpy()))
+
+        if desde == hasta:
+            # Un solo período: los indicadores guardados en el histórico son los KPIs del período
+            historico = db.obtener_historico_completo()
+            fila = historico[historico['periodo'] == desde]
+            if not fila.empty:
+                sin_sketches = metrics['total_viajes_representados'] + metrics['total_viajes_otros'] == 0
+                guardadas = db.COLUMNAS_CONCENTRACION if not sin_sketches else cls.METRICS
+                metrics.update({k: v for k, v in fila.iloc[0].items() if k in guardadas and pd.notna(v)})
+        elif engine is not None and cls._parquet_covers(engine, desde, hasta):
+            metrics.update(engine.calculate_grouped_stats(codes if codes is not None else list_codes(), desde, hasta))
+        return metrics
+
+    @classmethod
+    def compare(cls, a: PeriodSpec, b: PeriodSpec,
+                codes: Optional[Union[List[str], CodeSet]] = None, engine=None) -> Dict[str, object]:
+        """
+        Compara `a` (base) contra `b`. Cada uno es un período "YYYY-MM" o un
+        rango (desde, hasta). Retorna:
+          - agentes: viajes en a y b, delta, delta_pct y estado
+            ('nuevo', 'perdido' o 'continua') por código
+          - nuevos / perdidos: subconjuntos de agentes
+          - metricas: valor en a y b, delta y delta_pct por métrica
+        Con `codes` se redefine qué agentes son representados en la tabla de
+        agentes; las métricas usan los grupos con los que se guardó cada período
+        (salvo las medianas de rangos leídas del motor Parquet `engine`, que
+        usan `codes` o la lista actual de representados).
+        """
+        range_a, range_b = as_range(a), as_range(b)
+        agents_a = cls._agents_in_range(*range_a)
+        agents_b = cls._agents_in_range(*range_b)
+
+        agentes = agents_a.join(agents_b, how='outer', lsuffix='_a', rsuffix='_b')
+        agentes['nombre'] = agentes['nombre_b'].fillna(agentes['nombre_a'])
+        agentes['es_representado'] = (
+            agentes[['es_representado_a', 'es_representado_b']].fillna(0).max(axis=1).astype(bool)
+        )
+        if codes is not None:
+            agentes['es_representado'] = CodeSet.from_codes(codes).contains(
+                agentes.index.to_numpy(dtype=object).astype(np.int64))
+        agentes['viajes_a'] = agentes['viajes_a'].fillna(0).astype(np.int64)
+        agentes['viajes_b'] = agentes['viajes_b'].fillna(0).astype(np.int64)
+        agentes['delta'] = agentes['viajes_b'] - agentes['viajes_a']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            agentes['delta_pct'] = np.where(agentes['viajes_a'] > 0,
+                                            agentes['delta'] / agentes['viajes_a'] * 100, np.nan)
+        agentes['estado'] = np.select(
+            [agentes['viajes_a'] == 0, agentes['viajes_b'] == 0], ['nuevo', 'perdido'], default='continua')
+        agentes = agentes[AGENT_COLUMNS].sort_values('delta', ascending=False, kind='stable')
+
+        metrics_a = cls._range_metrics(*range_a, agents_a, codes, engine)
+        metrics_b = cls._range_metrics(*range_b, agents_b, codes, engine)
+        metricas = pd.DataFrame({
+            'a': [metrics_a.get(m, np.nan) for m in cls.METRICS],
+            'b': [metrics_b.get(m, np.nan) for m in cls.METRICS],
+        }, index=pd.Index(cls.METRICS, name='metrica'), dtype=float)
+        metricas['delta'] = metricas['b'] - metricas['a']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metricas['delta_pct'] = np.where(metricas['a'] != 0, metricas['delta'] / metricas['a'] * 100, np.nan)
+
+        return {
+            'a': range_a,
+            'b': range_b,
+            'agentes': agentes,
+            'nuevos': agentes[agentes['estado'] == 'nuevo'],
+            'perdidos': agentes[agentes['estado'] == 'perdido'],
+            'metricas': metricas,
+        }
@@ -0,0 +1,220 @@
+# Implementación alternativa de DataProcessor sobre LazyFrames de Polars
+import pandas as pd
+from typing import List, Tuple, Dict, Optional
+
+import polars as pl
+
+from src.constants import Columns
+from src.services.data_processor import DataProcessor
+from src.services.code_set import CodeSet
+
+
+class PolarsDataProcessor(DataProcessor):
+    """
+    Mismos métodos públicos que DataProcessor, pero los filtros, agrupaciones y
+    extracción de período se ejecutan con Polars (motor multi-hilo y sin copias).
+    Recibe y devuelve DataFrames de pandas para que las vistas no cambien.
+    """
+
+    # Utilidades internas
+    @staticmethod
+    def _to_lazy(df: pd.DataFrame, columns: List[str]) -> pl.LazyFrame:
+        """
+        Convierte a LazyFrame solo las columnas necesarias (proyección temprana).
+        Las fechas no datetime se parsean con pandas para mantener la misma
+        semántica de `pd.to_datetime(errors='coerce')` que el backend pandas.
+        """
+        data = []
+        for col in dict.fromkeys(columns):
+            serie = df[col]
+            if col == Columns.DATE and not pd.api.types.is_datetime64_any_dtype(serie):
+                serie = pd.to_datetime(serie, errors='coerce')
+            if pd.api.types.is_datetime64_any_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+                data.append(pl.Series(col, serie.to_numpy()))
+            else:
+                # Texto o columnas mixtas del Excel: se convierten a texto de una vez
+                # (los nulos quedan nulos); con pyarrow la columna pasa sin copias
+                texto = serie.astype("string")
+                try:
+                    data.append(pl.from_pandas(texto).alias(col))
+                except ImportError:
+                    data.append(pl.Series(col, texto.to_numpy(dtype=object, na_value=None), dtype=pl.Utf8))
+        return pl.DataFrame(data).lazy()
+
+    @staticmethod
+    def _normalized_code_expr(code_column: str) -> pl.Expr:
+        """Expresión equivalente a normalize_code: solo dígitos, como texto"""
+        return pl.col(code_column).cast(pl.Utf8).str.replace_all(r"\D", "")
+
+    @classmethod
+    def _code_mask_expr(cls, codes, code_column: str) -> pl.Expr:
+        # Pertenencia sobre los int64 precompilados del CodeSet
+        code_set = CodeSet.from_codes(codes)
+        return (
+            cls._normalized_code_expr(code_column)
+            .cast(pl.Int64, strict=False)
+            .is_in(code_set.codes.tolist())
+            .fill_null(False)
+        )
+
+    @staticmethod
+    def _period_expr(date_column: str) -> pl.Expr:
+        return pl.col(date_column).dt.strftime('%Y-%m')
+
+    @classmethod
+    def filter_by_codes(cls, df: pd.DataFrame, codes: List[str],
+                       code_column: str = Columns.AGENT_CODE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Filtra un DataFrame por códigos de representados.
+        Retorna: (df_representados, df_otros)
+        """
+        mask = (
+            cls._to_lazy(df, [code_column])
+            .select(cls._code_mask_expr(codes, code_column).alias('mask'))
+            .collect()
+            .get_column('mask')
+            .to_numpy()
+        )
+        return df[mask].copy(), df[~mask].copy()
+
+    @classmethod
+    def filter_by_codes_and_period(cls, df: pd.DataFrame, codes: List[str], period: str,
+                                  code_column: str = Columns.AGENT_CODE,
+                                  date_column: str = Columns.DATE) -> pd.DataFrame:
+        """
+        Filtra por códigos Y período en una sola pasada del motor Polars.
+        """
+        mask = (
+            cls._to_lazy(df, [code_column, date_column])
+            .select(
+                ((cls._period_expr(date_column) == period).fill_null(False)
+                 & cls._code_mask_expr(codes, code_column)).alias('mask')
+            )
+            .collect()
+            .get_column('mask')
+            .to_numpy()
+        )
+        # Mismo formato de salida que el backend pandas: fecha datetime y código normalizado
+        df_out = df[mask].copy()
+        df_out[date_column] = pd.to_datetime(df_out[date_column], errors='coerce')
+        df_out[code_column] = cls.normalize_code_series(df_out[code_column])
+        return df_out
+
+    @classmethod
+    def calculate_grouped_stats(cls, df: pd.DataFrame, codes: List[str],
+                               group_column: str = Columns.AGENT_NAME,
+                               code_column: str = Columns.AGENT_CODE) -> Dict[str, float]:
+        """
+        Calcula estadísticas agrupadas para representados vs otros.
+        Retorna diccionario con medianas y promedios.
+        """
+        lf = cls._to_lazy(df, [code_column, group_column]).with_columns(
+            cls._code_mask_expr(codes, code_column).alias('es_representado')
+        )
+
+        totals = lf.group_by('es_representado').agg(pl.len().alias('viajes')).collect()
+        total_by_flag = dict(zip(totals['es_representado'].to_list(), totals['viajes'].to_list()))
+
+        # Conteo por agente (los nombres nulos se descartan igual que en groupby de pandas)
+        stats = (
+            lf.filter(pl.col(group_column).is_not_null())
+            .group_by(['es_representado', group_column])
+            .agg(pl.len().alias('conteo'))
+            .group_by('es_representado')
+            .agg(
+                pl.col('conteo').median().alias('mediana'),
+                pl.col('conteo').mean().alias('promedio'),
+            )
+            .collect()
+        )
+        by_flag = {row['es_representado']: row for row in stats.iter_rows(named=True)}
+
+        def _stat(flag: bool, key: str) -> float:
+            row = by_flag.get(flag)
+            return float(row[key]) if row is not None else 0.0
+
+        total_rep = int(total_by_flag.get(True, 0))
+        total_otros = int(total_by_flag.get(False, 0))
+
+        return {
+            'mediana_representados': _stat(True, 'mediana'),
+            'mediana_otros': _stat(False, 'mediana'),
+            'promedio_representados': _stat(True, 'promedio'),
+            'promedio_otros': _stat(False, 'promedio'),
+            'total_viajes_representados': total_rep,
+            'total_viajes_otros': total_otros,
+            'participacion': (total_rep / len(df)) * 100 if len(df) > 0 else 0.0
+        }
+
+    @classmethod
+    def grouped_counts(cls, df: pd.DataFrame, codes: List[str],
+                      group_column: str = Columns.AGENT_NAME,
+                      code_column: str = Columns.AGENT_CODE) -> pd.Series:
+        """
+        Viajes por (es_representado, agente) agregados con Polars; se devuelven
+        como Series de pandas con el mismo MultiIndex que el backend pandas.
+        """
+        counts = (
+            cls._to_lazy(df, [code_column, group_column])
+            .filter(pl.col(group_column).is_not_null())
+            .group_by([cls._code_mask_expr(codes, code_column).alias('es_representado'), group_column])
+            .agg(pl.len().cast(pl.Int64).alias('conteo'))
+            .sort(['es_representado', group_column])
+            .collect()
+        )
+        index = pd.MultiIndex.from_arrays(
+            [counts['es_representado'].to_list(), counts[group_column].to_list()],
+            names=[None, group_column],
+        )
+        return pd.Series(counts['conteo'].to_numpy(), index=index, name=group_column)
+
+    @classmethod
+    def get_agents_with_trips(cls, df: pd.DataFrame, codes: List[str], period: str,
+                             code_column: str = Columns.AGENT_CODE,
+                             name_column: str = Columns.AGENT_NAME,
+                             date_column: str = Columns.DATE) -> List[Tuple[str, str]]:
+        """
+        Obtiene lista de (código, nombre) de agentes que tuvieron viajes en el período.
+        """
+        name_by_code = (
+            cls._to_lazy(df, [code_column, name_column, date_column])
+            .filter((cls._period_expr(date_column) == period) & cls._code_mask_expr(codes, code_column))
+            .filter(pl.col(name_column).is_not_null())
+            .select(
+                cls._normalized_code_expr(code_column).alias('codigo'),
+                pl.col(name_column).cast(pl.Utf8).alias('nombre'),
+            )
+            .group_by(['codigo', 'nombre'])
+            .agg(pl.len().alias('frecuencia'))
+            # Nombre más frecuente por código; en empate el menor, igual que Series.mode()
+            .sort(['codigo', 'frecuencia', 'nombre'], descending=[False, True, False])
+            .group_by('codigo', maintain_order=True)
+            .first()
+            .collect()
+        )
+
+        items = list(zip(name_by_code['codigo'].to_list(), name_by_code['nombre'].to_list()))
+        items.sort(key=lambda t: t[0])
+        items.sort(key=lambda t: t[1].lower())
+        return items
+
+    @classmethod
+    def extract_period_from_df(cls, df: pd.DataFrame,
+                              date_column: str = Columns.DATE) -> Optional[str]:
+        """
+        Extrae el período (YYYY-MM) más frecuente del DataFrame.
+        """
+        try:
+            periods = (
+                cls._to_lazy(df, [date_column])
+                .select(cls._period_expr(date_column).alias('periodo'))
+                .drop_nulls()
+                .group_by('periodo')
+                .agg(pl.len().alias('frecuencia'))
+                .sort(['frecuencia', 'periodo'], descending=[True, False])
+                .limit(1)
+                .collect()
+            )
+            return periods['periodo'][0] if periods.height > 0 else None
+        except Exception:
+            return None
@@ -0,0 +1,131 @@
+# Métricas móviles (3/6/12 meses) por agente mantenidas de forma incremental
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns, Rolling
+from src.models import db
+from src.services.code_set import CodeSet, manifest_codes, INVALID_CODE
+
+
+def shift_period(period: str, months: int) -> str:
+    """Desplaza un período "YYYY-MM" la cantidad de meses indicada"""
+    year, month = map(int, period.split('-'))
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class RollingMetrics:
+    """
+    Conteos de viajes, mediana mensual y participación por agente en ventanas
+    móviles. Cada período ingresado guarda su conteo mensual (ventana 1) y solo
+    se recalculan las ventanas que lo contienen, a partir de esos conteos
+    mensuales y no de los manifiestos originales.
+    """
+
+    @staticmethod
+    def monthly_counts(df: pd.DataFrame, codes: Union[List[str], CodeSet],
+                       code_column: str = Columns.AGENT_CODE,
+                       name_column: str = Columns.AGENT_NAME) -> pd.DataFrame:
+        """Viajes del mes por agente: codigo, nombre, viajes, mediana_mensual, participacion, es_representado"""
+        codigos = manifest_codes(df, code_column)
+        valid = codigos != INVALID_CODE
+        counts = pd.DataFrame({
+            'codigo': codigos[valid],
+            'nombre': df[name_column].to_numpy(dtype=object)[valid],
+            'es_representado': CodeSet.from_codes(codes).mask(df, code_column)[valid],
+        })
+        monthly = counts.groupby('codigo', sort=True).agg(
+            nombre=('nombre', lambda s: s.mode().iloc[0] if s.notna().any() else ""),
+            viajes=('es_representado', 'size'),
+            es_representado=('es_representado', 'max'),
+        ).reset_index()
+
+        monthly['codigo'] = monthly['codigo'].astype(str)
+        monthly['mediana_mensual'] = monthly['viajes'].astype(float)
+        total = monthly['viajes'].sum()
+        monthly['participacion'] = monthly['viajes'] / total * 100 if total > 0 else 0.0
+        return monthly
+
+    @staticmethod
+    def compute_window(monthly: pd.DataFrame, end_period: str, window: int) -> pd.DataFrame:
+        """
+        Agrega los conteos mensuales de la ventana que termina en `end_period`.
+        La mediana usa solo los meses cargados; un agente sin viajes en uno de
+        esos meses cuenta 0 para ese mes.
+        """
+        start_period = shift_period(end_period, -(window - 1))
+        rows = monthly[(monthly['periodo'] >= start_period) & (monthly['periodo'] <= end_period)]
+        if rows.empty:
+            return rows.iloc[0:0]
+
+        # Matriz agente × mes con ceros donde el agente no viajó
+        matrix = rows.pivot_table(index='codigo', columns='periodo', values='viajes',
+                                  aggfunc='sum', fill_value=0)
+        latest = rows.sort_values('periodo').groupby('codigo').last()
+
+        result = pd.DataFrame({
+            'codigo': matrix.index.astype(str),
+            'nombre': latest.loc[matrix.index, 'nombre'].to_numpy(),
+            'viajes': matrix.to_numpy().sum(axis=1),
+            'mediana_mensual': np.median(matrix.to_numpy(), axis=1),
+            'es_representado': rows.groupby('codigo')['es_representado'].max().loc[matrix.index].to_numpy(),
+        })
+        total = result['viajes'].sum()
+        result['participacion'] = result['viajes'] / total * 100 if total > 0 else 0.0
+        return result
+
+    @classmethod
+    def affected_windows(cls, period: str, available_periods: Iterable[str],
+                         windows: Iterable[int] = Rolling.WINDOWS) -> List[tuple]:
+        """(período final, ventana) de todas las ventanas que incluyen `period`"""
+        available = set(available_periods)
+        return [
+            (shift_period(period, k), window)
+            for window in windows
+            for k in range(window)
+            if shift_period(period, k) in available
+        ]
+
+    @classmethod
+    def update_windows(cls, period: str, windows: Iterable[int] = Rolling.WINDOWS) -> int:
+        """
+        Recalcula solo las ventanas afectadas por `period` leyendo los conteos
+        mensuales necesarios. Retorna la cantidad de ventanas actualizadas.
+        """
+        windows = tuple(windows)
+        max_window = max(windows)
+        monthly = db.obtener_metricas_moviles(
+            Rolling.MONTHLY,
+            desde=shift_period(period, -(max_window - 1)),
+            hasta=shift_period(period, max_window - 1),
+        )
+        affected = cls.affected_windows(period, monthly['periodo'].unique(), windows)
+        for end_period, window in affected:
+            db.reemplazar_metricas_moviles(end_period, window, cls.compute_window(monthly, end_period, window))
+        return len(affected)
+
+    @classmethod
+    def ingest_period(cls, df: pd.DataFrame, codes: Union[List[str], CodeSet], period: str) -> int:
+        """Guarda el conteo mensual del período y actualiza sus ventanas móviles"""
+        db.crear_tabla_si_no_existe()
+        db.reemplazar_metricas_moviles(period, Rolling.MONTHLY, cls.monthly_counts(df, codes))
+        return cls.update_windows(period)
+
+    @staticmethod
+    def representados_series(window: int, desde: Optional[str] = None,
+                             hasta: Optional[str] = None) -> pd.DataFrame:
+        """
+        Serie por período de la ventana dada para los representados en conjunto:
+        viajes, participación y mediana de los viajes por agente.
+        """
+        metrics = db.obtener_metricas_moviles(window, desde, hasta)
+        if metrics.empty:
+            return pd.DataFrame(columns=['periodo', 'viajes', 'participacion', 'mediana_agente'])
+        rep = metrics[metrics['es_representado'] == 1]
+        return rep.groupby('periodo').agg(
+            viajes=('viajes', 'sum'),
+            participacion=('participacion', 'sum'),
+            mediana_agente=('viajes', 'median'),
+        ).reindex(sorted(metrics['periodo'].unique()), fill_value=0).rename_axis('periodo').reset_index()
@@ -0,0 +1,106 @@
+# Cubo de agregación por período, agente, ruta y aduana para consultas rápidas
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int, INVALID_CODE
+
+
+class RouteCube:
+    """
+    Agregación precalculada de viajes (y monto, si el manifiesto está tarifado)
+    por período, agente, Lugar partida, Lugar destino y Adu.Ing, construida con
+    un único groupby sobre claves categóricas. Las consultas por ruta o aduana
+    se resuelven sobre el cubo, sin volver a filtrar el DataFrame original.
+    """
+
+    # Dimensión del cubo -> columna del manifiesto de la que sale
+    DIMENSIONS: Dict[str, str] = {
+        'periodo': Columns.DATE,
+        'codigo': Columns.AGENT_CODE,
+        'agente': Columns.AGENT_NAME,
+        'lugar_partida': Columns.ORIGIN,
+        'lugar_destino': Columns.DESTINATION,
+        'aduana': Columns.CUSTOMS_IN,
+    }
+    MEASURES = ['viajes', 'monto']
+
+    def __init__(self, cube: pd.DataFrame):
+        self.cube = cube
+
+    @classmethod
+    def _dimension_values(cls, df: pd.DataFrame, dimension: str) -> pd.Categorical:
+        """Valores categóricos de una dimensión; columnas ausentes quedan como ''"""
+        column = cls.DIMENSIONS[dimension]
+        if column not in df.columns:
+            return pd.Categorical(np.full(len(df), "", dtype=object))
+
+        if dimension == 'periodo':
+            values = pd.to_datetime(df[column], errors='coerce').dt.strftime('%Y-%m')
+            return pd.Categorical(values.fillna(""))
+        if dimension == 'codigo':
+            codes = manifest_codes(df, column)
+            return pd.Categorical(np.where(codes == INVALID_CODE, "", codes.astype(str)))
+        return pd.Categorical(df[column].fillna("").astype(str).str.strip())
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, codes: Optional[Union[List[str], CodeSet]] = None) -> 'RouteCube':
+        """
+        Construye el cubo en una sola pasada. Si se pasan `codes`, agrega la
+        dimensión 'es_representado' para separar representados del mercado.
+        """
+        keys = pd.DataFrame({dim: cls._dimension_values(df, dim) for dim in cls.DIMENSIONS})
+        if codes is not None:
+            keys['es_representado'] = CodeSet.from_codes(codes).mask(df, Columns.AGENT_CODE)
+
+        if Columns.PRICE in df.columns:
+            keys['monto'] = pd.to_numeric(df[Columns.PRICE], errors='coerce').fillna(0.0).to_numpy()
+        else:
+            keys['monto'] = 0.0
+
+        dims = [c for c in keys.columns if c != 'monto']
+        cube = (
+            keys.groupby(dims, observed=True, sort=False)['monto']
+            .agg(viajes='size', monto='sum')
+            .reset_index()
+        )
+        return cls(cube)
+
+    @property
+    def dimensions(self) -> List[str]:
+        return [c for c in self.cube.columns if c not in self.MEASURES]
+
+    def slice(self, by: Optional[Iterable[str]] = None, **filters) -> pd.DataFrame:
+        """
+        Agrega el cubo por cualquier subconjunto de dimensiones (`by`) aplicando
+        filtros por dimensión, p. ej.:
+            cube.slice(by=['lugar_partida', 'lugar_destino'], periodo='2025-01', aduana=['10', '11'])
+        Sin `by` retorna los totales filtrados en una sola fila.
+        """
+        by = list(by or [])
+        unknown = [d for d in by + list(filters) if d not in self.dimensions]
+        if unknown:
+            raise ValueError(f"Dimensiones desconocidas en el cubo: {unknown}")
+
+        mask = np.ones(len(self.cube), dtype=bool)
+        for dim, value in filters.items():
+            if dim == 'codigo':
+                value = [str(normalize_code_int(v)) for v in np.atleast_1d(value)]
+            values = value if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)) else [value]
+            mask &= self.cube[dim].isin(values).to_numpy()
+        selected = self.cube[mask]
+
+        if not by:
+            return pd.DataFrame({m: [selected[m].sum()] for m in self.MEASURES})
+
+        return (
+            selected.groupby(by, observed=True)[self.MEASURES].sum()
+            .sort_values('viajes', ascending=False, kind='stable')
+            .reset_index()
+        )
+
+    def top_routes(self, n: int = 10, **filters) -> pd.DataFrame:
+        """Rutas (partida -> destino) con más viajes según los filtros dados"""
+        return self.slice(by=['lugar_partida', 'lugar_destino'], **filters).head(n)
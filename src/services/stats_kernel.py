@@ -0,0 +1,128 @@
+# Kernel NumPy para estadísticas por grupo en una sola pasada vectorizada
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Elementos por bloque de remuestreos en bootstrap_intervals (~8 MB por matriz float64)
+BOOTSTRAP_CHUNK_ELEMENTS = 1 << 20
+
+
+def _sorted_by_group(values: np.ndarray, group_ids: np.ndarray, n_groups: int):
+    """Ordena los valores por (grupo, valor) y devuelve inicio y tamaño de cada grupo"""
+    order = np.lexsort((values, group_ids))
+    sorted_values = values[order].astype(np.float64)
+    sizes = np.bincount(group_ids, minlength=n_groups)
+    starts = np.cumsum(sizes) - sizes
+    return sorted_values, starts, sizes
+
+
+def grouped_quantiles(values: np.ndarray, group_ids: np.ndarray, n_groups: int,
+                      quantiles: Sequence[float] = (0.5,)) -> np.ndarray:
+    """
+    Cuantiles por grupo con interpolación lineal (la misma que Series.quantile
+    y Series.median de pandas). Retorna una matriz (n_groups, len(quantiles));
+    los grupos vacíos quedan en NaN.
+    """
+    values = np.asarray(values)
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+    sorted_values, starts, sizes = _sorted_by_group(values, group_ids, n_groups)
+
+    qs = np.asarray(quantiles, dtype=np.float64)
+    out = np.full((n_groups, len(qs)), np.nan)
+    non_empty = sizes > 0
+    if not non_empty.any():
+        return out
+
+    # Posición fraccionaria de cada cuantil dentro de su grupo
+    positions = qs[None, :] * (sizes[non_empty, None] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+
+    base = starts[non_empty, None]
+    low_values = sorted_values[base + lower]
+    high_values = sorted_values[base + upper]
+    out[non_empty] = low_values + (high_values - low_values) * fraction
+    return out
+
+
+def grouped_describe(values: np.ndarray, group_ids: np.ndarray, n_groups: int) -> Dict[str, np.ndarray]:
+    """
+    Conteo, suma, promedio, mediana y cuartiles de muchos grupos a la vez
+    (por ejemplo período × representados/mercado) sin bucles en Python.
+    """
+    values = np.asarray(values)
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+
+    sizes = np.bincount(group_ids, minlength=n_groups)
+    sums = np.bincount(group_ids, weights=values.astype(np.float64), minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(sizes > 0, sums / np.maximum(sizes, 1), np.nan)
+
+    q1, median, q3 = grouped_quantiles(values, group_ids, n_groups, (0.25, 0.5, 0.75)).T
+    return {
+        'count': sizes,
+        'sum': sums,
+        'mean': means,
+        'median': median,
+        'q1': q1,
+        'q3': q3,
+    }
+
+
+def concentration_indicators(counts: np.ndarray) -> Dict[str, float]:
+    """
+    Indicadores de concentración del mercado a partir de los viajes por agente:
+    HHI (escala 0-10.000), participación de los 5 y 10 mayores (%) y
+    coeficiente de Gini. Sin viajes todos quedan en 0.
+    """
+    values = np.sort(np.asarray(counts, dtype=np.float64))
+    total = values.sum()
+    n = len(values)
+    if n == 0 or total <= 0:
+        return {'hhi': 0.0, 'top5_share': 0.0, 'top10_share': 0.0, 'gini': 0.0}
+
+    shares = values / total
+    # Gini con los valores ordenados de menor a mayor: sum((2i - n - 1) * x_i) / (n * total)
+    ranks = np.arange(1, n + 1)
+    gini = float(((2 * ranks - n - 1) * values).sum() / (n * total))
+    return {
+        'hhi': float((shares ** 2).sum() * 10_000),
+        'top5_share': float(shares[-5:].sum() * 100),
+        'top10_share': float(shares[-10:].sum() * 100),
+        'gini': gini,
+    }
+
+
+def bootstrap_intervals(values: np.ndarray, n_resamples: int = 2000,
+                        confidence: float = 0.95,
+                        seed: Optional[int] = 0) -> Dict[str, Tuple[float, float]]:
+    """
+    Intervalos de confianza bootstrap (percentil) de la mediana y el promedio.
+    Los remuestreos se generan en bloques de matrices de índices de a lo sumo
+    BOOTSTRAP_CHUNK_ELEMENTS elementos, así la memoria no crece con
+    n_resamples × n. Con la misma semilla el resultado no depende del tamaño
+    del bloque. Sin valores retorna (nan, nan).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return {'median': (np.nan, np.nan), 'mean': (np.nan, np.nan)}
+
+    rng = np.random.default_rng(seed)
+    medians = np.empty(n_resamples, dtype=np.float64)
+    means = np.empty(n_resamples, dtype=np.float64)
+    rows = max(1, BOOTSTRAP_CHUNK_ELEMENTS // n)
+    for start in range(0, n_resamples, rows):
+        stop = min(start + rows, n_resamples)
+        samples = values[rng.integers(0, n, size=(stop - start, n))]
+        medians[start:stop] = np.median(samples, axis=1)
+        means[start:stop] = samples.mean(axis=1)
+
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    median_lo, median_hi = np.percentile(medians, tails)
+    mean_lo, mean_hi = np.percentile(means, tails)
+    return {
+        'median': (float(median_lo), float(median_hi)),
+        'mean': (float(mean_lo), float(mean_hi)),
+    }
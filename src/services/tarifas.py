@@ -0,0 +1,184 @@
+# src/services/tarifas.py
+import json
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import USER_DATA_DIR
+from src.constants import Columns, FileTypes, Processing
+from src.services.code_set import manifest_codes, normalize_code_int, INVALID_CODE
+
+logger = logging.getLogger(__name__)
+
+# Ruta del archivo JSON de tarifas
+TARIFAS_JSON_PATH = USER_DATA_DIR / "data" / "tarifas.json"
+
+# Valor que en una regla significa "cualquier valor" para esa clave
+COMODIN = "*"
+
+# Claves de la tarifa -> columna del manifiesto (orden = prioridad ante igual especificidad)
+CLAVES_TARIFA = {
+    "agente": Columns.AGENT_CODE,
+    "lugar_partida": Columns.ORIGIN,
+    "lugar_destino": Columns.DESTINATION,
+    "aduana": Columns.CUSTOMS_IN,
+}
+
+COLUMNAS_TARIFA = ["tipo", *CLAVES_TARIFA.keys(), "desde", "hasta", "precio"]
+
+# Marca en df.attrs que indica que la columna Precio ya viene del motor de tarifas
+ATTR_TARIFADO = "tarifado"
+
+_cache_tarifas = {"mtime": None, "df": None}
+
+
+def precio_base(file_type: str) -> float:
+    """Precio por viaje cuando ninguna tarifa aplica"""
+    if file_type == FileTypes.LASTRES:
+        return Processing.LASTRES_PRICE_PER_TRIP
+    return Processing.DEFAULT_PRICE_PER_TRIP
+
+
+def _normalizar_texto(series: pd.Series) -> np.ndarray:
+    """Normaliza lugares/aduanas para comparar sin importar mayúsculas ni espacios"""
+    return series.fillna("").astype(str).str.strip().str.upper().to_numpy(dtype=object)
+
+
+def _normalizar_reglas(reglas: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza una tabla de reglas: comodines, tipos de clave y fechas de vigencia"""
+    reglas = reglas.reindex(columns=COLUMNAS_TARIFA).copy()
+    reglas["tipo"] = reglas["tipo"].fillna(FileTypes.INGRESOS)
+
+    for clave in CLAVES_TARIFA:
+        valores = reglas[clave].fillna(COMODIN).astype(str).str.strip()
+        reglas[f"{clave}_activa"] = ~valores.isin([COMODIN, ""])
+        if clave == "agente":
+            reglas[clave] = np.array([normalize_code_int(v) for v in valores], dtype=np.int64)
+        else:
+            reglas[clave] = valores.str.upper().to_numpy(dtype=object)
+
+    # Misma resolución que las fechas del manifiesto para merge_asof
+    reglas["desde"] = pd.to_datetime(reglas["desde"], errors="coerce").fillna(pd.Timestamp("1900-01-01")).astype("datetime64[ns]")
+    reglas["hasta"] = pd.to_datetime(reglas["hasta"], errors="coerce").astype("datetime64[ns]")
+    reglas["precio"] = pd.to_numeric(reglas["precio"], errors="coerce")
+    return reglas.dropna(subset=["precio"])
+
+
+def cargar_tarifas() -> pd.DataFrame:
+    """
+    Carga la tabla de tarifas desde el JSON (lista de reglas con tipo, agente,
+    lugar_partida, lugar_destino, aduana, desde, hasta y precio). Se cachea
+    mientras el archivo no cambie. Sin archivo, la tabla queda vacía.
+    """
+    if not TARIFAS_JSON_PATH.exists():
+        return _normalizar_reglas(pd.DataFrame(columns=COLUMNAS_TARIFA))
+
+    mtime = os.path.getmtime(TARIFAS_JSON_PATH)
+    if _cache_tarifas["mtime"] == mtime and _cache_tarifas["df"] is not None:
+        return _cache_tarifas["df"]
+
+    try:
+        with open(TARIFAS_JSON_PATH, 'r', encoding='utf-8') as f:
+            reglas = pd.DataFrame(json.load(f))
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Error cargando tarifas: {e}")
+        reglas = pd.DataFrame(columns=COLUMNAS_TARIFA)
+
+    df_reglas = _normalizar_reglas(reglas)
+    _cache_tarifas.update({"mtime": mtime, "df": df_reglas})
+    return df_reglas
+
+
+def _aplicar_patron(claves_manifiesto: dict, fechas: pd.Series, filas: np.ndarray,
+                    reglas: pd.DataFrame, claves: list, precios: np.ndarray,
+                    pendientes: np.ndarray) -> None:
+    """
+    Asigna precio a las filas pendientes con las reglas de un mismo patrón de
+    claves, buscando por intervalo de vigencia con merge_asof. Si la regla más
+    reciente ya venció se reintenta con las anteriores (vigencias solapadas).
+    """
+    derecha = reglas[claves + ["desde", "hasta", "precio"]].sort_values("desde", kind="stable")
+    candidatas = filas[pendientes[filas]]
+    busqueda = fechas.to_numpy()[candidatas]
+
+    while len(candidatas):
+        izquierda = pd.DataFrame({c: claves_manifiesto[c][candidatas] for c in claves})
+        izquierda["fila"] = candidatas
+        izquierda["fecha"] = fechas.to_numpy()[candidatas]
+        izquierda["busqueda"] = busqueda
+        izquierda = izquierda.sort_values("busqueda", kind="stable")
+
+        merged = pd.merge_asof(
+            izquierda, derecha, left_on="busqueda", right_on="desde",
+            by=claves or None, direction="backward",
+        )
+        con_regla = merged["precio"].notna().to_numpy()
+        vigente = con_regla & (merged["hasta"].isna() | (merged["fecha"] <= merged["hasta"])).to_numpy()
+
+        asignadas = merged["fila"].to_numpy()[vigente]
+        precios[asignadas] = merged["precio"].to_numpy()[vigente]
+        pendientes[asignadas] = False
+
+        # Regla vencida: buscar la anterior a su inicio
+        vencidas = con_regla & ~vigente
+        candidatas = merged["fila"].to_numpy()[vencidas]
+        busqueda = (merged["desde"] - pd.Timedelta(1, "ns")).to_numpy()[vencidas]
+
+
+def aplicar_tarifas(df: pd.DataFrame, file_type: str = FileTypes.INGRESOS,
+                    tarifas: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Devuelve una copia del manifiesto con la columna Precio calculada en bloque
+    según la tabla de tarifas (agente, ruta, Adu.Ing y vigencia). Las reglas más
+    específicas tienen prioridad; sin regla aplicable se usa el precio base.
+    """
+    precios = np.full(len(df), precio_base(file_type), dtype=np.float64)
+    reglas = cargar_tarifas() if tarifas is None else _normalizar_reglas(tarifas)
+    reglas = reglas[reglas["tipo"] == file_type]
+
+    if not reglas.empty and Columns.DATE in df.columns and len(df):
+        fechas = pd.to_datetime(df[Columns.DATE], errors="coerce").astype("datetime64[ns]").reset_index(drop=True)
+        claves_manifiesto = {}
+        for clave, columna in CLAVES_TARIFA.items():
+            if clave == "agente":
+                claves_manifiesto[clave] = (
+                    manifest_codes(df, columna) if columna in df.columns
+                    else np.full(len(df), INVALID_CODE, dtype=np.int64)
+                )
+            else:
+                claves_manifiesto[clave] = (
+                    _normalizar_texto(df[columna]) if columna in df.columns
+                    else np.full(len(df), "", dtype=object)
+                )
+
+        filas = np.arange(len(df))
+        pendientes = fechas.notna().to_numpy().copy()
+
+        # Un merge por patrón de claves, del más específico al más general
+        activas = [f"{c}_activa" for c in CLAVES_TARIFA]
+        patrones = reglas.groupby(activas, sort=False)
+        orden = sorted(patrones.groups.keys(), key=lambda p: (-sum(p), [not a for a in p]))
+        for patron in orden:
+            if not pendientes.any():
+                break
+            claves = [c for c, activa in zip(CLAVES_TARIFA, patron) if activa]
+            _aplicar_patron(claves_manifiesto, fechas, filas, patrones.get_group(patron),
+                            claves, precios, pendientes)
+
+    df_out = df.copy()
+    df_out[Columns.PRICE] = precios
+    df_out.attrs[ATTR_TARIFADO] = file_type
+    return df_out
+
+
+def esta_tarifado(df: pd.DataFrame, file_type: str = FileTypes.INGRESOS) -> bool:
+    """True si la columna Precio del DataFrame proviene de aplicar_tarifas con ese tipo de archivo"""
+    return df.attrs.get(ATTR_TARIFADO) == file_type and Columns.PRICE in df.columns
+
+
+def asegurar_tarifas(df: pd.DataFrame, file_type: str = FileTypes.INGRESOS) -> pd.DataFrame:
+    """Aplica las tarifas solo si el manifiesto todavía no fue tarifado para ese tipo de archivo"""
+    return df if esta_tarifado(df, file_type) else aplicar_tarifas(df, file_type)
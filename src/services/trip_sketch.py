@@ -0,0 +1,129 @@
+# Distribuciones combinables de viajes por agente guardadas por período
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.models import db
+
+GROUPS = ('representados', 'otros')
+
+
+class TripSketch:
+    """
+    Resumen combinable de la distribución de viajes por agente. Como los viajes
+    son enteros, el resumen es un histograma exacto (valor → cantidad de
+    agentes): combinar períodos es sumar histogramas y los cuantiles coinciden
+    con los de pandas sobre los conteos originales, sin error de aproximación.
+    """
+
+    def __init__(self, values: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None):
+        self.values = np.asarray(values if values is not None else [], dtype=np.int64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.int64)
+
+    @classmethod
+    def from_counts(cls, counts: Sequence[int]) -> 'TripSketch':
+        """Sketch a partir de los viajes de cada agente (p. ej. un grupo de grouped_counts)"""
+        values, weights = np.unique(np.asarray(counts, dtype=np.int64), return_counts=True)
+        return cls(values, weights)
+
+    @classmethod
+    def merge_all(cls, sketches: Iterable['TripSketch']) -> 'TripSketch':
+        """Combina varios sketches en uno (suma de histogramas)"""
+        sketches = list(sketches)
+        if not sketches:
+            return cls()
+        values = np.concatenate([s.values for s in sketches])
+        weights = np.concatenate([s.weights for s in sketches])
+        merged_values, inverse = np.unique(values, return_inverse=True)
+        return cls(merged_values, np.bincount(inverse, weights=weights).astype(np.int64))
+
+    def merge(self, other: 'TripSketch') -> 'TripSketch':
+        return self.merge_all([self, other])
+
+    # Serialización: [cantidad de valores, valores..., pesos...] en int64
+    def to_bytes(self) -> bytes:
+        return np.concatenate([[len(self.values)], self.values, self.weights]).astype(np.int64).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TripSketch':
+        array = np.frombuffer(data, dtype=np.int64)
+        n = int(array[0])
+        return cls(array[1:1 + n], array[1 + n:1 + 2 * n])
+
+    # Estadísticas
+    @property
+    def n(self) -> int:
+        """Cantidad de agentes (o agente-período al combinar)"""
+        return int(self.weights.sum())
+
+    @property
+    def total(self) -> int:
+        """Viajes totales"""
+        return int((self.values * self.weights).sum())
+
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """Cuantiles con interpolación lineal, iguales a Series.quantile sobre los conteos"""
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if self.n == 0:
+            return np.full(len(quantiles), np.nan)
+        cumulative = np.cumsum(self.weights)
+        position = quantiles * (self.n - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        lower_values = self.values[np.searchsorted(cumulative, lower, side='right')]
+        upper_values = self.values[np.searchsorted(cumulative, upper, side='right')]
+        return lower_values + (upper_values - lower_values) * (position - lower)
+
+    def median(self) -> float:
+        return float(self.quantiles([0.5])[0]) if self.n else 0.0
+
+    # Persistencia por período
+    @classmethod
+    def store_period(cls, period: str, counts_rep: pd.Series, counts_otros: pd.Series) -> None:
+        """Guarda los sketches de representados y otros del período"""
+        sketches = {group: cls.from_counts(counts.to_numpy())
+                    for group, counts in zip(GROUPS, (counts_rep, counts_otros))}
+        db.guardar_sketches(period, {group: (s.n, s.to_bytes()) for group, s in sketches.items()})
+
+    @classmethod
+    def load_range(cls, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict[str, 'TripSketch']:
+        """Sketch combinado de cada grupo para los períodos del rango"""
+        por_grupo: Dict[str, list] = {group: [] for group in GROUPS}
+        for _periodo, grupo, datos in db.obtener_sketches(desde, hasta):
+            por_grupo.setdefault(grupo, []).append(cls.from_bytes(datos))
+        return {group: cls.merge_all(sketches) for group, sketches in por_grupo.items()}
+
+    @classmethod
+    def range_stats(cls, desde: Optional[str] = None, hasta: Optional[str] = None,
+                    quantiles: Sequence[float] = (0.25, 0.5, 0.75, 0.9)) -> Dict[str, float]:
+        """
+        Medianas, promedios y percentiles de viajes por agente de varios períodos
+        a la vez (con las claves de calculate_grouped_stats), combinando los
+        sketches guardados en lugar de recargar manifiestos. Cada agente cuenta
+        una vez por período en el que tuvo viajes.
+        """
+        sketches = cls.load_range(desde, hasta)
+        rep, otros = sketches['representados'], sketches['otros']
+        total = rep.total + otros.total
+        stats = {
+            'mediana_representados': rep.median(),
+            'mediana_otros': otros.median(),
+            'promedio_representados': rep.mean(),
+            'promedio_otros': otros.mean(),
+            'total_viajes_representados': rep.total,
+            'total_viajes_otros': otros.total,
+            'participacion': rep.total / total * 100 if total > 0 else 0.0,
+        }
+        for group, sketch in sketches.items():
+            for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+                stats[f'p{round(q * 100)}_{group}'] = float(value)
+        return stats
+
+    @classmethod
+    def year_to_date(cls, period: str) -> Dict[str, float]:
+        """range_stats desde enero del año de `period` hasta `period` inclusive"""
+        return cls.range_stats(f"{period[:4]}-01", period)
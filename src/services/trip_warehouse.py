@@ -0,0 +1,112 @@
+# Almacén de viajes individuales: las filas de cada manifiesto ingresado en SQLite
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns, FileTypes
+from src.models import db
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int, INVALID_CODE
+from src.services.tarifas import asegurar_tarifas, ATTR_TARIFADO
+
+
+class TripWarehouse:
+    """
+    Guarda en la tabla `viajes` cada fila de los manifiestos ingresados, con
+    columnas normalizadas. Recargar un manifiesto reemplaza sus viajes y un
+    MIC/DNA ya cargado por otro manifiesto no se duplica. Permite listar viajes,
+    armar la tabla dinámica y exportar PDFs de períodos pasados sin el .xlsx.
+    """
+
+    # Columna del manifiesto → columna de la tabla viajes
+    COLUMNS = {
+        Columns.MIC: 'mic_dna',
+        Columns.MIC_ORIGINAL: 'mic_original',
+        Columns.DATE: 'fecha_ingreso',
+        Columns.AGENT_CODE: 'codigo',
+        Columns.AGENT_NAME: 'nombre',
+        Columns.PLATE: 'matricula',
+        Columns.TRAILER: 'remolque',
+        Columns.ORIGIN: 'lugar_partida',
+        Columns.DESTINATION: 'lugar_destino',
+        Columns.CUSTOMS_IN: 'aduana_ingreso',
+        Columns.PRICE: 'precio',
+    }
+    TEXT_COLUMNS = [Columns.MIC, Columns.MIC_ORIGINAL, Columns.AGENT_NAME, Columns.PLATE,
+                    Columns.TRAILER, Columns.ORIGIN, Columns.DESTINATION, Columns.CUSTOMS_IN]
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Opción "almacenar_viajes" de config.json"""
+        from src.models.config_manager import config_manager
+        return bool(config_manager.get("almacenar_viajes", True))
+
+    @classmethod
+    def to_frame(cls, df: pd.DataFrame, period: str, file_type: str = FileTypes.INGRESOS) -> pd.DataFrame:
+        """
+        Viajes del manifiesto con las columnas de db.COLUMNAS_VIAJES. El período
+        de cada viaje es el mes de su fecha de ingreso (el mismo criterio que
+        _build_period_mask); sin fecha válida se usa el período del manifiesto.
+        """
+        df = asegurar_tarifas(df, file_type)
+        codigos = manifest_codes(df)
+        valid = codigos != INVALID_CODE
+
+        fechas = pd.to_datetime(df[Columns.DATE], errors='coerce')[valid]
+        data = {
+            'periodo': fechas.dt.strftime('%Y-%m').fillna(period).to_numpy(dtype=object),
+            'codigo': codigos[valid],
+            'fecha_ingreso': fechas.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object),
+            'precio': pd.to_numeric(df[Columns.PRICE], errors='coerce').to_numpy(dtype=np.float64)[valid],
+        }
+        texto = df.reindex(columns=cls.TEXT_COLUMNS)[valid]
+        for columna in cls.TEXT_COLUMNS:
+            serie = texto[columna]
+            data[cls.COLUMNS[columna]] = serie.astype(str).str.strip().where(serie.notna()).to_numpy(dtype=object)
+        return pd.DataFrame(data)[list(db.COLUMNAS_VIAJES)]
+
+    @classmethod
+    def to_rows(cls, df: pd.DataFrame, period: str, file_type: str = FileTypes.INGRESOS) -> list:
+        """Filas para db.reemplazar_viajes_periodo (tuplas con None en lugar de NaN)"""
+        return cls.rows_from_frame(cls.to_frame(df, period, file_type))
+
+    @staticmethod
+    def rows_from_frame(frame: pd.DataFrame) -> list:
+        """Filas de un frame de to_frame (p. ej. ya armado en un proceso hijo)"""
+        rows = frame.astype(object)
+        return list(rows.where(rows.notna(), None).itertuples(index=False, name=None))
+
+    @classmethod
+    def store(cls, df: pd.DataFrame, period: str, file_type: str = FileTypes.INGRESOS) -> int:
+        """
+        Reemplaza los viajes cargados por el manifiesto del período (un único
+        executemany). Retorna los viajes escritos.
+        """
+        return db.reemplazar_viajes_periodo(period, cls.to_rows(df, period, file_type))
+
+    @classmethod
+    def load(cls, period: str,
+             codes: Optional[Union[str, List[str], CodeSet]] = None) -> pd.DataFrame:
+        """
+        Viajes guardados del período (opcionalmente de un código o lista de
+        códigos) con los nombres de columna del manifiesto. El frame queda
+        marcado como tarifado: Precio es el precio calculado al ingresar.
+        """
+        codigos = None
+        if isinstance(codes, str):
+            codigos = [normalize_code_int(codes)]
+        elif codes is not None:
+            codigos = CodeSet.from_codes(codes).codes.tolist()
+
+        rows = db.obtener_viajes(period, codigos)
+        df = rows.rename(columns={db_col: col for col, db_col in cls.COLUMNS.items()})
+        df = df.reindex(columns=list(cls.COLUMNS))
+        df[Columns.DATE] = pd.to_datetime(df[Columns.DATE], errors='coerce')
+        df[Columns.PRICE] = df[Columns.PRICE].astype(np.float64)
+        df.attrs[ATTR_TARIFADO] = FileTypes.INGRESOS
+        return df
+
+    @staticmethod
+    def periods() -> List[str]:
+        """Períodos con viajes guardados"""
+        return db.obtener_periodos_viajes()
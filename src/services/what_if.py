@@ -0,0 +1,129 @@
+# Evaluación vectorizada de escenarios "qué pasaría si" con otros códigos representados
+from typing import Dict, Iterable, List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import Columns
+from src.services.code_set import CodeSet, manifest_codes, normalize_code_int
+from src.services.stats_kernel import grouped_quantiles
+
+CodesLike = Union[List[str], CodeSet]
+
+
+class WhatIfEvaluator:
+    """
+    Precalcula una sola vez los viajes por (código, agente) de un manifiesto y
+    evalúa muchos conjuntos de códigos candidatos a la vez: la pertenencia de
+    cada escenario es una fila de una matriz escenarios × códigos, y los
+    totales y conteos por agente salen de productos matriciales y bincount,
+    sin volver a filtrar el DataFrame por escenario.
+    """
+
+    STATS_COLUMNS = [
+        'mediana_representados', 'mediana_otros',
+        'promedio_representados', 'promedio_otros',
+        'total_viajes_representados', 'total_viajes_otros', 'participacion',
+    ]
+
+    def __init__(self, df: pd.DataFrame,
+                 group_column: str = Columns.AGENT_NAME,
+                 code_column: str = Columns.AGENT_CODE):
+        codes = manifest_codes(df, code_column)
+        names = df[group_column]
+
+        # Ids densos de código (para la matriz de pertenencia) y de nombre de agente
+        self.unique_codes, code_ids = np.unique(codes, return_inverse=True)
+        self.code_totals = np.bincount(code_ids, minlength=len(self.unique_codes))
+        self.total_rows = len(df)
+
+        # Viajes por par (código, nombre); las filas sin nombre no cuentan por agente
+        has_name = names.notna().to_numpy()
+        name_ids, self.names = pd.factorize(names[has_name])
+        pairs = pd.DataFrame({'code': code_ids[has_name], 'name': name_ids})
+        pair_counts = pairs.groupby(['code', 'name']).size()
+        self.pair_code = pair_counts.index.get_level_values('code').to_numpy()
+        self.pair_name = pair_counts.index.get_level_values('name').to_numpy()
+        self.pair_count = pair_counts.to_numpy()
+
+    def membership_matrix(self, code_sets: Sequence[CodesLike]) -> np.ndarray:
+        """Matriz booleana escenarios × códigos del manifiesto"""
+        matrix = np.zeros((len(code_sets), len(self.unique_codes)), dtype=bool)
+        for i, codes in enumerate(code_sets):
+            matrix[i] = CodeSet.from_codes(codes).contains(self.unique_codes)
+        return matrix
+
+    def evaluate(self, code_sets: Union[Sequence[CodesLike], Mapping[str, CodesLike]]) -> pd.DataFrame:
+        """
+        Métricas de calculate_grouped_stats para cada conjunto de códigos.
+        Acepta una lista o un diccionario {nombre_escenario: códigos}; retorna
+        un DataFrame con una fila por escenario.
+        """
+        if isinstance(code_sets, Mapping):
+            labels, code_sets = list(code_sets.keys()), list(code_sets.values())
+        else:
+            code_sets = list(code_sets)
+            labels = list(range(len(code_sets)))
+
+        n_scenarios = len(code_sets)
+        membership = self.membership_matrix(code_sets)
+
+        # Totales por escenario: pertenencia × viajes por código
+        total_rep = membership.astype(np.int64) @ self.code_totals
+        total_otros = self.total_rows - total_rep
+
+        # Viajes por (escenario, grupo, agente) con un único bincount
+        n_names = len(self.names)
+        pair_is_rep = membership[:, self.pair_code]  # escenarios × pares
+        group = (~pair_is_rep).astype(np.int64)       # 0 representados, 1 otros
+        slot = (np.arange(n_scenarios)[:, None] * 2 + group) * n_names + self.pair_name[None, :]
+        per_agent = np.bincount(
+            slot.ravel(),
+            weights=np.broadcast_to(self.pair_count, slot.shape).ravel(),
+            minlength=n_scenarios * 2 * n_names,
+        ).reshape(n_scenarios * 2, n_names)
+
+        # Medianas y promedios sobre los agentes con viajes en cada (escenario, grupo)
+        group_ids, agent_ids = np.nonzero(per_agent)
+        values = per_agent[group_ids, agent_ids]
+        medians = grouped_quantiles(values, group_ids, n_scenarios * 2, (0.5,))[:, 0]
+        sizes = np.bincount(group_ids, minlength=n_scenarios * 2)
+        sums = per_agent.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(sizes > 0, sums / np.maximum(sizes, 1), np.nan)
+
+        total = total_rep + total_otros
+        result = pd.DataFrame({
+            'mediana_representados': np.nan_to_num(medians[0::2]),
+            'mediana_otros': np.nan_to_num(medians[1::2]),
+            'promedio_representados': np.nan_to_num(means[0::2]),
+            'promedio_otros': np.nan_to_num(means[1::2]),
+            'total_viajes_representados': total_rep,
+            'total_viajes_otros': total_otros,
+            'participacion': np.where(total > 0, total_rep / np.maximum(total, 1) * 100, 0.0),
+        }, index=pd.Index(labels, name='escenario'))
+        return result[self.STATS_COLUMNS]
+
+    @staticmethod
+    def with_changes(base_codes: Iterable[str], add: Iterable[str] = (),
+                     remove: Iterable[str] = ()) -> List[str]:
+        """Lista de códigos base con agentes agregados y/o quitados"""
+        removed = {normalize_code_int(c) for c in remove}
+        codes = [c for c in base_codes if normalize_code_int(c) not in removed]
+        present = {normalize_code_int(c) for c in codes}
+        return codes + [c for c in add if normalize_code_int(c) not in present]
+
+    def evaluate_changes(self, base_codes: List[str],
+                         scenarios: Mapping[str, Dict[str, Iterable[str]]]) -> pd.DataFrame:
+        """
+        Evalúa la lista actual ('actual') y variantes {nombre: {'add': [...], 'remove': [...]}}
+        agregando columnas con la diferencia de cada métrica respecto de la actual.
+        """
+        code_sets = {'actual': list(base_codes)}
+        for name, change in scenarios.items():
+            code_sets[name] = self.with_changes(base_codes, change.get('add', ()), change.get('remove', ()))
+
+        result = self.evaluate(code_sets)
+        for column in ('participacion', 'mediana_representados', 'mediana_otros'):
+            result[f'delta_{column}'] = result[column] - result.loc['actual', column]
+        return result
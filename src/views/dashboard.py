@@ -5,11 +5,12 @@ from src.views.tabla_dinamica_viewer import abrir_tabla_dinamica_viewer
 from src.models import db as db_model
 from typing import Optional
 from src.config import (
-    RUTA_GRAFICO_PROMEDIOS, LOGO_PATH, LOGO_SIZE, TAMANO_IMAGEN, TAMANO_POPUP, TAMANO_POPUP_IMG, show_data_directory_info,
-    TITULO_BOXPLOT, TITULO_BARRAS, TITULO_PROMEDIOS
+    RUTA_GRAFICO_PROMEDIOS, RUTA_GRAFICO_MOVIL, RUTA_GRAFICO_CONCENTRACION, LOGO_PATH, LOGO_SIZE, TAMANO_IMAGEN,
+    TAMANO_POPUP, TAMANO_POPUP_IMG, show_data_directory_info,
+    TITULO_BOXPLOT, TITULO_BARRAS, TITULO_PROMEDIOS, TITULO_MOVIL, TITULO_CONCENTRACION
 )
 from src.constants import (
-    Messages, Colors, UI, FileTypes
+    Messages, Colors, UI, FileTypes, Bootstrap
 )
 from src.representados import CODIGOS_REPRESENTADOS 
 from src.models.config_manager import config_manager
@@ -23,6 +24,8 @@ import os
 import pandas as pd
 import threading
 from src.services import FileService
+from src.services.tarifas import aplicar_tarifas
+from src.services.anomaly_scan import AnomalyScanner
 
 # Función principal que crea y lanza la interfaz gráfica
 def crear_dashboard():
@@ -264,7 +267,7 @@ def crear_dashboard():
             messagebox.showinfo("Información", "Primero cargá y procesá un manifiesto válido para poder visualizar la tabla dinámica.")
             return
         try:
-            abrir_tabla_dinamica_viewer(ventana, df_cargado, CODIGOS_REPRESENTADOS, periodo_cargado, tipo_archivo_actual)
+            abrir_tabla_dinamica_viewer(ventana, df_cargado, CODIGOS_REPRESENTADOS, periodo_cargado, tipo_archivo_actual, analysis=analisis_cargado)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
@@ -318,6 +321,7 @@ def crear_dashboard():
     # Estado del último archivo cargado para abrir el visualizador
     df_cargado: Optional[pd.DataFrame] = None
     periodo_cargado: Optional[str] = None
+    analisis_cargado = None  # ManifestAnalysis del último manifiesto cargado
     tipo_archivo_actual: str = FileTypes.INGRESOS  # Tipo de archivo actual
 
     # ═══════════════════════════════════════════════════════════════════════════════
@@ -456,6 +460,26 @@ def crear_dashboard():
     label_historial.pack(fill="x", pady=(get_spacing("sm"), get_spacing("lg")))
     theme_widgets['label_historial'] = label_historial
 
+    # Alertas de saltos/caídas de volumen de representados (solo si hay anomalías)
+    label_anomalias = ctk.CTkLabel(
+        master=content_frame,
+        text="",
+        font=get_font_tuple("sm"),
+        text_color=colors["warning"],
+        anchor="w",
+        justify="left"
+    )
+    theme_widgets['label_anomalias'] = label_anomalias
+
+    def mostrar_anomalias(analisis) -> None:
+        resumen = AnomalyScanner.format_anomalies(getattr(analisis, 'anomalies', None))
+        if resumen:
+            label_anomalias.configure(text=f"⚠️ Variaciones inusuales de volumen:\n{resumen}")
+            label_anomalias.pack(fill="x", pady=(0, get_spacing("lg")), after=label_historial)
+        else:
+            label_anomalias.configure(text="")
+            label_anomalias.pack_forget()
+
     def validar_y_cargar_archivo(ruta_archivo: str) -> pd.DataFrame:
         # Usar FileService para validación
         try:
@@ -471,7 +495,8 @@ def crear_dashboard():
         promedio_otros: float,
         participacion: float,
         viajes_representados: int,
-        actualizado: bool
+        actualizado: bool,
+        intervalos: Optional[dict] = None
     ) -> None:
         # Función helper para formatear números con separador de miles
         def format_number(num: float) -> str:
@@ -489,6 +514,13 @@ def crear_dashboard():
         # Actualizar KPIs con formato mejorado
         valor_representados.set(f"{mediana_rep_fmt} (mediana) | {promedio_rep_fmt} (promedio)")
         valor_otros.set(f"{mediana_otros_fmt} (mediana) | {promedio_otros_fmt} (promedio)")
+        
+        # Intervalo de confianza bootstrap de la mediana, si el análisis lo trae
+        if intervalos:
+            for variable, clave in ((valor_representados, 'mediana_representados'), (valor_otros, 'mediana_otros')):
+                inferior, superior = intervalos[clave]
+                if not pd.isna(inferior):
+                    variable.set(f"{variable.get()}\nIC {Bootstrap.CONFIDENCE:.0%} mediana: {format_number(inferior)} – {format_number(superior)}")
         valor_participacion.set(f"{participacion:.1f}%")  # Solo 1 decimal para porcentajes
         valor_viajes.set(f"{viajes_representados:,} viajes".replace(",", "."))  # Agregar "viajes" y separador
         
@@ -569,17 +601,21 @@ def crear_dashboard():
                         ventana.after(0, on_invalid)
                         return
 
-                    # 2) Procesamiento según tipo de archivo
-                    resultado = file_service.process_manifest_file(ruta_archivo, CODIGOS_REPRESENTADOS, file_type=file_type, df=df_local)
-                    mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion, actualizado, viajes_representados, ruta_boxplot_periodo, ruta_barplot_periodo, es_preview = resultado
+                    # Precios por tarifa calculados una sola vez para viewers, tabla dinámica y PDFs
+                    df_local = aplicar_tarifas(df_local, file_type)
+
+                    # 2) Análisis único del manifiesto (métricas, período, conteos y nombres)
+                    analisis_local = file_service.analyze_manifest(df_local, CODIGOS_REPRESENTADOS, file_type=file_type)
+                    mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion, actualizado, viajes_representados, ruta_boxplot_periodo, ruta_barplot_periodo, es_preview = analisis_local.as_legacy_tuple()
 
-                    # 3) Calcular periodo para el viewer
-                    periodo_local = file_service.compute_period(df_local)
+                    # 3) Periodo para el viewer (ya calculado en el análisis)
+                    periodo_local = analisis_local.period
 
                     def on_success():
-                        nonlocal df_cargado, periodo_cargado
+                        nonlocal df_cargado, periodo_cargado, analisis_cargado
                         df_cargado = df_local
                         periodo_cargado = periodo_local
+                        analisis_cargado = analisis_local
                         
                         # Ocultar mensaje de bienvenida una vez que se carga un archivo
                         welcome_message.pack_forget()
@@ -589,16 +625,22 @@ def crear_dashboard():
                             feedback_icon.set(Messages.LASTRES_CARGADOS)
                             label_feedback.configure(text_color="#43a047")
                             ocultar_kpis_y_graficos()
+                            # KPIs propios de lastres (serie en historico_lastres), sin gráficos
+                            actualizar_panel_resultados(mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion, viajes_representados, actualizado, analisis_local.intervals)
+                            mostrar_kpis()
                         else:
                             # Para ingresos, procesamiento normal
                             feedback_icon.set(Messages.PROCESAMIENTO_EXITOSO if not es_preview else "ℹ Solo vista previa: el periodo es igual o anterior al último registrado. No se guardó en la base de datos ni en la carpeta de gráficos.")
                             label_feedback.configure(text_color=(Colors.SUCCESS if not es_preview else "#e67e22"))
-                            actualizar_panel_resultados(mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion, viajes_representados, actualizado)
+                            actualizar_panel_resultados(mediana_rep, mediana_otros, promedio_rep, promedio_otros, participacion, viajes_representados, actualizado, analisis_local.intervals)
                             mostrar_imagen(ruta_boxplot_periodo, etiqueta_imagen_boxplot)
                             mostrar_imagen(ruta_barplot_periodo, etiqueta_imagen_barras)
                             mostrar_imagen(RUTA_GRAFICO_PROMEDIOS, etiqueta_imagen_promedios)
+                            mostrar_imagen(RUTA_GRAFICO_MOVIL, etiqueta_imagen_movil)
+                            mostrar_imagen(RUTA_GRAFICO_CONCENTRACION, etiqueta_imagen_concentracion)
                             set_rutas_graficos_periodo(ruta_boxplot_periodo, ruta_barplot_periodo)
                             mostrar_kpis_y_graficos()
+                            mostrar_anomalias(analisis_local)
                             # Mostrar botones "Ampliar" ahora que hay datos de ingresos
                             try:
                                 if btn_boxplot.winfo_manager() != 'pack':
@@ -607,6 +649,10 @@ def crear_dashboard():
                                     btn_barras.pack(side="right")
                                 if btn_promedios.winfo_manager() != 'pack':
                                     btn_promedios.pack(side="right")
+                                if btn_movil.winfo_manager() != 'pack':
+                                    btn_movil.pack(side="right")
+                                if btn_concentracion.winfo_manager() != 'pack':
+                                    btn_concentracion.pack(side="right")
                             except Exception:
                                 pass
                         
@@ -642,17 +688,22 @@ def crear_dashboard():
         kpi_section_title.pack_forget()
         kpi_container.pack_forget()
         label_historial.pack_forget()
+        label_anomalias.pack_forget()
         
         # Ocultar sección de gráficos
         charts_section_title.pack_forget()
         frame_graficos.pack_forget()
 
-    def mostrar_kpis_y_graficos():
-        """Muestra los KPIs y gráficos para el modo ingresos"""
-        # Mostrar sección de KPIs
+    def mostrar_kpis():
+        """Muestra la sección de KPIs (ingresos y lastres)"""
         kpi_section_title.pack(fill="x", pady=(0, get_spacing("md")))
         kpi_container.pack(fill="x", pady=(0, get_spacing("xl")))
         label_historial.pack(fill="x", pady=(get_spacing("sm"), get_spacing("lg")))
+
+    def mostrar_kpis_y_graficos():
+        """Muestra los KPIs y gráficos para el modo ingresos"""
+        # Mostrar sección de KPIs
+        mostrar_kpis()
         
         # Mostrar sección de gráficos
         charts_section_title.pack(fill="x", pady=(0, get_spacing("md")))
@@ -696,7 +747,7 @@ def crear_dashboard():
             messagebox.showinfo("Información", "Primero cargá y procesá un manifiesto válido para poder visualizar.")
             return
         try:
-            abrir_viajes_viewer(ventana, df_cargado, CODIGOS_REPRESENTADOS, periodo_cargado, tipo_archivo_actual)
+            abrir_viajes_viewer(ventana, df_cargado, CODIGOS_REPRESENTADOS, periodo_cargado, tipo_archivo_actual, analysis=analisis_cargado)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
@@ -730,14 +781,14 @@ def crear_dashboard():
     charts_section_title.pack(fill="x", pady=(0, get_spacing("md")))
     theme_widgets['charts_section_title'] = charts_section_title
 
-    # Contenedor de gráficos en 3 columnas
+    # Contenedor de gráficos en 3 columnas (series históricas en la segunda fila)
     frame_graficos = ctk.CTkFrame(master=content_frame, fg_color="transparent")
     frame_graficos.pack(fill="x", pady=(0, get_spacing("xl")))
     frame_graficos.grid_columnconfigure((0, 1, 2), weight=1)
     theme_widgets['frame_graficos'] = frame_graficos
 
     # Función para crear tarjeta de gráfico uniforme
-    def crear_chart_card(parent, title: str, col: int):
+    def crear_chart_card(parent, title: str, col: int, row: int = 0):
         # Tarjeta contenedora
         card = ctk.CTkFrame(
             master=parent,
@@ -747,7 +798,7 @@ def crear_dashboard():
             border_color=colors["border"],
             height=300  # Altura uniforme
         )
-        card.grid(row=0, column=col, sticky="nsew", padx=get_spacing("sm"), pady=get_spacing("sm"))
+        card.grid(row=row, column=col, sticky="nsew", padx=get_spacing("sm"), pady=get_spacing("sm"))
         card.grid_propagate(False)  # Mantener altura fija
         
         # Header de la tarjeta
@@ -792,12 +843,15 @@ def crear_dashboard():
     card_boxplot, titulo_boxplot, btn_boxplot, etiqueta_imagen_boxplot = crear_chart_card(frame_graficos, TITULO_BOXPLOT, 0)
     card_barras, titulo_barras, btn_barras, etiqueta_imagen_barras = crear_chart_card(frame_graficos, TITULO_BARRAS, 1)
     card_promedios, titulo_promedios, btn_promedios, etiqueta_imagen_promedios = crear_chart_card(frame_graficos, TITULO_PROMEDIOS, 2)
+    card_movil, titulo_movil, btn_movil, etiqueta_imagen_movil = crear_chart_card(frame_graficos, TITULO_MOVIL, 0, row=1)
+    card_concentracion, titulo_concentracion, btn_concentracion, etiqueta_imagen_concentracion = crear_chart_card(
+        frame_graficos, TITULO_CONCENTRACION, 1, row=1)
 
     # Guardar referencias para el tema
     theme_widgets.update({
-        'chart_cards': [card_boxplot, card_barras, card_promedios],
-        'chart_titles': [titulo_boxplot, titulo_barras, titulo_promedios],
-        'chart_buttons': [btn_boxplot, btn_barras, btn_promedios]
+        'chart_cards': [card_boxplot, card_barras, card_promedios, card_movil, card_concentracion],
+        'chart_titles': [titulo_boxplot, titulo_barras, titulo_promedios, titulo_movil, titulo_concentracion],
+        'chart_buttons': [btn_boxplot, btn_barras, btn_promedios, btn_movil, btn_concentracion]
     })
 
     # Referencias a las imágenes para evitar que el recolector de basura las elimine
@@ -818,6 +872,8 @@ def crear_dashboard():
     btn_boxplot.configure(command=lambda: mostrar_imagen_ampliada(ruta_boxplot_actual))
     btn_barras.configure(command=lambda: mostrar_imagen_ampliada(ruta_barplot_actual))
     btn_promedios.configure(command=lambda: mostrar_imagen_ampliada(RUTA_GRAFICO_PROMEDIOS))
+    btn_movil.configure(command=lambda: mostrar_imagen_ampliada(RUTA_GRAFICO_MOVIL))
+    btn_concentracion.configure(command=lambda: mostrar_imagen_ampliada(RUTA_GRAFICO_CONCENTRACION))
 
     # Eliminar binds de click en las imágenes
 
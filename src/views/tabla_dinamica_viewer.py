@@ -11,7 +11,8 @@ from src.models.viajes_representado import (
     calcular_totales_tabla_dinamica,
     ordenar_tabla_dinamica,
 )
-from src.constants import FileTypes, Processing
+from src.constants import FileTypes
+from src.services.tarifas import asegurar_tarifas
 from src.config import LOGO_PATH
 from src.models.design_manager import design_manager
 from src.models.design_system import get_color, get_spacing, get_font_tuple
@@ -20,13 +21,14 @@ from src.models.design_system import get_color, get_spacing, get_font_tuple
 class TablaDinamicaViewer(ctk.CTkToplevel):
     # Ventana para visualizar la tabla dinámica de resumen de transportes
 
-    def __init__(self, master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS):
+    def __init__(self, master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS, analysis=None):
         super().__init__(master)
         self.title(f"Tabla Dinámica - {file_type.title()}")
         self.geometry("1430x890")
         self.resizable(True, True)
 
-        self.df_original = df_original
+        # Precios por tarifa calculados una sola vez para tabla y gráfico
+        self.df_original = asegurar_tarifas(df_original, file_type)
         self.codigos_representados = codigos_representados
         self.periodo = periodo
         self.file_type = file_type
@@ -35,9 +37,11 @@ class TablaDinamicaViewer(ctk.CTkToplevel):
         # Obtener colores del sistema de diseño
         self.colors = design_manager.get_colors()
 
-        # Generar datos de la tabla dinámica con precio según tipo
-        precio_por_viaje = Processing.LASTRES_PRICE_PER_TRIP if file_type == FileTypes.LASTRES else Processing.DEFAULT_PRICE_PER_TRIP
-        self.df_resumen = generar_tabla_dinamica_resumen(df_original, periodo, codigos_representados, precio_por_viaje=precio_por_viaje)
+        # Generar datos de la tabla dinámica (sumas de Precio del frame tarifado);
+        # si el análisis del manifiesto ya tiene el cubo de rutas, se usa directamente
+        self.df_resumen = analysis.tabla_dinamica(periodo) if analysis is not None else None
+        if self.df_resumen is None:
+            self.df_resumen = generar_tabla_dinamica_resumen(self.df_original, periodo, codigos_representados, file_type=file_type)
         self.df_resumen = ordenar_tabla_dinamica(self.df_resumen, self.orden_actual)
         self.totales = calcular_totales_tabla_dinamica(self.df_resumen)
 
@@ -230,9 +234,8 @@ class TablaDinamicaViewer(ctk.CTkToplevel):
 
         # Generar datos para el gráfico SIEMPRE ordenados por "Cantidad de Viajes"
         # Esto asegura que el gráfico no cambie con el filtro de la tabla
-        precio_por_viaje = Processing.LASTRES_PRICE_PER_TRIP if self.file_type == FileTypes.LASTRES else Processing.DEFAULT_PRICE_PER_TRIP
         df_chart_base = generar_tabla_dinamica_resumen(
-            self.df_original, self.periodo, self.codigos_representados, precio_por_viaje=precio_por_viaje
+            self.df_original, self.periodo, self.codigos_representados, file_type=self.file_type
         )
         df_chart_sorted = ordenar_tabla_dinamica(df_chart_base, "cantidad_viajes")
 
@@ -354,5 +357,5 @@ class TablaDinamicaViewer(ctk.CTkToplevel):
         )
 
 
-def abrir_tabla_dinamica_viewer(master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS) -> None:
-    TablaDinamicaViewer(master, df_original=df_original, codigos_representados=codigos_representados, periodo=periodo, file_type=file_type)
+def abrir_tabla_dinamica_viewer(master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS, analysis=None) -> None:
+    TablaDinamicaViewer(master, df_original=df_original, codigos_representados=codigos_representados, periodo=periodo, file_type=file_type, analysis=analysis)
@@ -24,6 +24,8 @@ from src.models.design_system import (
 from src.models.design_manager import design_manager
 from src.services.gmail_service import GmailDraftService
 from src.services.representados_contactos import get_contact_info
+from src.services.tarifas import asegurar_tarifas
+from src.services.market_ranking import rank_against_market, ranking_for, format_ranking
 
 try:  # WebView para previsualizar HTML (sin depender del navegador)
     from tkinterweb import HtmlFrame  # type: ignore
@@ -34,17 +36,26 @@ except Exception:  # fallback si no está disponible
 class ViajesViewer(ctk.CTkToplevel):
     # Ventana para visualizar y exportar viajes por representado
 
-    def __init__(self, master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS):
+    def __init__(self, master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS, analysis=None):
         super().__init__(master)
         self.title(f"Reportes de Viajes - {file_type.title()}")
         self.geometry("1200x800")  # Tamaño más grande para mejor experiencia
         self.resizable(True, True)
 
-        self.df_original = df_original
-        # Mapear solo los que viajaron: [(codigo, nombre), ...]
-        self.items_cod_nombre = listar_representados_con_viajes(df_original, codigos_representados, periodo)
+        # Frame con precios por tarifa calculados una sola vez para KPIs, preview y PDFs
+        self.df_original = asegurar_tarifas(df_original, file_type)
+        # Mapear solo los que viajaron: [(codigo, nombre), ...] (del análisis si ya está calculado)
+        if analysis is not None:
+            self.items_cod_nombre = analysis.representados_con_viajes(periodo)
+        else:
+            self.items_cod_nombre = listar_representados_con_viajes(df_original, codigos_representados, periodo)
         self.periodo = periodo
         self.file_type = file_type
+        # Percentil/puesto de todos los representados frente al mercado, en una sola pasada
+        if analysis is not None and analysis.period == periodo:
+            self.ranking = analysis.ranking
+        else:
+            self.ranking = rank_against_market(self.df_original, codigos_representados, periodo)
 
         # Obtener colores del sistema de diseño
         self.colors = design_manager.get_colors()
@@ -54,7 +65,8 @@ class ViajesViewer(ctk.CTkToplevel):
             'total_viajes': ctk.StringVar(value="0"),
             'monto_total': ctk.StringVar(value="$ 0"),
             'codigo_actual': ctk.StringVar(value="-"),
-            'representado_actual': ctk.StringVar(value="")
+            'representado_actual': ctk.StringVar(value=""),
+            'percentil_mercado': ctk.StringVar(value="-")
         }
 
         self._crear_ui()
@@ -115,13 +127,14 @@ class ViajesViewer(ctk.CTkToplevel):
         
         kpi_frame = ctk.CTkFrame(header_frame, fg_color="transparent")
         kpi_frame.pack(fill="x", padx=get_spacing("md"), pady=(get_spacing("md"), get_spacing("md")))
-        kpi_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        kpi_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
 
         # Crear KPIs individuales
         self._crear_kpi_card(kpi_frame, "🚚 Total Viajes", self.stats_vars['total_viajes'], 0, 0)
         self._crear_kpi_card(kpi_frame, "💰 Monto Total", self.stats_vars['monto_total'], 0, 1)
         self._crear_kpi_card(kpi_frame, "🏷️ Código", self.stats_vars['codigo_actual'], 0, 2)
         self._crear_kpi_card(kpi_frame, "👤 Representado", self.stats_vars['representado_actual'], 0, 3)
+        self._crear_kpi_card(kpi_frame, "📈 Percentil Mercado", self.stats_vars['percentil_mercado'], 0, 4)
 
         # ═══════════════════════════════════════════════════════════════════════════════
         # BARRA DE ACCIONES CON SPLIT BUTTON
@@ -300,28 +313,23 @@ class ViajesViewer(ctk.CTkToplevel):
         """Actualizar KPIs y vista previa de tabla"""
         try:
             df = self._collect_current_df()
-            self._actualizar_kpis(df)
-            self._render_preview(df)
+            stats = calcular_estadisticas_viajes(df, file_type=self.file_type)
+            self._actualizar_kpis(df, stats)
+            self._render_preview(formatear_datos_para_visualizacion(df), stats)
         except Exception as e:
             print(f"Error actualizando preview: {e}")
 
-    def _actualizar_kpis(self, df: pd.DataFrame):
+    def _actualizar_kpis(self, df: pd.DataFrame, stats: dict):
         """Actualizar los valores de los KPIs"""
         if df.empty:
             self.stats_vars['total_viajes'].set("0")
             self.stats_vars['monto_total'].set("$ 0")
             self.stats_vars['codigo_actual'].set("-")
             self.stats_vars['representado_actual'].set("Sin selección")
+            self.stats_vars['percentil_mercado'].set("-")
         else:
             # Calcular estadísticas
             total_viajes = len(df)
-            # Usar precio correcto según el tipo de archivo
-            precio = (
-                Processing.LASTRES_PRICE_PER_TRIP
-                if self.file_type == FileTypes.LASTRES
-                else Processing.DEFAULT_PRICE_PER_TRIP
-            )
-            stats = calcular_estadisticas_viajes(df, precio_por_viaje=precio)
             # Keys válidas según calcular_estadisticas_viajes
             monto_total = stats.get("total", 0)
             
@@ -338,20 +346,15 @@ class ViajesViewer(ctk.CTkToplevel):
             self.stats_vars['monto_total'].set(format_currency(monto_total))
             self.stats_vars['codigo_actual'].set(codigo_actual)
             self.stats_vars['representado_actual'].set(representado_actual)
+            self.stats_vars['percentil_mercado'].set(format_ranking(ranking_for(self.ranking, codigo_actual)))
 
-    def _render_preview(self, df: pd.DataFrame) -> None:
+    def _render_preview(self, df: pd.DataFrame, stats: dict) -> None:
         # Renderiza HTML optimizado para preview con mejor formato
         if df.empty:
             html = "<div style='padding:16px;font-family:Segoe UI,Arial;color:#666'>No hay viajes para el período seleccionado.</div>"
         else:
             # Calcular estadísticas
             total_viajes = len(df)
-            precio = (
-                Processing.LASTRES_PRICE_PER_TRIP
-                if self.file_type == FileTypes.LASTRES
-                else Processing.DEFAULT_PRICE_PER_TRIP
-            )
-            stats = calcular_estadisticas_viajes(df, precio_por_viaje=precio)
             monto_total = stats.get("total", 0)
             representado_actual = self.display_var.get() or "-"
             codigo_actual = self.codigo_por_nombre.get(representado_actual, "-")
@@ -438,18 +441,13 @@ class ViajesViewer(ctk.CTkToplevel):
         nombre_sel = self.display_var.get()
         codigo = self.codigo_por_nombre.get(nombre_sel, "")
         df_viajes = obtener_viajes_representado(self.df_original, codigo, self.periodo)
-        
-        # Usar columnas y precio según el tipo de archivo
+        return filtrar_columnas_relevantes(df_viajes, columnas=self._columnas_reporte(), file_type=self.file_type)
+
+    def _columnas_reporte(self) -> List[str]:
+        # Columnas del reporte según el tipo de archivo (los precios ya vienen tarifados)
         if self.file_type == FileTypes.LASTRES:
-            columnas = Processing.LASTRES_COLUMNS_ORDER
-            precio = Processing.LASTRES_PRICE_PER_TRIP
-        else:
-            columnas = DEFAULT_COLUMNS_ORDER  
-            precio = Processing.DEFAULT_PRICE_PER_TRIP
-            
-        df_viajes = filtrar_columnas_relevantes(df_viajes, columnas=columnas, precio_por_viaje=precio)
-        df_viajes_fmt = formatear_datos_para_visualizacion(df_viajes)
-        return df_viajes_fmt
+            return Processing.LASTRES_COLUMNS_ORDER
+        return DEFAULT_COLUMNS_ORDER
 
     def _on_combo_change(self, _value: str) -> None:
         # Actualiza previsualización inmediatamente al cambiar selección
@@ -461,25 +459,18 @@ class ViajesViewer(ctk.CTkToplevel):
             codigo = self.codigo_por_nombre.get(nombre_sel, "")
             df = obtener_viajes_representado(self.df_original, codigo, self.periodo)
             
-            # Usar columnas y precio según el tipo de archivo
-            if self.file_type == FileTypes.LASTRES:
-                columnas = Processing.LASTRES_COLUMNS_ORDER
-                precio = Processing.LASTRES_PRICE_PER_TRIP
-            else:
-                columnas = DEFAULT_COLUMNS_ORDER  
-                precio = Processing.DEFAULT_PRICE_PER_TRIP
-                
-            df = filtrar_columnas_relevantes(df, columnas=columnas, precio_por_viaje=precio)
-            stats = calcular_estadisticas_viajes(df, precio_por_viaje=precio)
+            columnas = self._columnas_reporte()
+            df = filtrar_columnas_relevantes(df, columnas=columnas, file_type=self.file_type)
+            stats = calcular_estadisticas_viajes(df, file_type=self.file_type)
             ruta_pdf = generar_pdf_para_representado(
                 self.df_original,
                 codigo=codigo,
                 periodo=self.periodo,
                 nombre_representado=nombre_sel or None,
-                precio_por_viaje=stats["precio_por_viaje"],
                 columnas=columnas,
                 logo_path=str(LOGO_PATH),
-                file_type=self.file_type
+                file_type=self.file_type,
+                ranking=ranking_for(self.ranking, codigo)
             )
             messagebox.showinfo("Exportación", "PDF generado en la carpeta descargas")
         except Exception as e:
@@ -499,25 +490,18 @@ class ViajesViewer(ctk.CTkToplevel):
                 if df.empty:
                     continue
                 
-                # Usar columnas y precio según el tipo de archivo
-                if self.file_type == FileTypes.LASTRES:
-                    columnas = Processing.LASTRES_COLUMNS_ORDER
-                    precio = Processing.LASTRES_PRICE_PER_TRIP
-                else:
-                    columnas = DEFAULT_COLUMNS_ORDER  
-                    precio = Processing.DEFAULT_PRICE_PER_TRIP
-                    
-                df = filtrar_columnas_relevantes(df, columnas=columnas, precio_por_viaje=precio)
-                stats = calcular_estadisticas_viajes(df, precio_por_viaje=precio)
+                columnas = self._columnas_reporte()
+                df = filtrar_columnas_relevantes(df, columnas=columnas, file_type=self.file_type)
+                stats = calcular_estadisticas_viajes(df, file_type=self.file_type)
                 ruta_pdf = generar_pdf_para_representado(
                     self.df_original,
                     codigo=codigo,
                     periodo=self.periodo,
                     nombre_representado=nombre,
-                    precio_por_viaje=stats["precio_por_viaje"],
                     columnas=columnas,
                     logo_path=str(LOGO_PATH),
-                    file_type=self.file_type
+                    file_type=self.file_type,
+                    ranking=ranking_for(self.ranking, codigo)
                 )
                 generados.append(str(ruta_pdf))
             if generados:
@@ -646,16 +630,9 @@ class ViajesViewer(ctk.CTkToplevel):
                     "message": f"No hay viajes para {nombre} en el período {self.periodo}"
                 }
             
-            # Usar columnas y precio según el tipo de archivo
-            if self.file_type == FileTypes.LASTRES:
-                columnas = Processing.LASTRES_COLUMNS_ORDER
-                precio = Processing.LASTRES_PRICE_PER_TRIP
-            else:
-                columnas = DEFAULT_COLUMNS_ORDER  
-                precio = Processing.DEFAULT_PRICE_PER_TRIP
-                
-            df = filtrar_columnas_relevantes(df, columnas=columnas, precio_por_viaje=precio)
-            stats = calcular_estadisticas_viajes(df, precio_por_viaje=precio)
+            columnas = self._columnas_reporte()
+            df = filtrar_columnas_relevantes(df, columnas=columnas, file_type=self.file_type)
+            stats = calcular_estadisticas_viajes(df, file_type=self.file_type)
             
             # Generar PDF
             ruta_pdf = generar_pdf_para_representado(
@@ -663,10 +640,10 @@ class ViajesViewer(ctk.CTkToplevel):
                 codigo=codigo,
                 periodo=self.periodo,
                 nombre_representado=nombre,
-                precio_por_viaje=stats["precio_por_viaje"],
                 columnas=columnas,
                 logo_path=str(LOGO_PATH),
-                file_type=self.file_type
+                file_type=self.file_type,
+                ranking=ranking_for(self.ranking, codigo)
             )
             
             # Construir asunto y cuerpo del correo
@@ -746,7 +723,7 @@ class ViajesViewer(ctk.CTkToplevel):
 
 
 
-def abrir_viajes_viewer(master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS) -> None:
-    ViajesViewer(master, df_original=df_original, codigos_representados=codigos_representados, periodo=periodo, file_type=file_type)
+def abrir_viajes_viewer(master, df_original: pd.DataFrame, codigos_representados: List[str], periodo: str, file_type: str = FileTypes.INGRESOS, analysis=None) -> None:
+    ViajesViewer(master, df_original=df_original, codigos_representados=codigos_representados, periodo=periodo, file_type=file_type, analysis=analysis)
 
 
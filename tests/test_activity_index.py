@@ -0,0 +1,44 @@
+# Bitmaps de actividad: consultas sobre una instancia recién creada (base ya poblada)
+import pandas as pd
+import pytest
+
+from src.constants import Columns
+from src.models import db
+from src.services.activity_index import ActivityIndex
+
+
+@pytest.fixture(autouse=True)
+def base_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "historico.db"))
+    db.crear_tabla_si_no_existe()
+    yield
+    db.cerrar_conexiones()
+
+
+def _manifest(codes):
+    return pd.DataFrame({Columns.AGENT_CODE: codes})
+
+
+def _populate() -> ActivityIndex:
+    index = ActivityIndex()
+    index.record_period(_manifest(["1", "2"]), "2024-01")
+    index.record_period(_manifest(["1", "3", "4"]), "2024-02")
+    index.record_period(_manifest(["3", "5"]), "2024-03")
+    return index
+
+
+def test_cohort_retention_after_restart():
+    warm = _populate().cohort_retention("2024-02")
+    fresh = ActivityIndex().cohort_retention("2024-02")  # Como tras reiniciar la aplicación
+
+    pd.testing.assert_frame_equal(fresh, warm)
+    assert fresh['cohorte'].tolist() == [2]   # 3 y 4 son nuevos en 2024-02
+    assert fresh['activos'].tolist() == [1]   # Solo 3 sigue activo en 2024-03
+    assert fresh['retencion'].tolist() == [50.0]
+
+
+def test_new_and_lost_agents_after_restart():
+    _populate()
+    index = ActivityIndex()
+    assert index.decode(index.new_agents("2024-03")) == ["5"]
+    assert index.decode(index.lost_agents("2024-03")) == ["1", "4"]
@@ -0,0 +1,75 @@
+# Paridad entre el motor Parquet/DuckDB y DataProcessor sobre los manifiestos concatenados
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from src.constants import Columns
+from src.models import db
+from src.services.data_processor import DataProcessor
+from src.services.duckdb_analytics import DuckDBAnalytics
+from src.services.period_comparison import PeriodComparison
+from src.services.tarifas import ATTR_TARIFADO
+
+CODES = ["101", "303"]
+PERIODS = ["2024-03", "2024-04", "2024-05"]
+
+
+def _manifest(period: str, n: int = 300, seed: int = 0) -> pd.DataFrame:
+    """Manifiesto sintético del período con códigos de tipos mezclados y nombres faltantes"""
+    rng = np.random.default_rng(seed)
+    code_pool = np.array([101, "101", 202.0, "303", "0404", 505, "6.06", 707], dtype=object)
+    names = np.array(["Alfa", "Beta", "Gamma", "Delta", None], dtype=object)
+    df = pd.DataFrame({
+        Columns.AGENT_CODE: code_pool[rng.integers(0, len(code_pool), n)],
+        Columns.AGENT_NAME: names[rng.integers(0, len(names), n)],
+        Columns.DATE: pd.Timestamp(f"{period}-01") + pd.to_timedelta(rng.integers(0, 28, n), unit="D"),
+        Columns.PRICE: 40.0,
+    })
+    df.attrs[ATTR_TARIFADO] = "ingresos"
+    return df
+
+
+@pytest.fixture
+def manifests():
+    return {period: _manifest(period, seed=i) for i, period in enumerate(PERIODS)}
+
+
+@pytest.fixture
+def engine(tmp_path, manifests):
+    engine = DuckDBAnalytics(tmp_path / "parquet")
+    for period, df in manifests.items():
+        engine.write_period(df, period)
+    return engine
+
+
+def test_write_period(engine):
+    assert engine.periods() == PERIODS
+
+
+@pytest.mark.parametrize("desde,hasta", [(None, None), ("2024-04", "2024-05"), ("2024-03", "2024-03")])
+def test_calculate_grouped_stats(engine, manifests, desde, hasta):
+    dfs = [df for period, df in manifests.items()
+           if (desde is None or period >= desde) and (hasta is None or period <= hasta)]
+    esperado = DataProcessor.calculate_grouped_stats(pd.concat(dfs, ignore_index=True), CODES)
+    obtenido = engine.calculate_grouped_stats(CODES, desde, hasta)
+    assert obtenido.keys() == esperado.keys()
+    for clave, valor in esperado.items():
+        assert obtenido[clave] == pytest.approx(valor), clave
+
+
+def test_compare_periods_uses_exact_range_medians(tmp_path, monkeypatch, engine, manifests):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "historico.db"))
+    db.crear_tabla_si_no_existe()
+    try:
+        for period in PERIODS:
+            db.insertar_registro(period, 0, 0, 0, 0, 0)
+        resultado = PeriodComparison.compare(("2024-03", "2024-04"), ("2024-05", "2024-05"), CODES, engine=engine)
+    finally:
+        db.cerrar_conexiones()
+
+    esperado = DataProcessor.calculate_grouped_stats(
+        pd.concat([manifests["2024-03"], manifests["2024-04"]], ignore_index=True), CODES)
+    assert resultado['metricas'].loc['mediana_representados', 'a'] == pytest.approx(esperado['mediana_representados'])
+    assert resultado['metricas'].loc['mediana_otros', 'a'] == pytest.approx(esperado['mediana_otros'])
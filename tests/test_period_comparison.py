@@ -0,0 +1,54 @@
+# Comparación de períodos: la concentración usa la misma clave que el histórico
+import pandas as pd
+import pytest
+
+from src.constants import Columns
+from src.models import db
+from src.services.data_processor import DataProcessor
+from src.services.period_comparison import PeriodComparison
+from src.services.rolling_metrics import RollingMetrics
+
+PERIOD = "2024-06"
+CODES = ["100"]
+
+
+@pytest.fixture(autouse=True)
+def base_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "historico.db"))
+    db.crear_tabla_si_no_existe()
+    yield
+    db.cerrar_conexiones()
+
+
+def _manifest() -> pd.DataFrame:
+    """Dos códigos con el mismo nombre y un código con dos nombres"""
+    filas = [("100", "Alfa")] * 6 + [("200", "Alfa")] * 3 + [("300", "Beta")] * 2 + [("300", "BETA SA")] * 4
+    return pd.DataFrame({
+        Columns.AGENT_CODE: [codigo for codigo, _ in filas],
+        Columns.AGENT_NAME: [nombre for _, nombre in filas],
+        Columns.DATE: pd.Timestamp(f"{PERIOD}-10"),
+    })
+
+
+def _concentracion(metricas: pd.DataFrame, columna: str) -> dict:
+    return {k: metricas.loc[k, columna] for k in db.COLUMNAS_CONCENTRACION}
+
+
+def test_range_concentration_matches_stored():
+    df = _manifest()
+    esperado = DataProcessor.concentration_from_df(df)
+    RollingMetrics.ingest_period(df, CODES, PERIOD)
+
+    # Rango con un mes sin datos: se calcula con los conteos por código
+    resultado = PeriodComparison.compare(("2024-05", PERIOD), ("2024-05", PERIOD))
+    assert _concentracion(resultado['metricas'], 'a') == pytest.approx(esperado)
+
+
+def test_single_period_reads_stored_concentration():
+    df = _manifest()
+    RollingMetrics.ingest_period(df, CODES, PERIOD)
+    guardada = {'hhi': 1.0, 'top5_share': 2.0, 'top10_share': 3.0, 'gini': 0.4}
+    db.insertar_registro(PERIOD, 0, 0, 0, 0, 0, guardada)
+
+    resultado = PeriodComparison.compare(PERIOD, PERIOD)
+    assert _concentracion(resultado['metricas'], 'b') == pytest.approx(guardada)
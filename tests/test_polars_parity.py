@@ -0,0 +1,76 @@
+# Paridad entre el backend pandas (DataProcessor) y el backend Polars
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("polars")
+
+from src.constants import Columns
+from src.services.data_processor import DataProcessor
+from src.services.polars_data_processor import PolarsDataProcessor
+
+CODES = ["101", "2.02", "0303", "404"]
+PERIOD = "2024-05"
+
+
+def _manifest(n: int = 600, seed: int = 0) -> pd.DataFrame:
+    """Manifiesto sintético con códigos de tipos mezclados, nombres faltantes y fechas inválidas"""
+    rng = np.random.default_rng(seed)
+    code_pool = np.array([101, "101", "2-02", 202.0, "303", "0404", "x", None, 505, "6.06", 707], dtype=object)
+    date_pool = np.array(
+        ["2024-05-03", "2024-05-17", "2024-05-28", "2024-04-30", "2024-06-01",
+         "no es fecha", None, pd.Timestamp("2024-05-09 14:30")],
+        dtype=object,
+    )
+    names = np.array(["Alfa", "Beta", "Gamma", "Delta", None, "alfa"], dtype=object)
+    return pd.DataFrame({
+        Columns.AGENT_CODE: code_pool[rng.integers(0, len(code_pool), n)],
+        Columns.AGENT_NAME: names[rng.integers(0, len(names), n)],
+        Columns.DATE: date_pool[rng.integers(0, len(date_pool), n)],
+    })
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    return _manifest()
+
+
+def test_filter_by_codes(df):
+    rep_pd, otros_pd = DataProcessor.filter_by_codes(df, CODES)
+    rep_pl, otros_pl = PolarsDataProcessor.filter_by_codes(df, CODES)
+    pd.testing.assert_frame_equal(rep_pl, rep_pd)
+    pd.testing.assert_frame_equal(otros_pl, otros_pd)
+
+
+def test_filter_by_codes_and_period(df):
+    esperado = DataProcessor.filter_by_codes_and_period(df, CODES, PERIOD)
+    obtenido = PolarsDataProcessor.filter_by_codes_and_period(df, CODES, PERIOD)
+    assert not esperado.empty
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_calculate_grouped_stats(df):
+    esperado = DataProcessor.calculate_grouped_stats(df, CODES)
+    obtenido = PolarsDataProcessor.calculate_grouped_stats(df, CODES)
+    assert obtenido.keys() == esperado.keys()
+    for clave, valor in esperado.items():
+        assert obtenido[clave] == pytest.approx(valor), clave
+
+
+def test_get_agents_with_trips(df):
+    esperado = DataProcessor.get_agents_with_trips(df, CODES, PERIOD)
+    obtenido = PolarsDataProcessor.get_agents_with_trips(df, CODES, PERIOD)
+    assert esperado
+    assert obtenido == esperado
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_extract_period_from_df(seed):
+    df = _manifest(seed=seed)
+    assert PolarsDataProcessor.extract_period_from_df(df) == DataProcessor.extract_period_from_df(df)
+
+
+def test_extract_period_without_valid_dates():
+    df = _manifest().assign(**{Columns.DATE: "no es fecha"})
+    assert DataProcessor.extract_period_from_df(df) is None
+    assert PolarsDataProcessor.extract_period_from_df(df) is None
@@ -0,0 +1,30 @@
+# Bootstrap por bloques: mismo intervalo sin importar el tamaño del bloque
+import numpy as np
+import pytest
+
+from src.services import stats_kernel
+from src.services.stats_kernel import bootstrap_intervals
+
+
+@pytest.fixture
+def values() -> np.ndarray:
+    return np.random.default_rng(3).poisson(20, size=3000)
+
+
+@pytest.mark.parametrize("chunk_elements", [1, 777, 3000, 10 ** 8])
+def test_bootstrap_independent_of_chunk_size(monkeypatch, values, chunk_elements):
+    esperado = bootstrap_intervals(values, n_resamples=300)
+    monkeypatch.setattr(stats_kernel, "BOOTSTRAP_CHUNK_ELEMENTS", chunk_elements)
+    assert bootstrap_intervals(values, n_resamples=300) == esperado
+
+
+def test_bootstrap_matches_single_matrix(values):
+    rng = np.random.default_rng(0)
+    samples = values.astype(np.float64)[rng.integers(0, len(values), size=(300, len(values)))]
+    obtenido = bootstrap_intervals(values, n_resamples=300, confidence=0.9)
+    assert obtenido['mean'] == pytest.approx(tuple(np.percentile(samples.mean(axis=1), [5, 95])))
+    assert obtenido['median'] == pytest.approx(tuple(np.percentile(np.median(samples, axis=1), [5, 95])))
+
+
+def test_bootstrap_empty():
+    assert all(np.isnan(extremo) for intervalo in bootstrap_intervals([]).values() for extremo in intervalo)
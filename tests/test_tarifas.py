@@ -0,0 +1,52 @@
+# Precios por tipo de archivo: lastres no usa el precio base de ingresos
+import pandas as pd
+import pytest
+
+from src.constants import Columns, FileTypes, Processing
+from src.models import viajes_representado as vr
+from src.services import tarifas
+from src.services.tarifas import aplicar_tarifas, esta_tarifado
+
+CODES = ["100", "200"]
+PERIOD = "2024-06"
+
+
+@pytest.fixture(autouse=True)
+def sin_tarifas(tmp_path, monkeypatch):
+    monkeypatch.setattr(tarifas, "TARIFAS_JSON_PATH", tmp_path / "tarifas.json")
+
+
+def _manifest() -> pd.DataFrame:
+    return pd.DataFrame({
+        Columns.AGENT_CODE: ["100", "100", "200", "300"],
+        Columns.AGENT_NAME: ["Alfa", "Alfa", "Beta", "Gamma"],
+        Columns.DATE: pd.Timestamp(f"{PERIOD}-10"),
+    })
+
+
+def test_esta_tarifado_compares_file_type():
+    df = aplicar_tarifas(_manifest(), FileTypes.INGRESOS)
+    assert esta_tarifado(df, FileTypes.INGRESOS)
+    assert not esta_tarifado(df, FileTypes.LASTRES)
+
+
+@pytest.mark.parametrize("file_type,precio", [
+    (FileTypes.INGRESOS, Processing.DEFAULT_PRICE_PER_TRIP),
+    (FileTypes.LASTRES, Processing.LASTRES_PRICE_PER_TRIP),
+])
+def test_base_price_follows_file_type(file_type, precio):
+    df = _manifest()
+    stats = vr.calcular_estadisticas_viajes(df, file_type=file_type)
+    assert stats["total"] == pytest.approx(len(df) * precio)
+
+    columnas = vr.filtrar_columnas_relevantes(df, file_type=file_type)
+    assert (columnas["Precio"] == precio).all()
+
+    resumen = vr.generar_tabla_dinamica_resumen(df, PERIOD, CODES, file_type=file_type)
+    assert resumen["Suma de PRECIO"].tolist() == pytest.approx([2 * precio, precio])
+
+
+def test_frame_tarifado_for_other_type_is_repriced():
+    df = aplicar_tarifas(_manifest(), FileTypes.INGRESOS)
+    stats = vr.calcular_estadisticas_viajes(df, file_type=FileTypes.LASTRES)
+    assert stats["precio_por_viaje"] == pytest.approx(Processing.LASTRES_PRICE_PER_TRIP)
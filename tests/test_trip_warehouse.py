@@ -0,0 +1,52 @@
+# Almacén de viajes: recargar un manifiesto reemplaza sus viajes
+import pandas as pd
+import pytest
+
+from src.constants import Columns
+from src.models import db
+from src.services.trip_warehouse import TripWarehouse
+from src.services.tarifas import ATTR_TARIFADO
+
+PERIOD = "2024-06"
+
+
+@pytest.fixture(autouse=True)
+def base_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "historico.db"))
+    db.crear_tabla_si_no_existe()
+    yield
+    db.cerrar_conexiones()
+
+
+def _manifest(n: int = 50, precio: float = 40.0, con_mic: bool = True) -> pd.DataFrame:
+    df = pd.DataFrame({
+        Columns.AGENT_CODE: [str(100 + i % 5) for i in range(n)],
+        Columns.AGENT_NAME: [f"Agente {i % 5}" for i in range(n)],
+        Columns.DATE: pd.Timestamp(f"{PERIOD}-01") + pd.to_timedelta([i % 28 for i in range(n)], unit="D"),
+        Columns.PRICE: precio,
+    })
+    if con_mic:
+        df[Columns.MIC] = [f"MIC-{i}" for i in range(n)]
+    df.attrs[ATTR_TARIFADO] = "ingresos"
+    return df
+
+
+@pytest.mark.parametrize("con_mic", [True, False])
+def test_reload_does_not_duplicate(con_mic):
+    df = _manifest(con_mic=con_mic)
+    TripWarehouse.store(df, PERIOD)
+    TripWarehouse.store(df, PERIOD)
+    assert len(TripWarehouse.load(PERIOD)) == len(df)
+
+
+def test_reload_updates_prices():
+    TripWarehouse.store(_manifest(precio=40.0), PERIOD)
+    TripWarehouse.store(_manifest(precio=55.0), PERIOD)
+    precios = TripWarehouse.load(PERIOD)[Columns.PRICE]
+    assert (precios == 55.0).all()
+
+
+def test_mic_loaded_by_other_manifest_is_ignored():
+    TripWarehouse.store(_manifest(n=10), PERIOD)
+    TripWarehouse.store(_manifest(n=10), "2024-07")  # Mismos MIC/DNA desde otro manifiesto
+    assert len(TripWarehouse.load(PERIOD)) == 10